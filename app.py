@@ -5,12 +5,12 @@ Aplicação Flask refatorada com separação de responsabilidades
 
 import sys
 import logging
-from flask import Flask
+from flask import Flask, jsonify
 from flask import cli
 
 # Configurações
 import config
-from config import HOST, PORT, TOKEN_AUTO_RENOVACAO, TOKEN_HORARIO_RENOVACAO, KEEP_ALIVE_ATIVO, KEEP_ALIVE_INTERVALO, AUTO_LIGAR_ATIVO, AUTO_LIGAR_HORARIO
+from config import HOST, PORT
 
 # Services
 from services.tv_service import TVService
@@ -18,14 +18,19 @@ from services.webhook_service import WebhookService
 from services.tv_controller import TVController
 from services.scheduler_service import SchedulerService
 from services.whatsapp_service import WhatsAppService
+from services.wallpaper_service import WallpaperService
+from services.eventos_service import EventosService
+from services.comando_service import ComandoService
 
 # Routes
 from routes import create_api_routes, create_web_routes
 from routes.whatsapp_routes import create_whatsapp_routes
+from routes.metricas_routes import create_metricas_routes
 
 # Utils
 from utils import log
 from utils.renovador_token import RenovadorTokenSmartThings
+from utils.lider import EleicaoLider
 
 
 def create_app():
@@ -39,27 +44,42 @@ def create_app():
     # Inicializa Flask
     app = Flask(__name__)
     app.config['JSON_AS_ASCII'] = False
+    app.config['MAX_CONTENT_LENGTH'] = config.REQUISICAO_MAX_MB * 1024 * 1024
+    
+    @app.errorhandler(413)
+    def requisicao_grande_demais(_erro):
+        return jsonify({
+            "success": False,
+            "message": f"Requisição maior que {config.REQUISICAO_MAX_MB} MB"
+        }), 413
     
     # Inicializa services
     tv_service = TVService()
     webhook_service = WebhookService()
     whatsapp_service = WhatsAppService()
     tv_controller = TVController(tv_service, webhook_service)
+    wallpaper_service = WallpaperService(webhook_service)
     scheduler_service = SchedulerService(tv_service, tv_controller)
     renovador_token = RenovadorTokenSmartThings()
+    eventos_service = EventosService()
+    comando_service = ComandoService(tv_service, tv_controller, eventos_service)
     
     # Registra rotas
-    api_routes = create_api_routes(tv_service, tv_controller, scheduler_service, renovador_token)
+    api_routes = create_api_routes(tv_service, tv_controller, scheduler_service, renovador_token, wallpaper_service,
+                                   eventos_service, comando_service)
     web_routes = create_web_routes(tv_service)
     whatsapp_routes = create_whatsapp_routes(tv_service, tv_controller, whatsapp_service)
+    metricas_routes = create_metricas_routes(scheduler_service, webhook_service)
     
     app.register_blueprint(api_routes)
     app.register_blueprint(web_routes)
     app.register_blueprint(whatsapp_routes)
+    app.register_blueprint(metricas_routes)
     
     # Armazena services no app para acesso posterior se necessário
     app.tv_service = tv_service
     app.tv_controller = tv_controller
+    app.webhook_service = webhook_service
     app.scheduler_service = scheduler_service
     
     return app
@@ -91,29 +111,26 @@ def inicializar_sistema(app):
     else:
         print("\n⚠️  Falha ao carregar TVs. Verifique o token.\n")
     
-    # Sistema de renovação automática de token
-    if TOKEN_AUTO_RENOVACAO:
-        try:
-            app.scheduler_service.iniciar_renovacao_token(TOKEN_HORARIO_RENOVACAO)
-            log(f"[TOKEN] Renovação automática ativada ({TOKEN_HORARIO_RENOVACAO})", "SUCCESS")
-        except Exception as e:
-            log(f"[TOKEN] Erro ao iniciar renovação automática: {e}", "ERROR")
-    else:
-        log("[TOKEN] Renovação automática desativada (config.py)", "INFO")
-    
-    # Sistema de Keep Alive
-    if KEEP_ALIVE_ATIVO:
-        app.scheduler_service.iniciar_keep_alive(KEEP_ALIVE_INTERVALO)
-    
-    # Sistema de ligamento automático (dias úteis)
-    if AUTO_LIGAR_ATIVO:
-        try:
-            app.scheduler_service.iniciar_ligamento_automatico(AUTO_LIGAR_HORARIO)
-            log(f"[AUTO-LIGAR] Agendamento ativado para {AUTO_LIGAR_HORARIO} (dias úteis)", "SUCCESS")
-        except Exception as e:
-            log(f"[AUTO-LIGAR] Erro ao iniciar agendamento: {e}", "ERROR")
-    else:
-        log("[AUTO-LIGAR] Ligamento automático desativado (config.py)", "INFO")
+    # Entrega webhooks que ficaram pendentes no outbox da execução anterior
+    # (todos os workers entregam; cada item é reservado por um só)
+    app.webhook_service.outbox.iniciar()
+    
+    # Apenas o worker com a trava executa os agendamentos; se ele morrer, outro assume
+    app.eleicao = EleicaoLider(config.LIDER_LOCK_FILE, lambda: iniciar_agendamentos(app), config.LIDER_INTERVALO)
+    app.eleicao.iniciar()
+
+
+def iniciar_agendamentos(app):
+    """Executado apenas no worker líder: agenda persistida e thread do scheduler"""
+    
+    # Agenda persistida: renovação de token, keep alive e ligamento automático (por setor)
+    try:
+        app.scheduler_service.carregar_agenda()
+    except Exception as e:
+        log(f"[AGENDA] Erro ao carregar agenda: {e}", "ERROR")
+    
+    # Uma única consulta de status à API, compartilhada por todos os painéis (/api/eventos)
+    app.scheduler_service.iniciar_monitor_status()
     
     # Inicia a thread do scheduler
     app.scheduler_service.iniciar_scheduler()
@@ -0,0 +1 @@
+"""Benchmarks das operações de frota (rodam contra o simulador SmartThings)"""
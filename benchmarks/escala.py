@@ -0,0 +1,343 @@
+"""
+Teste de escala com frotas sintéticas (centenas de TVs) contra o simulador SmartThings
+
+Para cada tamanho de frota, sobe o simulador em um processo e a aplicação completa em outro
+(threads e memória medidos são só da app) e mede cada subsistema:
+
+    carregar_tvs             GET /devices com a frota inteira
+    status_todas             uma requisição de /api/status/todas (consulta todas as TVs)
+    comandos                 job de /api/commands desligando a frota (pool compartilhado, job no estado)
+    desligar_exceto_reuniao  lotes de 2 threads com 10s entre lotes (comprimidos por --escala)
+    keep_alive               custo por TV em uma amostra, projetado para o ciclo completo
+
+Por fase: duração, chamadas à API e taxa (chamadas/s), pico de threads e de memória (RSS).
+Também estima a taxa exigida pelo monitor de status e pelo keep alive contra a cota da SmartThings.
+
+    python -m benchmarks.escala                                    # 24, 100, 250 e 500 TVs
+    python -m benchmarks.escala --tamanhos 100,500,1000 --cota 50  # cota maior: mede além do limitador
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+sys.path.append(str(Path(__file__).parent.parent))
+from benchmarks.frota import PASTA_RESULTADOS, iniciar_app, preparar_ambiente, progresso
+
+RAIZ = Path(__file__).parent.parent
+TAMANHOS_PADRAO = "24,100,250,500"
+# Setores das TVs sintéticas (em rodízio); Reunião fica fora do keep alive e do desligamento em lote
+SETORES_SINTETICOS = ["Operação", "Operação", "Financeiro", "TI", "Reunião"]
+AMOSTRA_KEEP_ALIVE = 20
+INTERVALO_AMOSTRAS = 0.05
+
+
+def rss_mb() -> Optional[float]:
+    """Memória residente do processo em MB (None se a plataforma não informar)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # Pico do processo (KB no Linux) - melhor que nada onde /proc não existe
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return None
+
+
+class Amostrador:
+    """Pico de threads e de memória enquanto uma fase roda"""
+    
+    def __init__(self, intervalo: float = INTERVALO_AMOSTRAS):
+        self.intervalo = intervalo
+        self.threads = 0
+        self.rss_mb: Optional[float] = None
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _amostrar(self):
+        self.threads = max(self.threads, threading.active_count())
+        rss = rss_mb()
+        if rss is not None:
+            self.rss_mb = max(self.rss_mb or 0, rss)
+    
+    def _loop(self):
+        while not self._parar.wait(self.intervalo):
+            self._amostrar()
+    
+    def __enter__(self):
+        self._amostrar()
+        self._thread = threading.Thread(target=self._loop, name="amostrador", daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *_):
+        self._parar.set()
+        self._thread.join()
+        self._amostrar()
+
+
+def configurar_frota(tamanho: int, cota: Optional[float]):
+    """Estende config.TV_CONFIG com as TVs sintéticas do simulador (antes de importar a app)"""
+    import config
+    from simulador.smartthings import frota_padrao
+    
+    reais = len(config.TV_CONFIG)
+    sinteticas = frota_padrao(max(0, tamanho - reais))[reais:]
+    config.TV_CONFIG = config.TV_CONFIG[:tamanho] + [
+        {"id": device_id, "setor": SETORES_SINTETICOS[i % len(SETORES_SINTETICOS)]}
+        for i, (device_id, _) in enumerate(sinteticas)
+    ]
+    config.TV_IDS = [tv["id"] for tv in config.TV_CONFIG]
+    if cota:
+        # O limitador é criado na importação de controllers.smartthings
+        config.SMARTTHINGS_REQUISICOES_POR_SEGUNDO = cota
+        config.SMARTTHINGS_RAJADA = max(config.SMARTTHINGS_RAJADA, int(cota * 2))
+        config.SMARTTHINGS_LEITURAS_POR_SEGUNDO = cota
+        config.SMARTTHINGS_LEITURAS_RAJADA = max(config.SMARTTHINGS_LEITURAS_RAJADA, int(cota * 2))
+
+
+def medir(tamanho: int, url_simulador: str, escala: float, cota: Optional[float], pasta: str) -> Dict:
+    """Mede as fases para uma frota (executado no processo filho)"""
+    import requests
+    configurar_frota(tamanho, cota)
+    import config
+    
+    raiz_simulador = url_simulador.rsplit("/v1", 1)[0]
+    app, servidor, url_app = iniciar_app(pasta, url_simulador, escala)
+    cliente = requests.Session()
+    fases = {}
+    
+    def chamadas() -> int:
+        """Requisições à API SmartThings simulada (sem os webhooks do n8n simulado)"""
+        contadores = cliente.get(f"{raiz_simulador}/simulador/requisicoes", timeout=30).json()["requisicoes"]
+        return sum(c["total"] for c in contadores if c["rota"] != "webhook")
+    
+    def fase(nome: str, funcao: Callable[[], Optional[Dict]], ligadas: Optional[bool] = None):
+        if ligadas is not None:
+            cliente.post(f"{raiz_simulador}/simulador/reset", json={"ligadas": ligadas}, timeout=30)
+            for tv_nome in app.tv_service.obter_tvs():
+                app.tv_service.invalidar_status(tv_nome)
+        antes = chamadas()
+        with Amostrador() as amostra:
+            inicio = time.perf_counter()
+            extra = funcao() or {}
+            duracao = time.perf_counter() - inicio
+        total = chamadas() - antes
+        fases[nome] = {
+            "duracao_s": round(duracao, 3),
+            "chamadas_api": total,
+            "chamadas_por_s": round(total / duracao, 2) if duracao else None,
+            "threads_pico": amostra.threads,
+            "rss_pico_mb": round(amostra.rss_mb, 1) if amostra.rss_mb is not None else None,
+            **extra
+        }
+        progresso(f"     {nome:<24} {json.dumps(fases[nome], ensure_ascii=False)}")
+    
+    def carregar_tvs():
+        app.tv_service.carregar_tvs()
+        return {"tvs_carregadas": len(app.tv_service.obter_tvs())}
+    
+    def status_todas():
+        resposta = cliente.get(f"{url_app}/api/status/todas", timeout=3600).json()
+        return {"tvs_respondidas": len(resposta.get("status", {}))}
+    
+    def comandos():
+        setores = sorted({info.get("setor") for info in app.tv_service.obter_tvs().values()})
+        corpo = {"comandos": [{"setor": setor, "acao": "desligar"} for setor in setores]}
+        job_id = cliente.post(f"{url_app}/api/commands", json=corpo, timeout=60).json()["job_id"]
+        consultas = 0
+        while True:
+            time.sleep(0.5)
+            consultas += 1
+            job = cliente.get(f"{url_app}/api/commands/{job_id}", timeout=60).json()["job"]
+            if job["status"] == "concluido":
+                break
+        return {"alvos": len(job["alvos"]), "falhas": sum(a["status"] == "falha" for a in job["alvos"]),
+                "consultas_job": consultas}
+    
+    def desligar_exceto_reuniao():
+        relatorio = app.tv_controller.desligar_tvs_exceto_reuniao()
+        return {"desligadas": relatorio["total_desligadas"], "erros": relatorio["total_erros"]}
+    
+    scheduler = app.scheduler_service
+    elegiveis = scheduler.tvs_keep_alive()
+    
+    def keep_alive():
+        amostra = elegiveis[:AMOSTRA_KEEP_ALIVE]
+        for tv_nome in amostra:
+            app.tv_service.estado.definir("estado_esperado", tv_nome, {"input_source": "dtv", "current_app": ""})
+        atividade_recente = config.KEEP_ALIVE_ATIVIDADE_RECENTE
+        config.KEEP_ALIVE_ATIVIDADE_RECENTE = 0
+        try:
+            inicio = time.perf_counter()
+            for tv_nome in amostra:
+                scheduler._keep_alive_tv(tv_nome)
+            por_tv = (time.perf_counter() - inicio) / max(1, len(amostra))
+        finally:
+            config.KEEP_ALIVE_ATIVIDADE_RECENTE = atividade_recente
+        return {"amostra": len(amostra), "por_tv_ms": round(por_tv * 1000, 1),
+                "ciclo_projetado_s": round(por_tv * len(elegiveis), 1)}
+    
+    try:
+        fase("carregar_tvs", carregar_tvs)
+        fase("status_todas", status_todas, ligadas=True)
+        fase("comandos", comandos, ligadas=True)
+        fase("desligar_exceto_reuniao", desligar_exceto_reuniao, ligadas=True)
+        fase("keep_alive", keep_alive, ligadas=True)
+    finally:
+        from utils.logger import descarregar_logs
+        descarregar_logs()
+        servidor.shutdown()
+    
+    # Demanda contínua sobre a cota de leituras (requisições/s): monitor do painel + status do keep alive de cada TV elegível
+    cota_rps = config.SMARTTHINGS_LEITURAS_POR_SEGUNDO
+    monitor_rps = len(app.tv_service.obter_tvs()) / config.STATUS_MAX_IDADE
+    keep_alive_rps = len(elegiveis) / (config.KEEP_ALIVE_INTERVALO * 60)
+    return {
+        "tvs": len(app.tv_service.obter_tvs()),
+        "fases": fases,
+        "limites": {
+            "cota_rps": cota_rps,
+            "monitor_status_rps": round(monitor_rps, 2),
+            "keep_alive_rps": round(keep_alive_rps, 2),
+            "uso_cota": round((monitor_rps + keep_alive_rps) / cota_rps, 2),
+            "keep_alive_tvs": len(elegiveis),
+            "keep_alive_intervalo_s": config.KEEP_ALIVE_INTERVALO * 60,
+            # A ordem de ligamento da frota é uma lista fixa de nomes (+ salas de reunião)
+            "tvs_na_ordem_de_ligamento": len(app.tv_controller._obter_tvs_ordenadas())
+        }
+    }
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _aguardar_simulador(url: str, processo: subprocess.Popen, timeout: float = 30):
+    import requests
+    limite = time.time() + timeout
+    while time.time() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError("O simulador encerrou ao iniciar")
+        try:
+            requests.get(f"{url}/simulador/requisicoes", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError("O simulador não respondeu a tempo")
+
+
+def executar_tamanho(tamanho: int, args) -> Dict:
+    """Sobe o simulador e a medição em processos separados para uma frota"""
+    porta = _porta_livre()
+    raiz_simulador = f"http://127.0.0.1:{porta}"
+    simulador = subprocess.Popen(
+        [sys.executable, "-m", "simulador.smartthings", "--porta", str(porta), "--extras", str(max(0, tamanho - 24)),
+         "--latencia", str(args.latencia), "--jitter", str(args.jitter)],
+        cwd=RAIZ, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        _aguardar_simulador(raiz_simulador, simulador)
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as arquivo:
+            saida = arquivo.name
+        comando = [sys.executable, "-m", "benchmarks.escala", "--medir", str(tamanho),
+                   "--simulador", f"{raiz_simulador}/v1", "--escala", str(args.escala), "--saida-medicao", saida]
+        if args.cota:
+            comando += ["--cota", str(args.cota)]
+        if args.verbose:
+            comando.append("--verbose")
+        subprocess.run(comando, cwd=RAIZ, check=True)
+        try:
+            return json.loads(Path(saida).read_text(encoding="utf-8"))
+        finally:
+            os.unlink(saida)
+    finally:
+        simulador.terminate()
+        simulador.wait()
+
+
+def imprimir_resumo(resultados: list):
+    """Tabela por fase (linhas = tamanhos da frota) e uso da cota"""
+    fases = list(resultados[0]["fases"]) if resultados else []
+    for fase in fases:
+        progresso(f"\n📈 {fase}")
+        progresso(f"   {'TVs':>6} {'duração (s)':>12} {'chamadas/s':>11} {'threads':>8} {'RSS (MB)':>9}")
+        for resultado in resultados:
+            f = resultado["fases"][fase]
+            progresso(f"   {resultado['tvs']:>6} {f['duracao_s']:>12} {str(f['chamadas_por_s']):>11} "
+                      f"{f['threads_pico']:>8} {str(f['rss_pico_mb']):>9}")
+    
+    progresso("\n📊 Demanda contínua sobre a cota da SmartThings")
+    progresso(f"   {'TVs':>6} {'monitor/s':>10} {'keep alive/s':>13} {'cota/s':>7} {'uso':>6} {'ciclo keep alive':>17} {'na ordem':>9}")
+    for resultado in resultados:
+        limites = resultado["limites"]
+        ciclo = resultado["fases"]["keep_alive"]["ciclo_projetado_s"]
+        # Acima da cota ou com o ciclo de keep alive maior que o intervalo: o subsistema não acompanha a frota
+        marca = "❌" if limites["uso_cota"] > 1 or ciclo > limites["keep_alive_intervalo_s"] else "✅"
+        ciclo_texto = f"{ciclo}s/{limites['keep_alive_intervalo_s']}s"
+        progresso(f"{marca} {resultado['tvs']:>5} {limites['monitor_status_rps']:>10} {limites['keep_alive_rps']:>13} "
+                  f"{limites['cota_rps']:>7} {limites['uso_cota']:>6.0%} {ciclo_texto:>17} "
+                  f"{limites['tvs_na_ordem_de_ligamento']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de escala com frotas sintéticas (contra o simulador SmartThings)")
+    parser.add_argument("--tamanhos", default=TAMANHOS_PADRAO, help="Tamanhos da frota separados por vírgula")
+    parser.add_argument("--escala", type=float, default=100, help="Compressão das esperas das sequências")
+    parser.add_argument("--latencia", type=float, default=50, help="Latência do simulador (ms)")
+    parser.add_argument("--jitter", type=float, default=10, help="Variação da latência, ± (ms)")
+    parser.add_argument("--cota", type=float, default=None,
+                        help="Substitui as cotas de comandos e de leituras da SmartThings (padrão: as do config)")
+    parser.add_argument("--saida", default=None, help="Arquivo do resultado (padrão: benchmarks/resultados/escala-<data>.json)")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os logs da aplicação")
+    # Uso interno: processo filho que mede um tamanho
+    parser.add_argument("--medir", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--simulador", help=argparse.SUPPRESS)
+    parser.add_argument("--saida-medicao", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.escala <= 0:
+        parser.error("--escala deve ser maior que zero")
+    
+    if args.medir:
+        with tempfile.TemporaryDirectory(prefix="apptvs-escala-") as pasta:
+            preparar_ambiente(pasta)
+            silencio = open(os.devnull, "w", encoding="utf-8")
+            with silencio, (contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(silencio)):
+                resultado = medir(args.medir, args.simulador, args.escala, args.cota, pasta)
+        Path(args.saida_medicao).write_text(json.dumps(resultado, ensure_ascii=False), encoding="utf-8")
+        return
+    
+    tamanhos = [int(t) for t in args.tamanhos.split(",") if t.strip()]
+    resultado = {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "parametros": {"escala": args.escala, "latencia_ms": args.latencia, "jitter_ms": args.jitter, "cota": args.cota},
+        "resultados": []
+    }
+    for tamanho in tamanhos:
+        progresso(f"🏁 Frota de {tamanho} TVs")
+        resultado["resultados"].append(executar_tamanho(tamanho, args))
+    
+    imprimir_resumo(resultado["resultados"])
+    saida = Path(args.saida) if args.saida else PASTA_RESULTADOS / f"escala-{datetime.now():%Y%m%d-%H%M%S}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(resultado, ensure_ascii=False, indent=2), encoding="utf-8")
+    progresso(f"\n💾 Resultado salvo em {saida}")
+
+
+if __name__ == "__main__":
+    main()
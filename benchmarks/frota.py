@@ -0,0 +1,360 @@
+"""
+Benchmarks das operações de frota contra o simulador SmartThings (simulador/smartthings.py)
+
+Mede o tempo para ligar a frota (toggle_todas, ligar_todas_automatico, em blocos e em pipeline),
+a duração de desligar_tvs_exceto_reuniao, a latência de /api/status/todas com N painéis
+simultâneos e o custo de um ciclo de keep alive. As esperas das sequências são comprimidas por
+--escala (RELOGIO_ESCALA); a latência HTTP e o limitador de taxa continuam em tempo real, então
+só compare resultados gerados com os mesmos parâmetros. /api/status/todas responde do cache
+(STATUS_MAX_IDADE) e só consulta as TVs com status vencido, pelo limitador de leituras
+(SMARTTHINGS_LEITURAS_POR_SEGUNDO), separado do limitador de comandos.
+
+    python -m benchmarks.frota                         # roda e compara com benchmarks/baseline.json
+    python -m benchmarks.frota --salvar-baseline       # roda e grava como nova referência
+    python -m benchmarks.frota --cenarios status_todas,keep_alive_saudavel --clientes 20
+    python -m benchmarks.frota --comparar benchmarks/resultados/20250110-083000.json
+
+Sai com código 1 se alguma métrica piorar mais que --limite (padrão 15%) em relação à referência.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+PASTA = Path(__file__).parent
+BASELINE_PADRAO = PASTA / "baseline.json"
+PASTA_RESULTADOS = PASTA / "resultados"
+LIMITE_PADRAO = 0.15
+
+CENARIOS = [
+    "toggle_todas", "toggle_todas_pipeline",
+    "ligar_todas_automatico", "ligar_todas_automatico_pipeline",
+    "desligar_exceto_reuniao", "status_todas",
+    "keep_alive_saudavel", "keep_alive_recuperacao"
+]
+# Métricas comparadas com a referência (as demais são informativas)
+METRICAS_MENOR_MELHOR = {"duracao_s", "chamadas_api", "p50_ms", "p99_ms", "media_ms", "por_tv_ms"}
+METRICAS_MAIOR_MELHOR = {"rps"}
+
+
+def progresso(mensagem: str):
+    """Escreve no terminal mesmo com os logs da aplicação silenciados"""
+    print(mensagem, file=sys.__stdout__, flush=True)
+
+
+def percentil(valores: List[float], p: float) -> Optional[float]:
+    """Percentil por posição (mesmo critério das métricas do outbox)"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def preparar_ambiente(pasta: str):
+    """Bancos e arquivos da execução em uma pasta temporária (antes de importar config)"""
+    os.environ["ESTADO_DB"] = os.path.join(pasta, "estado.db")
+    os.environ["WEBHOOK_OUTBOX_DB"] = os.path.join(pasta, "webhook_outbox.db")
+    os.environ["LIDER_LOCK_FILE"] = os.path.join(pasta, "scheduler.lock")
+    os.environ["RASTREAMENTO_ARQUIVO"] = os.path.join(pasta, "traces.jsonl")
+    os.environ["LOG_ARQUIVO"] = ""
+    os.environ["LOG_DB"] = ""
+    sys.path.append(str(PASTA.parent))
+
+
+def iniciar_app(pasta: str, url_simulador: str, escala: float):
+    """
+    Aplicação completa (create_app) apontando para o simulador, servida em uma porta local
+    Retorna (app, servidor, url da app); encerrar com servidor.shutdown()
+    """
+    import config
+    config.SMARTTHINGS_API_URL = url_simulador
+    config.WEBHOOK_URL = url_simulador.rsplit("/v1", 1)[0] + "/webhook"
+    config.RELOGIO_ESCALA = escala
+    config.AGENDA_FILE = os.path.join(pasta, "schedules.json")
+    
+    from app import create_app
+    from werkzeug.serving import make_server
+    app = create_app()
+    if not app.tv_service.carregar_tvs():
+        raise RuntimeError("Não foi possível carregar as TVs do simulador")
+    app.webhook_service.outbox.iniciar()
+    servidor = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, name="benchmark-app", daemon=True).start()
+    return app, servidor, f"http://127.0.0.1:{servidor.server_port}"
+
+
+class Bancada:
+    """Simulador + aplicação completa (create_app) servida em uma porta local"""
+    
+    def __init__(self, pasta: str, escala: float, latencia: float, jitter: float, tempo_ligar: float,
+                 taxa_409: float, semente: Optional[int]):
+        import config
+        from simulador.smartthings import Simulador, frota_padrao, iniciar_em_thread
+        
+        self.config = config
+        self.simulador = Simulador(frota_padrao(), latencia=latencia, jitter=jitter, taxa_409=taxa_409,
+                                   tempo_ligar=tempo_ligar / escala, semente=semente)
+        self._servidor_simulador, url = iniciar_em_thread(self.simulador)
+        self.app, self._servidor_app, self.url_app = iniciar_app(pasta, url, escala)
+    
+    def encerrar(self):
+        self._servidor_app.shutdown()
+        self._servidor_simulador.shutdown()
+    
+    def _preparar(self, ligadas: bool):
+        """Frota no estado inicial e sem status em cache"""
+        self.simulador.reiniciar(ligadas)
+        for nome in self.app.tv_service.obter_tvs():
+            self.app.tv_service.invalidar_status(nome)
+    
+    def _tvs_ligadas(self) -> int:
+        return sum(tv.ligada for tv in self.simulador.tvs.values())
+    
+    def medir_operacao(self, funcao: Callable, ligadas: bool) -> Dict:
+        """Tempo total de uma operação de frota e chamadas à API SmartThings"""
+        self._preparar(ligadas)
+        inicio = time.perf_counter()
+        funcao()
+        duracao = time.perf_counter() - inicio
+        return {
+            "duracao_s": round(duracao, 3),
+            "chamadas_api": self.simulador.total_requisicoes() - self.simulador.total_requisicoes("webhook"),
+            "tvs_ligadas": self._tvs_ligadas(),
+            "tvs": len(self.simulador.tvs)
+        }
+    
+    def toggle_todas(self, pipeline: bool = False) -> Dict:
+        controller = self.app.tv_controller
+        return self.medir_operacao(lambda: controller.toggle_todas(pipeline=pipeline, aguardar=True), ligadas=False)
+    
+    def ligar_todas_automatico(self, pipeline: bool = False) -> Dict:
+        controller = self.app.tv_controller
+        return self.medir_operacao(lambda: controller.ligar_todas_automatico(pipeline=pipeline, aguardar=True), ligadas=False)
+    
+    def desligar_exceto_reuniao(self) -> Dict:
+        return self.medir_operacao(self.app.tv_controller.desligar_tvs_exceto_reuniao, ligadas=True)
+    
+    def status_todas(self, clientes: int, requisicoes: int) -> Dict:
+        """N painéis consultando /api/status/todas ao mesmo tempo (cada um faz `requisicoes` em sequência)"""
+        import requests
+        self._preparar(ligadas=True)
+        latencias: List[float] = []
+        erros = []
+        lock = threading.Lock()
+        
+        def painel():
+            with requests.Session() as sessao:
+                for _ in range(requisicoes):
+                    inicio = time.perf_counter()
+                    try:
+                        ok = sessao.get(f"{self.url_app}/api/status/todas", timeout=60).status_code == 200
+                    except requests.RequestException:
+                        ok = False
+                    with lock:
+                        (latencias if ok else erros).append((time.perf_counter() - inicio) * 1000)
+        
+        chamadas_antes = self.simulador.total_requisicoes("status")
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clientes) as executor:
+            for _ in range(clientes):
+                executor.submit(painel)
+        duracao = time.perf_counter() - inicio
+        return {
+            "clientes": clientes,
+            "requisicoes": len(latencias) + len(erros),
+            "erros": len(erros),
+            "p50_ms": round(percentil(latencias, 0.5) or 0, 1),
+            "p99_ms": round(percentil(latencias, 0.99) or 0, 1),
+            "media_ms": round(sum(latencias) / len(latencias), 1) if latencias else 0,
+            "rps": round((len(latencias) + len(erros)) / duracao, 2),
+            "chamadas_api": self.simulador.total_requisicoes("status") - chamadas_antes
+        }
+    
+    def keep_alive(self, recuperacao: bool) -> Dict:
+        """
+        Um ciclo de keep alive nas TVs elegíveis (todas ligadas)
+        saudável: estado esperado igual ao atual (só consulta); recuperação: diferente (Enter + 10s + Enter)
+        """
+        self._preparar(ligadas=True)
+        scheduler = self.app.scheduler_service
+        tvs = scheduler.tvs_keep_alive()
+        esperado = {"input_source": "HDMI1" if recuperacao else "dtv", "current_app": ""}
+        for nome in tvs:
+            self.app.tv_service.estado.definir("estado_esperado", nome, esperado)
+        
+        # As TVs acabaram de ser "ligadas" pelo simulador: sem a janela de atividade recente
+        atividade_recente = self.config.KEEP_ALIVE_ATIVIDADE_RECENTE
+        self.config.KEEP_ALIVE_ATIVIDADE_RECENTE = 0
+        duracoes = []
+        chamadas_antes = self.simulador.total_requisicoes()
+        try:
+            for nome in tvs:
+                inicio = time.perf_counter()
+                scheduler._keep_alive_tv(nome)
+                duracoes.append((time.perf_counter() - inicio) * 1000)
+        finally:
+            self.config.KEEP_ALIVE_ATIVIDADE_RECENTE = atividade_recente
+        
+        resultados = [(scheduler.obter_status_keep_alive().get(nome) or {}).get("ultimo_resultado") for nome in tvs]
+        return {
+            "tvs": len(tvs),
+            "duracao_s": round(sum(duracoes) / 1000, 3),
+            "por_tv_ms": round(sum(duracoes) / len(duracoes), 1) if duracoes else 0,
+            "chamadas_api": self.simulador.total_requisicoes() - chamadas_antes,
+            "executadas": resultados.count("ok"),
+            "falhas": resultados.count("falha")
+        }
+    
+    def executar(self, cenario: str, clientes: int, requisicoes: int) -> Dict:
+        if cenario == "toggle_todas":
+            return self.toggle_todas()
+        if cenario == "toggle_todas_pipeline":
+            return self.toggle_todas(pipeline=True)
+        if cenario == "ligar_todas_automatico":
+            return self.ligar_todas_automatico()
+        if cenario == "ligar_todas_automatico_pipeline":
+            return self.ligar_todas_automatico(pipeline=True)
+        if cenario == "desligar_exceto_reuniao":
+            return self.desligar_exceto_reuniao()
+        if cenario == "status_todas":
+            return self.status_todas(clientes, requisicoes)
+        if cenario == "keep_alive_saudavel":
+            return self.keep_alive(recuperacao=False)
+        if cenario == "keep_alive_recuperacao":
+            return self.keep_alive(recuperacao=True)
+        raise ValueError(f"Cenário desconhecido: {cenario}")
+
+
+def comparar(atual: Dict, referencia: Dict, limite: float) -> List[Dict]:
+    """
+    Compara as métricas dos cenários presentes nos dois resultados
+    
+    Returns:
+        Uma linha por métrica: cenario, metrica, referencia, atual, variacao (fração) e regressao
+    """
+    linhas = []
+    for cenario, metricas in atual["resultados"].items():
+        base = referencia.get("resultados", {}).get(cenario)
+        if not base:
+            continue
+        for metrica, valor in metricas.items():
+            if metrica not in METRICAS_MENOR_MELHOR | METRICAS_MAIOR_MELHOR or not base.get(metrica):
+                continue
+            variacao = (valor - base[metrica]) / base[metrica]
+            piora = variacao if metrica in METRICAS_MENOR_MELHOR else -variacao
+            linhas.append({
+                "cenario": cenario,
+                "metrica": metrica,
+                "referencia": base[metrica],
+                "atual": valor,
+                "variacao": round(variacao, 4),
+                "regressao": piora > limite
+            })
+    return linhas
+
+
+def imprimir_comparacao(atual: Dict, referencia: Dict, limite: float) -> bool:
+    """Tabela da comparação; retorna True se houve regressão"""
+    if atual.get("parametros") != referencia.get("parametros"):
+        progresso("⚠️  Parâmetros diferentes da referência - a comparação pode não ser válida")
+        progresso(f"   referência: {referencia.get('parametros')}")
+        progresso(f"   atual:      {atual.get('parametros')}")
+    
+    linhas = comparar(atual, referencia, limite)
+    progresso("\n" + "=" * 80)
+    progresso(f"📊 COMPARAÇÃO COM A REFERÊNCIA ({referencia.get('data')}) - limite {limite:.0%}")
+    progresso("=" * 80)
+    for linha in linhas:
+        marca = "❌" if linha["regressao"] else "✅"
+        progresso(f"{marca} {linha['cenario']:<32} {linha['metrica']:<13} "
+                   f"{linha['referencia']:>10} → {linha['atual']:>10}  ({linha['variacao']:+.1%})")
+    regressoes = [linha for linha in linhas if linha["regressao"]]
+    progresso("=" * 80)
+    progresso(f"{'❌' if regressoes else '✅'} {len(regressoes)} regressão(ões) em {len(linhas)} métricas")
+    return bool(regressoes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks das operações de frota (contra o simulador SmartThings)")
+    parser.add_argument("--cenarios", default=",".join(CENARIOS), help="Lista separada por vírgula")
+    parser.add_argument("--escala", type=float, default=100, help="Compressão das esperas das sequências")
+    parser.add_argument("--latencia", type=float, default=50, help="Latência do simulador (ms)")
+    parser.add_argument("--jitter", type=float, default=10, help="Variação da latência, ± (ms)")
+    parser.add_argument("--tempo-ligar", type=float, default=5, help="Segundos (nominais) até a TV aceitar comandos")
+    parser.add_argument("--taxa-409", type=float, default=0, help="Probabilidade de 409 injetado nos comandos")
+    parser.add_argument("--semente", type=int, default=1)
+    parser.add_argument("--clientes", type=int, default=5, help="Painéis simultâneos em status_todas")
+    parser.add_argument("--requisicoes", type=int, default=3, help="Requisições por painel em status_todas")
+    parser.add_argument("--saida", default=None, help="Arquivo do resultado (padrão: benchmarks/resultados/<data>.json)")
+    parser.add_argument("--baseline", default=str(BASELINE_PADRAO), help="Resultado de referência")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Grava o resultado como nova referência")
+    parser.add_argument("--limite", type=float, default=LIMITE_PADRAO, help="Piora máxima aceita (fração)")
+    parser.add_argument("--comparar", default=None, help="Só compara este resultado com a referência (não roda)")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os logs da aplicação")
+    args = parser.parse_args()
+    
+    if args.comparar:
+        atual = json.loads(Path(args.comparar).read_text(encoding="utf-8"))
+        referencia = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        sys.exit(1 if imprimir_comparacao(atual, referencia, args.limite) else 0)
+    
+    cenarios = [c.strip() for c in args.cenarios.split(",") if c.strip()]
+    desconhecidos = set(cenarios) - set(CENARIOS)
+    if desconhecidos:
+        parser.error(f"Cenários desconhecidos: {', '.join(sorted(desconhecidos))}")
+    if args.escala <= 0:
+        parser.error("--escala deve ser maior que zero")
+    
+    parametros = {
+        "escala": args.escala, "latencia_ms": args.latencia, "jitter_ms": args.jitter,
+        "tempo_ligar_s": args.tempo_ligar, "taxa_409": args.taxa_409, "semente": args.semente,
+        "clientes": args.clientes, "requisicoes": args.requisicoes
+    }
+    resultado = {"data": datetime.now().isoformat(timespec="seconds"), "parametros": parametros, "resultados": {}}
+    
+    with tempfile.TemporaryDirectory(prefix="apptvs-benchmark-") as pasta:
+        preparar_ambiente(pasta)
+        silencio = open(os.devnull, "w", encoding="utf-8")
+        with silencio, (contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(silencio)):
+            bancada = Bancada(pasta, args.escala, args.latencia / 1000, args.jitter / 1000, args.tempo_ligar,
+                              args.taxa_409, args.semente)
+            progresso(f"🏁 Benchmark com {len(bancada.simulador.tvs)} TVs simuladas (escala {args.escala:g}x)")
+            try:
+                for cenario in cenarios:
+                    progresso(f"   ▶ {cenario}...")
+                    metricas = bancada.executar(cenario, args.clientes, args.requisicoes)
+                    resultado["resultados"][cenario] = metricas
+                    progresso(f"     {json.dumps(metricas, ensure_ascii=False)}")
+            finally:
+                from utils.logger import descarregar_logs
+                descarregar_logs()
+                bancada.encerrar()
+    
+    saida = Path(args.saida) if args.saida else PASTA_RESULTADOS / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(resultado, ensure_ascii=False, indent=2), encoding="utf-8")
+    progresso(f"💾 Resultado salvo em {saida}")
+    
+    baseline = Path(args.baseline)
+    if args.salvar_baseline:
+        baseline.write_text(json.dumps(resultado, ensure_ascii=False, indent=2), encoding="utf-8")
+        progresso(f"📌 Referência atualizada: {baseline}")
+        return
+    if not baseline.exists():
+        progresso(f"ℹ️  Sem referência em {baseline} (use --salvar-baseline para criar)")
+        return
+    referencia = json.loads(baseline.read_text(encoding="utf-8"))
+    sys.exit(1 if imprimir_comparacao(resultado, referencia, args.limite) else 0)
+
+
+if __name__ == "__main__":
+    main()
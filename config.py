@@ -55,15 +55,83 @@ TV_IDS = [tv["id"] for tv in TV_CONFIG]
 # URL do webhook para ligar máquinas virtuais (do .env)
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")
 
+# Fila persistente (outbox) para envio assíncrono dos webhooks das máquinas virtuais
+WEBHOOK_OUTBOX_DB = os.getenv("WEBHOOK_OUTBOX_DB", str(Path(__file__).parent / 'webhook_outbox.db'))
+WEBHOOK_OUTBOX_DEDUPE_SEGUNDOS = 60  # Ignora o mesmo (TV, ação) enfileirado dentro desta janela
+WEBHOOK_OUTBOX_MAX_TENTATIVAS = 6
+WEBHOOK_OUTBOX_BACKOFF_SEGUNDOS = 2  # Dobra a cada tentativa
+WEBHOOK_OUTBOX_BACKOFF_MAX_SEGUNDOS = 60
+WEBHOOK_OUTBOX_POLL_SEGUNDOS = 30  # Verifica itens enfileirados por outros workers mesmo sem aviso local
+
 # URL do endpoint de gerenciamento de BIs (do .env)
 BI_WEBHOOK_URL = os.getenv("BI_WEBHOOK_URL", "http://172.16.30.10:5679/webhook/f70578b6-fad3-421e-b19b-552cb6c8e981")
 BI_WEBHOOK_AUTH = os.getenv("BI_WEBHOOK_AUTH", "UmlrZWxtZVNhbnRvczoxMjM0NTY=")
+BI_CACHE_TTL = 300  # Segundos que a lista de BIs de uma TV permanece em cache
+BI_CACHE_WORKERS = 6  # Consultas paralelas ao atualizar várias listas de BIs
+
+# Configurações de wallpaper
+WALLPAPER_RESOLUCAO_PADRAO = (1920, 1080)  # Resolução máxima (largura, altura) das imagens enviadas
+WALLPAPER_RESOLUCOES = {}  # Resolução específica por TV, ex: {"TV-ATLAS": (3840, 2160)}
+WALLPAPER_QUALIDADE = 85  # Qualidade JPEG após recompressão
+WALLPAPER_WORKERS = 4  # Envios paralelos ao aplicar um wallpaper em um setor
+WALLPAPER_MAX_MB = 25  # Tamanho máximo do upload
+# Limite do corpo de qualquer requisição (vale também para uploads sem Content-Length);
+# o endpoint legado recebe o wallpaper em base64, ~4/3 do tamanho da imagem
+REQUISICAO_MAX_MB = WALLPAPER_MAX_MB * 4 // 3 + 1
+WALLPAPER_HASHES_FILE = str(Path(__file__).parent / 'wallpaper_hashes.json')  # Formato antigo: importado para o estado compartilhado ao iniciar
 
 # Configurações do servidor
 HOST = '0.0.0.0'
 PORT = 5000
 DEBUG = True
 
+# Endereço da API SmartThings (aponte para o simulador local para testar/medir sem as TVs reais:
+# python -m simulador.smartthings → SMARTTHINGS_API_URL=http://127.0.0.1:8088/v1)
+SMARTTHINGS_API_URL = os.getenv("SMARTTHINGS_API_URL", "https://api.smartthings.com/v1").rstrip("/")
+
+# Divide todas as esperas das sequências (utils/relogio.dormir): 1 = tempo real.
+# Só para rodar contra o simulador (ex: benchmarks com 100 = uma sequência de 100s leva 1s)
+RELOGIO_ESCALA = float(os.getenv("RELOGIO_ESCALA", "1"))
+if RELOGIO_ESCALA <= 0:
+    raise ValueError(f"RELOGIO_ESCALA deve ser maior que zero (recebido: {RELOGIO_ESCALA:g})")
+
+# Gravação/reprodução das chamadas externas (utils/cliente_http): "gravar" salva requisição, resposta e
+# latência de cada chamada à SmartThings, ao n8n e à Evolution API; "reproduzir" responde a partir do
+# arquivo, sem rede. Vazio = chamadas reais
+HTTP_FIXTURES_MODO = os.getenv("HTTP_FIXTURES_MODO", "")
+HTTP_FIXTURES_ARQUIVO = os.getenv("HTTP_FIXTURES_ARQUIVO", str(Path(__file__).parent / 'http_fixtures.jsonl.gz'))
+HTTP_FIXTURES_ESCALA = float(os.getenv("HTTP_FIXTURES_ESCALA", "1"))  # Divide as latências reproduzidas; 0 = sem espera
+# Corpos de requisição maiores que isto (bytes) são gravados só como sha256 e tamanho (ex: wallpapers em base64)
+HTTP_FIXTURES_CORPO_MAX = int(os.getenv("HTTP_FIXTURES_CORPO_MAX", "4096"))
+
+# Limite de requisições à API SmartThings (compartilhado por todas as threads e todos os workers, em estado.db)
+SMARTTHINGS_REQUISICOES_POR_SEGUNDO = 5
+SMARTTHINGS_RAJADA = 10
+# Leituras de status têm orçamento próprio: painéis e monitor não atrasam comandos (nem o contrário)
+SMARTTHINGS_LEITURAS_POR_SEGUNDO = 10
+SMARTTHINGS_LEITURAS_RAJADA = 20
+
+# Pool de threads compartilhado (tarefas agendadas e comandos em segundo plano)
+EXECUTOR_WORKERS = 8
+# Pools dedicados do agendador: keep alive e ligamentos da frota não disputam workers entre si
+# nem com o pool compartilhado (uma execução travada só ocupa um worker do próprio pool)
+AGENDADOR_POOLS = {"keep_alive": 4, "frota": 2}
+
+# Execução com vários workers (gunicorn -c gunicorn.conf.py wsgi:app)
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "4"))
+WEB_THREADS = int(os.getenv("WEB_THREADS", "8"))  # Threads por worker (rotas longas como toggle em lote)
+# Cada painel com /api/eventos (SSE) aberto ocupa uma dessas threads enquanto estiver conectado:
+# WEB_WORKERS × WEB_THREADS limita painéis conectados + requisições simultâneas (aumente com o número de painéis)
+# Apenas o worker com a trava deste arquivo executa agendamentos; os demais tentam assumir a cada LIDER_INTERVALO
+LIDER_LOCK_FILE = os.getenv("LIDER_LOCK_FILE", str(Path(__file__).parent / 'scheduler.lock'))
+LIDER_INTERVALO = 5  # Segundos
+# Status das TVs, sequências em execução, VMs prontas e estatísticas do keep alive, vistos por todos os workers
+ESTADO_DB = os.getenv("ESTADO_DB", str(Path(__file__).parent / 'estado.db'))
+SEQUENCIA_MAX_DURACAO = 30 * 60  # Segundos até uma marca de "sequência em execução" expirar (worker morto no meio)
+COMANDO_TV_ESPERA = 1  # Segundos até um job tentar de novo uma TV ocupada por outro comando (em qualquer worker)
+# Cada worker publica suas métricas em estado.db; /metrics em qualquer worker devolve as de todos (rótulo worker)
+METRICAS_PUBLICAR_INTERVALO = 5  # Segundos
+
 # Configurações de renovação automática de token
 TOKEN_AUTO_RENOVACAO = True  # True para ativar, False para desativar
 TOKEN_HORARIO_RENOVACAO = "08:26"  # Horário diário para renovar (formato HH:MM)
@@ -71,11 +139,69 @@ TOKEN_HORARIO_RENOVACAO = "08:26"  # Horário diário para renovar (formato HH:M
 # Configuração de ligamento automático de TVs
 AUTO_LIGAR_ATIVO = True  # True para ativar, False para desativar
 AUTO_LIGAR_HORARIO = "06:20"  # Horário diário para ligar todas as TVs (formato HH:MM)
+# Horários por setor para não ligar todos os setores ao mesmo tempo (vazio = todas no AUTO_LIGAR_HORARIO)
+# Ex: {"TI": "06:10", "Operação": "06:20", "Financeiro": "06:30"}
+AUTO_LIGAR_HORARIOS_SETOR = {}
+
+# Modo pipeline: liga todas as VMs antes e executa as sequências conforme os slots liberam
+AUTO_LIGAR_PIPELINE = False
+AUTO_LIGAR_AGUARDAR_VM = False  # Aguarda o sinal de VM pronta antes do ENTER final que abre o BI
+PIPELINE_WEBHOOK_LOTE = 4  # Máquinas virtuais por requisição de webhook
+PIPELINE_WEBHOOK_INTERVALO = 5  # Segundos entre requisições de webhook
+PIPELINE_SLOTS = 2  # Sequências de TV executando ao mesmo tempo
+PIPELINE_INTERVALO_INICIO = 10  # Segundos mínimos entre o início de duas sequências
+PIPELINE_VM_TIMEOUT = 300  # Segundos máximos aguardando o sinal de VM pronta
 
 # Configuração de Keep Alive (Reconexão automática)
 KEEP_ALIVE_ATIVO = True
 KEEP_ALIVE_INTERVALO = 5  # Minutos
 KEEP_ALIVE_IGNORE_SETORES = ["Reunião", "Reuniao", "Recepção", "Recepcao", "Cozinha", "Jurídico", "Juridico"]
+KEEP_ALIVE_STATUS_MAX_IDADE = 60  # Segundos em que um status em cache é reaproveitado pelo keep alive
+KEEP_ALIVE_ATIVIDADE_RECENTE = 120  # Segundos: TV com atividade recente não recebe comandos
+# Estado saudável por TV (BI aberto). Se ausente, é aprendido após a sequência de ligar.
+# Ex: {"TI01": {"input_source": "HDMI1", "current_app": None}}
+KEEP_ALIVE_ESTADO_ESPERADO = {}
+# Segundos após a sequência (e o sinal de VM pronta, se o webhook foi enviado) até amostrar o estado
+# aprendido: o ENTER final ainda está abrindo o BI quando a sequência termina
+KEEP_ALIVE_ESTADO_ESPERADO_ATRASO = 60
+
+# Agenda persistida (editável em /api/schedules). Os valores de token, ligamento e keep alive
+# acima só criam a agenda inicial quando o arquivo ainda não existe.
+AGENDA_FILE = str(Path(__file__).parent / 'schedules.json')
+AGENDA_RECUPERAR_HORAS = 3  # Execuções perdidas há menos que isso rodam ao reiniciar o sistema
+AGENDA_SINCRONIZAR_SEGUNDOS = 15  # O líder relê a agenda alterada por outros workers
+
+# Painel em tempo real (SSE em /api/eventos): só o líder consulta a API; os painéis leem o estado compartilhado
+STATUS_MONITOR_INTERVALO = 5  # Segundos entre verificações do monitor de status
+STATUS_MAX_IDADE = 30  # Status mais velho que isso (ou invalidado após comandos) é consultado de novo
+STATUS_WORKERS = 6  # Consultas de status em paralelo
+STATUS_STREAM_PRAZO = 12  # Segundos máximos de /api/status/todas/stream (TVs pendentes saem com erro "prazo")
+EVENTOS_INTERVALO = 1  # Segundos entre verificações de mudanças enviadas aos painéis
+EVENTOS_PING = 15  # Segundos sem eventos até enviar um comentário de keep-alive na conexão
+
+# Rastreamento (traces) dos jobs de frota: job → sequência por TV → comandos, HTTP e esperas
+# Exportado em JSON lines (formato Zipkin v2) com rotação por tamanho, um arquivo por worker (traces.<pid>.jsonl)
+RASTREAMENTO_ATIVO = True
+RASTREAMENTO_ARQUIVO = os.getenv("RASTREAMENTO_ARQUIVO", str(Path(__file__).parent / 'traces.jsonl'))
+RASTREAMENTO_MAX_BYTES = 5 * 1024 * 1024
+RASTREAMENTO_BACKUPS = 3
+# Arquivos por worker (traces, logs) sem gravação há mais que isso são apagados ao abrir o arquivo de um worker
+ARQUIVOS_PROCESSO_RETER_DIAS = 7
+
+# Logs: log() só enfileira; uma thread grava em lote no buffer da API, no stdout e em arquivo JSON lines
+# Cada worker grava logs.<pid>.jsonl (rotação por tamanho em cada um); vazio = sem arquivo
+LOG_ARQUIVO = os.getenv("LOG_ARQUIVO", str(Path(__file__).parent / 'logs.jsonl'))
+LOG_MAX_BYTES = 10 * 1024 * 1024  # Tamanho que dispara a rotação do arquivo
+LOG_BACKUPS = 5  # Arquivos rotacionados mantidos por worker (logs.<pid>.jsonl.1 ... .5)
+LOG_FILA_MAX = 10000  # Registros aguardando gravação; além disso são descartados (e contados)
+LOG_LOTE_MAX = 500  # Registros gravados por lote
+LOG_DB = os.getenv("LOG_DB", str(Path(__file__).parent / 'logs.db'))  # Histórico pesquisável (/api/logs/search); vazio = desativado
+LOG_DB_MAX_MB = 50  # Acima disso os registros mais antigos são apagados
+# Tempestades de retry (ex: 409 em todas as TVs): só WARNING/ERROR são agrupados e limitados
+LOG_LIMITE_NIVEIS = ["WARNING", "ERROR"]
+LOG_DEDUPE_JANELA = 30  # Segundos: mensagem idêntica repetida vira uma entrada "repetida Nx"
+LOG_CATEGORIA_TAXA = 1  # Logs por segundo por categoria (mensagem com números trocados por #)
+LOG_CATEGORIA_RAJADA = 20  # Rajada permitida por categoria antes do limite de taxa
 
 # Credenciais Google para renovação de token (do .env)
 GOOGLE_EMAIL = os.getenv("GOOGLE_EMAIL")
@@ -2,9 +2,35 @@
 Classe para interação com a API SmartThings
 """
 
-import time
-import requests
 from utils.logger import log
+from utils.relogio import dormir
+from utils.rastreamento import span
+from utils.limitador import LimitadorCompartilhado
+from utils import cliente_http
+from utils.metricas import Contador
+import config
+
+# Limitadores compartilhados por todas as instâncias e todos os workers (a cota da API é por conta)
+limitador = LimitadorCompartilhado("smartthings_comandos", config.SMARTTHINGS_REQUISICOES_POR_SEGUNDO,
+                                   config.SMARTTHINGS_RAJADA)
+limitador_leituras = LimitadorCompartilhado("smartthings_leituras", config.SMARTTHINGS_LEITURAS_POR_SEGUNDO,
+                                            config.SMARTTHINGS_LEITURAS_RAJADA)
+
+COMANDOS = Contador(
+    "apptvs_smartthings_comandos_total",
+    "Tentativas de comando na SmartThings por capability, comando e status HTTP",
+    ("capability", "comando", "status")
+)
+RETENTATIVAS = Contador(
+    "apptvs_smartthings_retentativas_total",
+    "Novas tentativas de comando após falha",
+    ("capability", "comando")
+)
+CONFLITOS = Contador(
+    "apptvs_smartthings_409_total",
+    "Respostas 409 (dispositivo ocupado/conflito) por capability e comando; persistente = esgotou as tentativas",
+    ("capability", "comando", "persistente")
+)
 
 
 class SmartThingsTV:
@@ -12,7 +38,7 @@ class SmartThingsTV:
     
     def __init__(self, access_token):
         self.access_token = access_token
-        self.base_url = "https://api.smartthings.com/v1"
+        self.base_url = config.SMARTTHINGS_API_URL
         self.headers = {
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json"
@@ -22,7 +48,8 @@ class SmartThingsTV:
         """Obtém o status atual do dispositivo"""
         url = f"{self.base_url}/devices/{device_id}/status"
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            limitador_leituras.aguardar()
+            response = cliente_http.get("smartthings", "status", url, headers=self.headers, timeout=10)
             
             if response.status_code == 200:
                 return response.json()
@@ -38,6 +65,16 @@ class SmartThingsTV:
     
     def _executar_comando_com_retry(self, device_id, capability, command, arguments=None, max_tentativas=5, delay_retry=2):
         """Executa um comando com retry automático em caso de erro"""
+        # Span do comando: as tentativas (HTTP) e esperas entre elas aparecem como filhos no trace
+        with span("smartthings.comando", capability=capability, comando=command,
+                  argumentos=",".join(map(str, arguments)) if arguments else None) as atual:
+            sucesso = self._tentar_comando(device_id, capability, command, arguments, max_tentativas, delay_retry)
+            if atual:
+                atual.definir(sucesso=sucesso)
+            return sucesso
+    
+    def _tentar_comando(self, device_id, capability, command, arguments, max_tentativas, delay_retry):
+        """Loop de tentativas do comando"""
         delays = delay_retry if isinstance(delay_retry, list) else [delay_retry] * (max_tentativas - 1)
         
         for tentativa in range(1, max_tentativas + 1):
@@ -56,7 +93,14 @@ class SmartThingsTV:
             if arguments:
                 payload["commands"][0]["arguments"] = arguments
             
-            response = requests.post(url, headers=self.headers, json=payload)
+            limitador.aguardar()
+            try:
+                response = cliente_http.post("smartthings", f"{capability}.{command}", url,
+                                             headers=self.headers, json=payload)
+            except Exception:
+                COMANDOS.inc(capability=capability, comando=command, status="erro")
+                raise
+            COMANDOS.inc(capability=capability, comando=command, status=response.status_code)
             
             if response.status_code == 200:
                 log(f"✓ Comando '{command}' executado com sucesso", "SUCCESS")
@@ -64,17 +108,22 @@ class SmartThingsTV:
             else:
                 log(f"✗ Tentativa {tentativa}/{max_tentativas} falhou: {response.status_code}", "ERROR")
                 
+                if response.status_code == 409:
+                    CONFLITOS.inc(capability=capability, comando=command,
+                                  persistente="sim" if tentativa >= max_tentativas else "nao")
+                
                 # Se atingir o máximo de tentativas com erro 409, pula para a próxima TV
                 if response.status_code == 409 and tentativa >= max_tentativas:
                     log(f"   ⏭️  PULANDO: Erro 409 persistente após {max_tentativas} tentativas.", "WARNING")
                     log(f"   ⏳ Aguardando 25 segundos antes de continuar...", "INFO")
-                    time.sleep(25)
+                    dormir(25)
                     return False
                 
                 if tentativa < max_tentativas:
                     delay = delays[tentativa - 1] if tentativa - 1 < len(delays) else delays[-1]
                     log(f"   Aguardando {delay}s antes de tentar novamente...", "WARNING")
-                    time.sleep(delay)
+                    dormir(delay)
+                    RETENTATIVAS.inc(capability=capability, comando=command)
                 else:
                     log(f"   Erro final após {max_tentativas} tentativas", "ERROR")
         
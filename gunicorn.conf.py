@@ -0,0 +1,14 @@
+"""
+Configuração do gunicorn (gunicorn -c gunicorn.conf.py wsgi:app)
+"""
+
+import config
+
+bind = f"{config.HOST}:{config.PORT}"
+workers = config.WEB_WORKERS
+worker_class = "gthread"
+threads = config.WEB_THREADS
+# Rotas como toggle em lote respondem rápido, mas status de todas as TVs pode demorar
+timeout = 120
+# Sem preload: as threads (scheduler, outbox, eleição) precisam nascer dentro de cada worker
+preload_app = False
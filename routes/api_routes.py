@@ -2,20 +2,29 @@
 Rotas da API - Endpoints HTTP
 """
 
+import os
+import queue
 import threading
 import json
 from pathlib import Path
-from flask import Blueprint, jsonify, request
-from utils import log, LOGS, LOGS_LOCK
+from flask import Blueprint, Response, jsonify, request
+from utils import log, consultar_logs, obter_logs_suprimidos, ultimo_seq_logs, limpar_logs
+from utils.rastreamento import carregar_trace, listar_traces
+from utils.historico_logs import obter_historico
 import config
 
 
-def create_routes(tv_service, tv_controller, scheduler_service, renovador_token):
+def create_routes(tv_service, tv_controller, scheduler_service, renovador_token, wallpaper_service, eventos_service,
+                  comando_service):
     """Cria e retorna o blueprint com todas as rotas"""
     
     api = Blueprint('api', __name__, url_prefix='/api')
     TOKEN_CONFIG_FILE = Path(__file__).parent.parent / 'token_config.json'
     
+    def flag(nome):
+        """Lê um parâmetro booleano da query string (?nome=1 / ?nome=true)"""
+        return request.args.get(nome, '').lower() in ('1', 'true', 'sim')
+    
     # ========== TVs ==========
     
     @api.route('/tvs')
@@ -86,19 +95,21 @@ def create_routes(tv_service, tv_controller, scheduler_service, renovador_token)
     @api.route('/executar/todas', methods=['GET', 'POST'])
     def executar_todas():
         """Executa a sequência de todas as TVs simultaneamente (COM webhook)"""
-        tv_controller.toggle_todas(enviar_webhook=True)
+        pipeline = flag('pipeline')
+        tv_controller.toggle_todas(enviar_webhook=True, pipeline=pipeline, aguardar_vm=flag('aguardar_vm'))
         return jsonify({
             "success": True,
-            "message": "Sequências de todas as TVs iniciadas (COM webhook para BIs)"
+            "message": f"Sequências de todas as TVs iniciadas (COM webhook para BIs{', modo pipeline' if pipeline else ''})"
         })
     
     @api.route('/religar/todas', methods=['GET', 'POST'])
     def religar_todas():
         """Executa a sequência de todas as TVs simultaneamente (SEM webhook - BIs já ligados)"""
-        tv_controller.toggle_todas(enviar_webhook=False)
+        pipeline = flag('pipeline')
+        tv_controller.toggle_todas(enviar_webhook=False, pipeline=pipeline)
         return jsonify({
             "success": True,
-            "message": "Sequências de todas as TVs iniciadas (SEM webhook - BIs já ligados)"
+            "message": f"Sequências de todas as TVs iniciadas (SEM webhook - BIs já ligados{', modo pipeline' if pipeline else ''})"
         })
     
     @api.route('/desligar/exceto-reuniao', methods=['GET', 'POST'])
@@ -113,6 +124,34 @@ def create_routes(tv_service, tv_controller, scheduler_service, renovador_token)
             "message": "Desligamento em lote iniciado (exceto TVs de reunião)"
         })
     
+    @api.route('/commands', methods=['POST'])
+    def criar_comandos():
+        """
+        Executa comandos em um conjunto de TVs como um único job
+        Body: {"comandos": [{"tv": "TI01", "acao": "ligar", "opcoes": {"webhook": false}}, {"setor": "Financeiro", "acao": "desligar"}]}
+        Ações: toggle, ligar, ligar_sem_bi, desligar, reconectar, abrir_bi, fechar_bi
+        """
+        dados = request.get_json(silent=True)
+        comandos = dados.get("comandos") if isinstance(dados, dict) else dados
+        try:
+            job = comando_service.criar_job(comandos)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        return jsonify({"success": True, "job_id": job["id"], "job": job}), 202
+    
+    @api.route('/commands', methods=['GET'])
+    def listar_comandos():
+        """Lista os jobs de comandos das últimas 24h"""
+        return jsonify({"success": True, "jobs": comando_service.listar_jobs()})
+    
+    @api.route('/commands/<job_id>', methods=['GET'])
+    def obter_comando(job_id):
+        """Retorna o andamento e o resultado por TV de um job"""
+        job = comando_service.obter_job(job_id)
+        if job is None:
+            return jsonify({"success": False, "message": "Job não encontrado"}), 404
+        return jsonify({"success": True, "job": job})
+    
     @api.route('/status/<tv_nome>')
     def obter_status_tv(tv_nome):
         """Obtém o status (ligada/desligada) de uma TV específica"""
@@ -137,28 +176,38 @@ def create_routes(tv_service, tv_controller, scheduler_service, renovador_token)
     
     @api.route('/status/todas')
     def obter_status_todas():
-        """Obtém o status de todas as TVs"""
-        resultados = {}
-        
-        def check_status(nome):
-            status = tv_service.obter_status_tv(nome)
-            if status:
-                resultados[nome] = status
-        
-        threads = []
-        for nome in tv_service.obter_tvs().keys():
-            t = threading.Thread(target=check_status, args=(nome,))
-            threads.append(t)
-            t.start()
-        
-        for t in threads:
-            t.join()
-        
+        """Obtém o status de todas as TVs (cache de até STATUS_MAX_IDADE, mantido pelo monitor de status)"""
         return jsonify({
             "success": True,
-            "status": resultados
+            "status": tv_service.atualizar_status_todas(max_idade=config.STATUS_MAX_IDADE)
         })
     
+    @api.route('/status/todas/stream')
+    def obter_status_todas_stream():
+        """
+        Status de todas as TVs em NDJSON: uma linha por TV assim que ela responde, com a latência da consulta
+        Query: prazo (segundos, padrão STATUS_STREAM_PRAZO), max_idade (reaproveita cache)
+        A última linha resume a consulta: {"fim": true, "total", "respondidas", "duracao_ms"}
+        """
+        try:
+            prazo = float(request.args.get('prazo', config.STATUS_STREAM_PRAZO))
+            max_idade = float(request.args['max_idade']) if request.args.get('max_idade') else None
+        except ValueError:
+            return jsonify({"success": False, "message": "prazo e max_idade devem ser números"}), 400
+        
+        def gerar():
+            respondidas = 0
+            total = 0
+            duracao = 0
+            for linha in tv_service.status_conforme_chegam(prazo, max_idade):
+                total += 1
+                respondidas += "status" in linha
+                duracao = linha["chegada_ms"]
+                yield json.dumps(linha, ensure_ascii=False) + "\n"
+            yield json.dumps({"fim": True, "total": total, "respondidas": respondidas, "duracao_ms": duracao}) + "\n"
+        
+        return Response(gerar(), mimetype='application/x-ndjson', headers={"X-Accel-Buffering": "no"})
+    
     @api.route('/reconnect/<tv_nome>', methods=['POST'])
     def reconnect_tv(tv_nome):
         """Executa a sequência de reconexão: Enter -> Wait 10s -> Enter"""
@@ -197,22 +246,115 @@ def create_routes(tv_service, tv_controller, scheduler_service, renovador_token)
         
         # Usa o webhook_service do tv_controller
         resultado = tv_controller.webhook_service.enviar_comando_wallpaper(tv_nome, base64_image)
+        if resultado:
+            # Mantém o hash usado pelo upload em dia (senão o próximo upload igual seria ignorado)
+            wallpaper_service.registrar_base64(tv_nome, base64_image)
         
         return jsonify({
             "success": resultado,
             "message": f"Wallpaper alterado para {tv_nome}" if resultado else f"Erro ao alterar wallpaper de {tv_nome}"
         })
     
+    def ler_upload_wallpaper():
+        """Valida o upload multipart do wallpaper (campo 'imagem'); retorna (arquivo, erro)"""
+        if request.content_length and request.content_length > config.WALLPAPER_MAX_MB * 1024 * 1024:
+            return None, (jsonify({
+                "success": False,
+                "message": f"Imagem maior que {config.WALLPAPER_MAX_MB} MB"
+            }), 413)
+        
+        arquivo = request.files.get('imagem')
+        if arquivo is None or not arquivo.filename:
+            return None, (jsonify({
+                "success": False,
+                "message": "Imagem não fornecida. Envie multipart/form-data com o campo 'imagem'"
+            }), 400)
+        
+        return arquivo, None
+    
+    @api.route('/wallpaper/<tv_nome>/upload', methods=['POST'])
+    def upload_wallpaper(tv_nome):
+        """Recebe a imagem via upload multipart, redimensiona e envia para a TV (?forcar=1 ignora o hash)"""
+        if not tv_service.tv_existe(tv_nome):
+            return jsonify({
+                "success": False,
+                "message": f"TV {tv_nome} não encontrada"
+            }), 404
+        
+        arquivo, erro = ler_upload_wallpaper()
+        if erro:
+            return erro
+        
+        try:
+            resultado = wallpaper_service.enviar_upload([tv_nome], arquivo.stream, forcar=flag('forcar'))[tv_nome]
+        except Exception as e:
+            log(f"[{tv_nome}] Erro ao processar wallpaper: {e}", "ERROR")
+            return jsonify({
+                "success": False,
+                "message": f"Imagem inválida: {e}"
+            }), 400
+        
+        if resultado.get("ignorado"):
+            mensagem = f"{tv_nome} já está com este wallpaper"
+        elif resultado["success"]:
+            mensagem = f"Wallpaper alterado para {tv_nome}"
+        else:
+            mensagem = f"Erro ao alterar wallpaper de {tv_nome}"
+        
+        return jsonify({
+            **resultado,
+            "message": mensagem
+        })
+    
+    @api.route('/wallpaper/setor/<setor>/upload', methods=['POST'])
+    def upload_wallpaper_setor(setor):
+        """Envia a mesma imagem para todas as TVs de um setor em paralelo"""
+        tvs_setor = list(tv_service.obter_tvs_por_setor().get(setor, {}).keys())
+        if not tvs_setor:
+            return jsonify({
+                "success": False,
+                "message": f"Setor {setor} não encontrado"
+            }), 404
+        
+        arquivo, erro = ler_upload_wallpaper()
+        if erro:
+            return erro
+        
+        try:
+            resultados = wallpaper_service.enviar_upload(tvs_setor, arquivo.stream, forcar=flag('forcar'))
+        except Exception as e:
+            log(f"[WALLPAPER] Erro ao processar wallpaper do setor {setor}: {e}", "ERROR")
+            return jsonify({
+                "success": False,
+                "message": f"Imagem inválida: {e}"
+            }), 400
+        
+        total_sucesso = sum(1 for r in resultados.values() if r.get("success"))
+        return jsonify({
+            "success": total_sucesso == len(resultados),
+            "message": f"Wallpaper aplicado em {total_sucesso}/{len(resultados)} TVs do setor {setor}",
+            "resultados": resultados
+        })
+    
+    @api.route('/bis', methods=['GET'])
+    def listar_bis_todas():
+        """Lista os BIs de todas as TVs (cache, atualizando em paralelo apenas os vencidos)"""
+        resultados = tv_controller.webhook_service.listar_bis_todas(list(tv_service.obter_tvs().keys()))
+        return jsonify({
+            "success": True,
+            "bis": resultados
+        })
+    
     @api.route('/bis/<tv_nome>', methods=['GET'])
     def listar_bis(tv_nome):
-        """Lista os BIs (URLs) atuais de uma TV"""
+        """Lista os BIs (URLs) atuais de uma TV (?forcar=1 ignora o cache)"""
         if not tv_service.tv_existe(tv_nome):
             return jsonify({
                 "success": False,
                 "message": f"TV {tv_nome} não encontrada"
             }), 404
         
-        resultado = tv_controller.webhook_service.listar_bis(tv_nome)
+        resultado = tv_controller.webhook_service.listar_bis(tv_nome, forcar=flag('forcar'))
         return jsonify(resultado)
     
     @api.route('/bis/<tv_nome>', methods=['POST'])
@@ -269,6 +411,31 @@ def create_routes(tv_service, tv_controller, scheduler_service, renovador_token)
         resultado = tv_controller.webhook_service.fechar_bi(tv_nome)
         return jsonify(resultado)
     
+    # ========== Webhooks ==========
+    
+    @api.route('/vm/<tv_nome>/pronta', methods=['POST'])
+    def vm_pronta(tv_nome):
+        """Recebe o sinal de que a máquina virtual da TV terminou de iniciar (callback do n8n)"""
+        if not tv_controller.webhook_service.tv_tem_webhook(tv_nome):
+            return jsonify({
+                "success": False,
+                "message": f"TV {tv_nome} não mapeada para webhook"
+            }), 404
+        
+        tv_controller.webhook_service.marcar_vm_pronta(tv_nome)
+        return jsonify({
+            "success": True,
+            "message": f"Máquina virtual de {tv_nome} marcada como pronta"
+        })
+    
+    @api.route('/webhook/outbox')
+    def status_outbox():
+        """Retorna profundidade da fila e latência de entrega dos webhooks"""
+        return jsonify({
+            "success": True,
+            "outbox": tv_controller.webhook_service.outbox.obter_metricas()
+        })
+    
     # ========== Token ==========
     
     @api.route('/token/config', methods=['GET', 'POST'])
@@ -287,11 +454,9 @@ def create_routes(tv_service, tv_controller, scheduler_service, renovador_token)
                 with open(TOKEN_CONFIG_FILE, 'w') as f:
                     json.dump(config_data, f, indent=4)
                 
-                scheduler_service.parar_scheduler()
-                scheduler_service.iniciar_renovacao_token(horario)
-                scheduler_service.iniciar_scheduler()
+                # Atualiza o agendamento persistido (as demais tarefas continuam agendadas)
+                scheduler_service.configurar_renovacao_token(horario)
                 
-                log(f"[TOKEN] Renovação agendada para {horario}", "SUCCESS")
                 return jsonify({
                     "success": True,
                     "message": f"Renovação agendada para {horario}"
@@ -321,8 +486,6 @@ def create_routes(tv_service, tv_controller, scheduler_service, renovador_token)
                 log("[TOKEN] Iniciando renovação manual...", "INFO")
                 resultado = renovador_token.renovar()
                 if resultado:
-                    import importlib
-                    importlib.reload(config)
                     tv_service.recarregar_token()
                     log("[TOKEN] Renovação concluída!", "SUCCESS")
                 else:
@@ -367,25 +530,202 @@ def create_routes(tv_service, tv_controller, scheduler_service, renovador_token)
                 "error": str(e)
             })
     
+    # ========== Eventos (SSE) ==========
+    
+    @api.route('/eventos')
+    def eventos():
+        """
+        Stream SSE para o painel: status das TVs, sequências em execução, token, novos logs e comandos em lote
+        Eventos: status (apenas TVs alteradas), sequencias, token, logs, comandos (andamento de cada job)
+        Cada painel conectado ocupa uma thread do worker (gthread) enquanto o stream estiver aberto
+        """
+        fila = eventos_service.assinar()
+        
+        def gerar():
+            try:
+                yield "retry: 3000\n\n"
+                while True:
+                    try:
+                        evento, dados = fila.get(timeout=config.EVENTOS_PING)
+                    except queue.Empty:
+                        yield ": ping\n\n"
+                        continue
+                    yield f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+            finally:
+                eventos_service.cancelar(fila)
+        
+        return Response(gerar(), mimetype='text/event-stream', headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        })
+    
+    # ========== Scheduler ==========
+    
+    @api.route('/scheduler/status')
+    def scheduler_status():
+        """Retorna as tarefas agendadas e o atraso de disparo (planejado x real)"""
+        return jsonify({
+            "success": True,
+            "lider": scheduler_service.scheduler_ativo(),
+            "pid": os.getpid(),
+            "tarefas": scheduler_service.obter_metricas()
+        })
+    
+    @api.route('/schedules', methods=['GET'])
+    def listar_schedules():
+        """Lista os agendamentos persistidos com a próxima execução"""
+        return jsonify({
+            "success": True,
+            "agendamentos": scheduler_service.listar_agendamentos()
+        })
+    
+    @api.route('/schedules', methods=['POST'])
+    def criar_schedule():
+        """
+        Cria um agendamento
+        Body: {"tipo": "ligar_tvs", "horario": "06:10", "setor": "TI", "dias_uteis": true}
+        Tipos: ligar_tvs, renovar_token (horario) e keep_alive (intervalo_minutos)
+        """
+        try:
+            agendamento = scheduler_service.criar_agendamento(request.get_json() or {})
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        return jsonify({"success": True, "agendamento": agendamento}), 201
+    
+    @api.route('/schedules/<agendamento_id>', methods=['GET'])
+    def obter_schedule(agendamento_id):
+        """Retorna um agendamento"""
+        agendamento = scheduler_service.obter_agendamento(agendamento_id)
+        if agendamento is None:
+            return jsonify({"success": False, "message": "Agendamento não encontrado"}), 404
+        return jsonify({"success": True, "agendamento": agendamento})
+    
+    @api.route('/schedules/<agendamento_id>', methods=['PUT', 'PATCH'])
+    def atualizar_schedule(agendamento_id):
+        """Atualiza campos de um agendamento (ex: {"horario": "06:30"} ou {"ativo": false})"""
+        try:
+            agendamento = scheduler_service.atualizar_agendamento(agendamento_id, request.get_json() or {})
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        if agendamento is None:
+            return jsonify({"success": False, "message": "Agendamento não encontrado"}), 404
+        return jsonify({"success": True, "agendamento": agendamento})
+    
+    @api.route('/schedules/<agendamento_id>', methods=['DELETE'])
+    def remover_schedule(agendamento_id):
+        """Remove um agendamento"""
+        if not scheduler_service.remover_agendamento(agendamento_id):
+            return jsonify({"success": False, "message": "Agendamento não encontrado"}), 404
+        return jsonify({"success": True})
+    
+    @api.route('/keep-alive/status')
+    def keep_alive_status():
+        """Retorna tempo e contagem de execuções/pulos/falhas do keep alive por TV"""
+        return jsonify({
+            "success": True,
+            "tvs": scheduler_service.obter_status_keep_alive()
+        })
+    
+    # ========== Traces ==========
+    
+    @api.route('/traces')
+    def obter_traces():
+        """Lista os traces (jobs de frota) mais recentes"""
+        try:
+            limite = int(request.args.get('limite', 20))
+        except ValueError:
+            return jsonify({"success": False, "message": "limite deve ser um número"}), 400
+        return jsonify({"success": True, "traces": listar_traces(limite)})
+    
+    @api.route('/traces/<trace_id>')
+    def obter_trace(trace_id):
+        """Spans do trace no formato Zipkin v2 (importável na UI do Zipkin)"""
+        spans = carregar_trace(trace_id)
+        if not spans:
+            return jsonify({"success": False, "message": f"Trace {trace_id} não encontrado"}), 404
+        return jsonify(spans)
+    
     # ========== Logs ==========
     
     @api.route('/logs')
     def obter_logs():
-        """Retorna os logs do sistema"""
-        with LOGS_LOCK:
-            logs_list = list(LOGS)
+        """
+        Retorna os logs do sistema
+        Query: since (seq, só logs mais novos), nivel (ex: ERROR,WARNING), tv, de/ate (YYYY-MM-DD HH:MM:SS), limite,
+        trace (trace_id do job de frota)
+        Responde 304 se nenhum log novo foi emitido desde o ETag informado
+        """
+        try:
+            desde = int(request.args.get('since', 0))
+            limite = int(request.args['limite']) if request.args.get('limite') else None
+        except ValueError:
+            return jsonify({"success": False, "message": "since e limite devem ser números"}), 400
+        
+        tipos = {t.strip().upper() for t in request.args.get('nivel', '').split(',') if t.strip()}
+        inicio = request.args.get('de', '').replace('T', ' ') or None
+        fim = request.args.get('ate', '').replace('T', ' ') or None
+        
+        # A resposta de uma mesma URL só muda quando um novo log é emitido
+        etag = f"logs-{ultimo_seq_logs()}"
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers={"ETag": f'"{etag}"'})
+        
+        logs_list, ultimo_seq = consultar_logs(desde, tipos, request.args.get('tv'), inicio, fim, limite,
+                                               request.args.get('trace'))
+        resposta = jsonify({
+            "success": True,
+            "logs": logs_list,
+            "total": len(logs_list),
+            "ultimo_seq": ultimo_seq
+        })
+        resposta.set_etag(etag)
+        return resposta
+    
+    @api.route('/logs/search')
+    def buscar_logs():
+        """
+        Busca no histórico persistente de logs (mais recentes primeiro)
+        Query: q (palavras; termo* = prefixo), nivel, tv (origem [..] da mensagem), de/ate, trace,
+        limite (máx. 500), cursor (proximo_cursor da página anterior)
+        """
+        historico = obter_historico()
+        if historico is None:
+            return jsonify({"success": False, "message": "Histórico de logs desativado (LOG_DB)"}), 404
+        try:
+            limite = min(int(request.args.get('limite', 50)), 500)
+            cursor = int(request.args['cursor']) if request.args.get('cursor') else None
+        except ValueError:
+            return jsonify({"success": False, "message": "limite e cursor devem ser números"}), 400
         
+        tipos = {t.strip().upper() for t in request.args.get('nivel', '').split(',') if t.strip()}
+        try:
+            resultado = historico.buscar(
+                texto=request.args.get('q'),
+                tipos=tipos,
+                origem=request.args.get('tv'),
+                inicio=request.args.get('de', '').replace('T', ' ') or None,
+                fim=request.args.get('ate', '').replace('T', ' ') or None,
+                trace=request.args.get('trace'),
+                antes_de=cursor,
+                limite=max(limite, 1)
+            )
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        return jsonify({"success": True, "total": len(resultado["logs"]), **resultado})
+    
+    @api.route('/logs/suprimidos')
+    def logs_suprimidos():
+        """Logs agrupados (repetidos na janela) ou limitados por taxa, por categoria, neste worker"""
         return jsonify({
             "success": True,
-            "logs": logs_list,
-            "total": len(logs_list)
+            "janela_segundos": config.LOG_DEDUPE_JANELA,
+            "categorias": obter_logs_suprimidos()
         })
     
     @api.route('/logs/limpar', methods=['POST'])
-    def limpar_logs():
-        """Limpa todos os logs"""
-        with LOGS_LOCK:
-            LOGS.clear()
+    def limpar_logs_painel():
+        """Limpa os logs do painel em todos os workers (o histórico de /logs/search é mantido)"""
+        limpar_logs()
         log("Logs limpos pelo usuário", "INFO")
         
         return jsonify({
@@ -0,0 +1,67 @@
+"""
+Rotas de Métricas
+Expõe /metrics no formato do Prometheus e mede as requisições de todas as rotas
+"""
+
+import threading
+import time
+from flask import Blueprint, Response, g, request
+from utils.executor import obter_executor
+from utils.estado_compartilhado import obter_estado
+from utils.metricas import Contador, Histograma, iniciar_publicacao_metricas, medidor, renderizar_metricas
+
+
+REQUISICOES = Contador(
+    "apptvs_http_requisicoes_total",
+    "Requisições recebidas por método, rota e status HTTP",
+    ("metodo", "rota", "status")
+)
+DURACAO = Histograma(
+    "apptvs_http_requisicao_duracao_segundos",
+    "Tempo de resposta das rotas (em streams, até o início da resposta)",
+    ("metodo", "rota")
+)
+
+
+def create_metricas_routes(scheduler_service, webhook_service):
+    """Cria blueprint com /metrics e registra os medidores calculados na coleta"""
+    
+    metricas = Blueprint('metricas', __name__)
+    estado = obter_estado()
+    
+    medidor("apptvs_threads_ativas", "Threads vivas no processo", threading.active_count)
+    medidor("apptvs_executor_fila", "Tarefas aguardando no pool compartilhado",
+            lambda: obter_executor()._work_queue.qsize())
+    medidor("apptvs_agendador_tarefas_em_execucao", "Tarefas agendadas executando agora neste processo",
+            scheduler_service.agendador.em_execucao)
+    medidor("apptvs_sequencias_em_execucao", "TVs com sequência de comandos em andamento (todos os workers)",
+            lambda: len(estado.listar("sequencia")), compartilhado=True)
+    medidor("apptvs_comandos_jobs_em_execucao", "Jobs de comandos em lote ainda em execução (todos os workers)",
+            lambda: sum(1 for job in estado.listar("comando").values() if job.get("status") == "em_execucao"),
+            compartilhado=True)
+    medidor("apptvs_webhook_outbox_pendentes", "Webhooks pendentes no outbox",
+            lambda: webhook_service.outbox.obter_metricas()["profundidade"], compartilhado=True)
+    
+    # Publica as séries deste worker para que /metrics em qualquer worker devolva as de todos
+    iniciar_publicacao_metricas()
+    
+    @metricas.before_app_request
+    def iniciar_medicao():
+        g.inicio_requisicao = time.perf_counter()
+    
+    @metricas.after_app_request
+    def registrar_requisicao(response):
+        inicio = g.pop('inicio_requisicao', None)
+        if inicio is not None:
+            # Usa o padrão da rota (/api/tv/<tv_nome>) para não criar uma série por TV
+            rota = request.url_rule.rule if request.url_rule else "nao_encontrada"
+            REQUISICOES.inc(metodo=request.method, rota=rota, status=response.status_code)
+            DURACAO.observar(time.perf_counter() - inicio, metodo=request.method, rota=rota)
+        return response
+    
+    @metricas.route('/metrics')
+    def metrics():
+        """Métricas de todos os workers no formato de exposição do Prometheus (séries por processo com rótulo worker)"""
+        return Response(renderizar_metricas(), mimetype='text/plain; version=0.0.4')
+    
+    return metricas
@@ -6,10 +6,16 @@ from .tv_service import TVService
 from .webhook_service import WebhookService
 from .scheduler_service import SchedulerService
 from .whatsapp_service import WhatsAppService
+from .wallpaper_service import WallpaperService
+from .eventos_service import EventosService
+from .comando_service import ComandoService
 
 __all__ = [
     'TVService',
     'WebhookService',
     'SchedulerService',
-    'WhatsAppService'
+    'WhatsAppService',
+    'WallpaperService',
+    'EventosService',
+    'ComandoService'
 ]
@@ -0,0 +1,233 @@
+"""
+Armazenamento da Agenda
+Persiste os agendamentos (ligar TVs, renovar token, keep alive) em arquivo JSON
+"""
+
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from utils import log
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+TIPO_LIGAR_TVS = "ligar_tvs"
+TIPO_RENOVAR_TOKEN = "renovar_token"
+TIPO_KEEP_ALIVE = "keep_alive"
+TIPOS = (TIPO_LIGAR_TVS, TIPO_RENOVAR_TOKEN, TIPO_KEEP_ALIVE)
+
+CAMPOS = ("tipo", "horario", "intervalo_minutos", "setor", "dias_uteis", "ativo", "recuperar_perdidos")
+
+
+class AgendaStore:
+    """CRUD de agendamentos persistidos em JSON"""
+    
+    def __init__(self, arquivo: str):
+        self.arquivo = Path(arquivo)
+        self.arquivo_trava = self.arquivo.with_name(self.arquivo.name + ".lock")
+        self._lock = threading.Lock()
+        # Identifica a versão do arquivo lida por último: (inode, mtime, tamanho)
+        self._assinatura = None
+        # Incrementada quando o arquivo foi alterado por outro processo (outro worker)
+        self.versao_externa = 0
+        agendamentos, self._assinatura = self._carregar()
+        self._agendamentos: Dict[str, Dict] = agendamentos or {}
+    
+    @contextmanager
+    def _trava_arquivo(self):
+        """Trava exclusiva entre processos durante leitura-alteração-gravação do arquivo"""
+        fd = os.open(self.arquivo_trava, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+    
+    @staticmethod
+    def _assinatura_de(stat: os.stat_result) -> Tuple[int, int, int]:
+        """Identifica uma versão do arquivo (a troca atômica gera um novo inode)"""
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+    
+    def _carregar(self) -> Tuple[Optional[Dict[str, Dict]], Optional[Tuple]]:
+        """Lê os agendamentos do arquivo; retorna (None, None) se ausente ou inválido"""
+        try:
+            with open(self.arquivo, 'r', encoding='utf-8') as f:
+                assinatura = self._assinatura_de(os.fstat(f.fileno()))
+                return {a["id"]: a for a in json.load(f)}, assinatura
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log(f"[AGENDA] Erro ao carregar {self.arquivo.name}: {e}", "ERROR")
+        return None, None
+    
+    def _salvar(self):
+        """Grava os agendamentos em um temporário e o troca pelo arquivo (chamar com as travas adquiridas)"""
+        temporario = self.arquivo.with_name(f"{self.arquivo.name}.{os.getpid()}.tmp")
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(list(self._agendamentos.values()), f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        # Troca atômica: leitores veem o arquivo antigo ou o novo, nunca um arquivo pela metade
+        os.replace(temporario, self.arquivo)
+        self._assinatura = self._assinatura_de(self.arquivo.stat())
+    
+    def _sincronizar(self, forcar: bool = False):
+        """
+        Relê o arquivo se outro processo o alterou (chamar com o lock adquirido)
+        
+        Args:
+            forcar: Relê mesmo com a assinatura igual (antes de gravar, com a trava do arquivo)
+        """
+        try:
+            assinatura = self._assinatura_de(self.arquivo.stat())
+        except FileNotFoundError:
+            return
+        if assinatura == self._assinatura and not forcar:
+            return
+        
+        agendamentos, assinatura = self._carregar()
+        if agendamentos is None:
+            # Arquivo inválido: mantém o último estado bom (e tenta de novo na próxima leitura)
+            return
+        self._assinatura = assinatura
+        if agendamentos != self._agendamentos:
+            self._agendamentos = agendamentos
+            self.versao_externa += 1
+    
+    @contextmanager
+    def _alterar(self):
+        """Lock local + trava do arquivo, com os agendamentos relidos do disco (nenhuma gravação se perde)"""
+        with self._lock, self._trava_arquivo():
+            self._sincronizar(forcar=True)
+            yield
+    
+    def sincronizar(self) -> int:
+        """Relê o arquivo se alterado externamente; retorna a versão externa atual"""
+        with self._lock:
+            self._sincronizar()
+            return self.versao_externa
+    
+    @staticmethod
+    def validar(dados: Dict) -> Dict:
+        """Valida e normaliza um agendamento; lança ValueError com a mensagem do problema"""
+        tipo = dados.get("tipo")
+        if tipo not in TIPOS:
+            raise ValueError(f"Tipo inválido. Use um de: {', '.join(TIPOS)}")
+        
+        agendamento = {
+            "tipo": tipo,
+            "horario": None,
+            "intervalo_minutos": None,
+            "setor": None,
+            "dias_uteis": bool(dados.get("dias_uteis", tipo == TIPO_LIGAR_TVS)),
+            "ativo": bool(dados.get("ativo", True)),
+            "recuperar_perdidos": bool(dados.get("recuperar_perdidos", tipo != TIPO_KEEP_ALIVE))
+        }
+        
+        if tipo == TIPO_KEEP_ALIVE:
+            try:
+                intervalo = float(dados.get("intervalo_minutos"))
+            except (TypeError, ValueError):
+                raise ValueError("intervalo_minutos é obrigatório para keep_alive")
+            if intervalo <= 0:
+                raise ValueError("intervalo_minutos deve ser maior que zero")
+            agendamento["intervalo_minutos"] = intervalo
+            agendamento["recuperar_perdidos"] = False
+        else:
+            horario = dados.get("horario")
+            try:
+                datetime.strptime(horario or "", "%H:%M")
+            except ValueError:
+                raise ValueError("Horário inválido! Use formato HH:MM")
+            agendamento["horario"] = horario
+        
+        if tipo == TIPO_LIGAR_TVS and dados.get("setor"):
+            agendamento["setor"] = str(dados["setor"])
+        
+        return agendamento
+    
+    def listar(self) -> List[Dict]:
+        """Retorna todos os agendamentos"""
+        with self._lock:
+            self._sincronizar()
+            return [dict(a) for a in self._agendamentos.values()]
+    
+    def obter(self, agendamento_id: str) -> Optional[Dict]:
+        """Retorna um agendamento pelo ID"""
+        with self._lock:
+            self._sincronizar()
+            agendamento = self._agendamentos.get(agendamento_id)
+            return dict(agendamento) if agendamento else None
+    
+    def criar(self, dados: Dict) -> Dict:
+        """Cria um agendamento (ID gerado se não informado)"""
+        agendamento = self.validar(dados)
+        with self._alterar():
+            agendamento_id = str(dados.get("id") or uuid.uuid4().hex[:8])
+            if agendamento_id in self._agendamentos:
+                raise ValueError(f"Agendamento {agendamento_id} já existe")
+            if agendamento["tipo"] == TIPO_KEEP_ALIVE and any(
+                    a["tipo"] == TIPO_KEEP_ALIVE for a in self._agendamentos.values()):
+                raise ValueError("Já existe um agendamento de keep_alive")
+            agendamento.update({
+                "id": agendamento_id,
+                "criado_em": datetime.now().isoformat(timespec='seconds'),
+                "ultima_execucao": None
+            })
+            self._agendamentos[agendamento_id] = agendamento
+            self._salvar()
+            return dict(agendamento)
+    
+    def atualizar(self, agendamento_id: str, dados: Dict) -> Optional[Dict]:
+        """Atualiza campos de um agendamento; retorna None se não existir"""
+        with self._alterar():
+            atual = self._agendamentos.get(agendamento_id)
+            if atual is None:
+                return None
+            mesclado = {**atual, **{k: v for k, v in dados.items() if k in CAMPOS}}
+            agendamento = self.validar(mesclado)
+            if agendamento["tipo"] == TIPO_KEEP_ALIVE and any(
+                    a["tipo"] == TIPO_KEEP_ALIVE and a["id"] != agendamento_id for a in self._agendamentos.values()):
+                raise ValueError("Já existe um agendamento de keep_alive")
+            agendamento.update({
+                "id": agendamento_id,
+                "criado_em": atual.get("criado_em"),
+                "ultima_execucao": atual.get("ultima_execucao")
+            })
+            self._agendamentos[agendamento_id] = agendamento
+            self._salvar()
+            return dict(agendamento)
+    
+    def remover(self, agendamento_id: str) -> bool:
+        """Remove um agendamento"""
+        with self._alterar():
+            if self._agendamentos.pop(agendamento_id, None) is None:
+                return False
+            self._salvar()
+            return True
+    
+    def registrar_execucao(self, agendamento_id: str, instante: datetime):
+        """Grava o horário da última execução (usado na recuperação de execuções perdidas)"""
+        with self._alterar():
+            if agendamento_id in self._agendamentos:
+                self._agendamentos[agendamento_id]["ultima_execucao"] = instante.isoformat(timespec='seconds')
+                self._salvar()
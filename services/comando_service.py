@@ -0,0 +1,205 @@
+"""
+Serviço de Comandos em Lote
+Executa ações em conjuntos arbitrários de TVs (por nome ou setor) como um único job
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+import config
+from utils import log
+from utils.executor import obter_executor
+from utils.estado_compartilhado import obter_estado
+from utils.rastreamento import Span, iniciar_span, propagar, span
+
+
+# Jobs ficam no estado compartilhado por 24h (consultáveis em qualquer worker)
+JOB_TTL = 24 * 3600
+# Andamento resumido dos jobs para os painéis (SSE), só enquanto é recente
+PROGRESSO_TTL = 10 * 60
+
+
+class ComandoService:
+    """
+    Valida, agenda e acompanha comandos em lote
+    Cada TV do job vira uma tarefa no pool compartilhado; as chamadas à SmartThings
+    passam pelo limitador de taxa global do cliente. O andamento vai aos painéis pelo EventosService
+    """
+    
+    def __init__(self, tv_service, tv_controller, eventos_service=None):
+        self.tv_service = tv_service
+        self.tv_controller = tv_controller
+        self.eventos_service = eventos_service
+        self.estado = obter_estado()
+        self._job_lock = threading.Lock()
+        # Span raiz de cada job em andamento neste worker (encerrado quando o último alvo termina)
+        self._spans: Dict[str, Span] = {}
+        
+        webhook = tv_controller.webhook_service
+        self.acoes = {
+            "toggle": lambda tv, op: tv_controller.toggle_tv(tv),
+            "ligar": lambda tv, op: tv_controller.ligar_tv(tv, op.get("webhook", True), op.get("aguardar_vm", False)),
+            "ligar_sem_bi": lambda tv, op: tv_controller.ligar_tv(tv, False),
+            "desligar": lambda tv, op: tv_controller.desligar_tv(tv),
+            "reconectar": lambda tv, op: tv_controller.reconectar_tv(tv),
+            "abrir_bi": lambda tv, op: webhook.abrir_bi(tv).get("success", False),
+            "fechar_bi": lambda tv, op: webhook.fechar_bi(tv).get("success", False),
+        }
+    
+    def _reagendar_tv(self, job: Dict, tv_nome: str, indices: List[int]):
+        """
+        TV ocupada por outro comando (em qualquer worker): devolve os comandos dela ao pool
+        após COMANDO_TV_ESPERA, sem prender uma thread do pool esperando
+        """
+        raiz = self._spans.get(job["id"])
+        timer = threading.Timer(config.COMANDO_TV_ESPERA / config.RELOGIO_ESCALA, obter_executor().submit,
+                                args=(propagar(self._executar_tv, raiz), job, tv_nome, indices, True))
+        timer.daemon = True
+        timer.start()
+    
+    def _expandir(self, comandos: List[Dict]) -> List[Dict]:
+        """Transforma [{tv|setor, acao, opcoes}] em alvos individuais; lança ValueError se inválido"""
+        if not isinstance(comandos, list) or not comandos:
+            raise ValueError("Informe uma lista de comandos: [{\"tv\" ou \"setor\", \"acao\", \"opcoes\"}]")
+        
+        tvs = self.tv_service.obter_tvs()
+        alvos = []
+        for comando in comandos:
+            if not isinstance(comando, dict):
+                raise ValueError("Cada comando deve ser um objeto {\"tv\" ou \"setor\", \"acao\", \"opcoes\"}")
+            acao = comando.get("acao")
+            if acao not in self.acoes:
+                raise ValueError(f"Ação inválida: {acao}. Use uma de: {', '.join(self.acoes)}")
+            opcoes = comando.get("opcoes") or {}
+            
+            if comando.get("tv"):
+                if comando["tv"] not in tvs:
+                    raise ValueError(f"TV {comando['tv']} não encontrada")
+                nomes = [comando["tv"]]
+            elif comando.get("setor"):
+                nomes = [nome for nome, info in tvs.items() if info.get("setor") == comando["setor"]]
+                if not nomes:
+                    raise ValueError(f"Nenhuma TV no setor {comando['setor']}")
+            else:
+                raise ValueError("Cada comando precisa de \"tv\" ou \"setor\"")
+            
+            alvos.extend({"tv": nome, "acao": acao, "opcoes": opcoes} for nome in nomes)
+        return alvos
+    
+    def criar_job(self, comandos: List[Dict]) -> Dict:
+        """Cria o job e despacha uma tarefa por TV no pool compartilhado"""
+        alvos = self._expandir(comandos)
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "criado_em": datetime.now().isoformat(timespec='seconds'),
+            "finalizado_em": None,
+            "status": "em_execucao",
+            "worker": os.getpid(),
+            "alvos": [
+                {**alvo, "status": "pendente", "sucesso": None, "erro": None, "duracao_segundos": None}
+                for alvo in alvos
+            ]
+        }
+        self._salvar(job)
+        resposta = {**job, "alvos": [dict(alvo) for alvo in job["alvos"]]}
+        log(f"[COMANDOS] Job {job['id']}: {len(alvos)} comando(s) em {len({a['tv'] for a in alvos})} TV(s)", "INFO")
+        
+        raiz = iniciar_span("comandos.job", job=job["id"], alvos=len(alvos))
+        if raiz:
+            self._spans[job["id"]] = raiz
+        
+        # Comandos da mesma TV rodam em sequência, na ordem pedida; TVs diferentes em paralelo
+        por_tv = defaultdict(list)
+        for indice, alvo in enumerate(alvos):
+            por_tv[alvo["tv"]].append(indice)
+        for tv_nome, indices in por_tv.items():
+            obter_executor().submit(propagar(self._executar_tv, raiz), job, tv_nome, indices)
+        return resposta
+    
+    def _salvar(self, job: Dict):
+        """Grava o job no estado compartilhado e publica o andamento para os painéis"""
+        self.estado.definir("comando", job["id"], job, ttl=JOB_TTL)
+        progresso = self._progresso(job)
+        # Painéis conectados a outros workers recebem pelo estado compartilhado
+        self.estado.definir("comando_progresso", job["id"], progresso, ttl=PROGRESSO_TTL)
+        if self.eventos_service:
+            self.eventos_service.publicar_job(progresso)
+    
+    @staticmethod
+    def _progresso(job: Dict) -> Dict:
+        """Resumo do job para o painel: totais e contagem de concluídos/falhas por TV"""
+        tvs = {}
+        for alvo in job["alvos"]:
+            contagem = tvs.setdefault(alvo["tv"], {"total": 0, "ok": 0, "falha": 0})
+            contagem["total"] += 1
+            if alvo["status"] in ("ok", "falha"):
+                contagem[alvo["status"]] += 1
+        return {
+            "id": job["id"],
+            "status": job["status"],
+            "total": len(job["alvos"]),
+            "ok": sum(c["ok"] for c in tvs.values()),
+            "falhas": sum(c["falha"] for c in tvs.values()),
+            "tvs": tvs
+        }
+    
+    def _atualizar_alvo(self, job: Dict, indice: int, **campos):
+        """Atualiza um alvo e grava o job; finaliza o job quando todos os alvos terminam"""
+        with self._job_lock:
+            job["alvos"][indice].update(campos)
+            if all(a["status"] in ("ok", "falha") for a in job["alvos"]):
+                job["status"] = "concluido"
+                job["finalizado_em"] = datetime.now().isoformat(timespec='seconds')
+                falhas = sum(a["status"] == "falha" for a in job["alvos"])
+                log(f"[COMANDOS] Job {job['id']} concluído ({len(job['alvos']) - falhas} ok, {falhas} falha(s))",
+                    "SUCCESS" if not falhas else "WARNING")
+                raiz = self._spans.pop(job["id"], None)
+                if raiz:
+                    raiz.finalizar(f"{falhas} falha(s)" if falhas else None)
+            self._salvar(job)
+    
+    def _executar_tv(self, job: Dict, tv_nome: str, indices: List[int], reagendado: bool = False):
+        """Executa os comandos de uma TV do job, com a TV reservada (exclusão mútua entre comandos e workers)"""
+        if not self.tv_controller.reservar_tv(tv_nome, {"job": job["id"], "worker": os.getpid()}):
+            if not reagendado:
+                ocupante = self.tv_controller.ocupante_tv(tv_nome) or {}
+                origem = f"o job {ocupante['job']}" if ocupante.get("job") else "outro comando"
+                log(f"[COMANDOS] {tv_nome}: aguardando {origem} liberar a TV", "INFO")
+            self._reagendar_tv(job, tv_nome, indices)
+            return
+        try:
+            for indice in indices:
+                alvo = job["alvos"][indice]
+                self._atualizar_alvo(job, indice, status="executando")
+                inicio = time.time()
+                try:
+                    with span("comando", tv=tv_nome, acao=alvo["acao"]):
+                        sucesso = bool(self.acoes[alvo["acao"]](tv_nome, alvo["opcoes"]))
+                    erro = None if sucesso else "comando retornou falha"
+                except Exception as e:
+                    sucesso, erro = False, str(e)
+                    log(f"[COMANDOS] {tv_nome}: erro em '{alvo['acao']}': {e}", "ERROR")
+                self._atualizar_alvo(job, indice, status="ok" if sucesso else "falha", sucesso=sucesso,
+                                     erro=erro, duracao_segundos=round(time.time() - inicio, 2))
+        finally:
+            self.tv_controller.liberar_tv(tv_nome)
+    
+    def obter_job(self, job_id: str) -> Optional[Dict]:
+        """Retorna um job (de qualquer worker)"""
+        return self.estado.obter("comando", job_id)
+    
+    def listar_jobs(self) -> List[Dict]:
+        """Retorna os jobs das últimas 24h, mais recentes primeiro (sem os alvos)"""
+        jobs = sorted(self.estado.listar("comando").values(), key=lambda j: j["criado_em"], reverse=True)
+        return [{
+            "id": j["id"],
+            "criado_em": j["criado_em"],
+            "finalizado_em": j["finalizado_em"],
+            "status": j["status"],
+            "total": len(j["alvos"]),
+            "falhas": sum(a["status"] == "falha" for a in j["alvos"])
+        } for j in jobs]
@@ -0,0 +1,131 @@
+"""
+Serviço de Eventos
+Envia aos painéis conectados (SSE) as mudanças de status, sequências, token, logs e comandos em lote
+"""
+
+import json
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+from utils import log, consultar_logs
+from utils.estado_compartilhado import obter_estado
+import config
+
+
+TOKEN_STATUS_FILE = Path(__file__).parent.parent / 'token_status.json'
+
+
+class EventosService:
+    """
+    Difusor de eventos: uma única thread por worker lê o estado compartilhado
+    (preenchido pelo monitor de status do líder) e repassa só as mudanças para cada painel
+    """
+    
+    def __init__(self):
+        self.estado = obter_estado()
+        self._assinantes: List[queue.Queue] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._status = {}
+        self._sequencias = []
+        self._jobs = {}
+        self._token = None
+        self._token_mtime = None
+        self._ultimo_log = 0
+    
+    def assinar(self) -> queue.Queue:
+        """Registra um painel; a fila já começa com o estado atual completo"""
+        fila = queue.Queue(maxsize=200)
+        with self._lock:
+            if not self._assinantes:
+                # Primeiro painel: sincroniza o estado antes de iniciar a difusão
+                self._verificar_mudancas()
+            fila.put(("status", dict(self._status)))
+            fila.put(("sequencias", {"em_execucao": self._sequencias}))
+            if self._token is not None:
+                fila.put(("token", self._token))
+            self._assinantes.append(fila)
+            
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+        return fila
+    
+    def cancelar(self, fila: queue.Queue):
+        """Remove um painel desconectado"""
+        with self._lock:
+            if fila in self._assinantes:
+                self._assinantes.remove(fila)
+    
+    def _publicar(self, evento: str, dados):
+        """Entrega um evento a todos os painéis (chamar com o lock adquirido)"""
+        for fila in list(self._assinantes):
+            try:
+                fila.put_nowait((evento, dados))
+            except queue.Full:
+                # Painel que não consome (aba suspensa): desconecta; o navegador reconecta sozinho
+                self._assinantes.remove(fila)
+                log("[EVENTOS] Painel lento desconectado", "WARNING")
+    
+    def publicar_job(self, progresso: dict):
+        """Publica o andamento de um job de comandos em lote (chamado pelo ComandoService deste worker)"""
+        with self._lock:
+            if self._jobs.get(progresso["id"]) != progresso:
+                self._jobs[progresso["id"]] = progresso
+                self._publicar("comandos", progresso)
+    
+    def _verificar_mudancas(self):
+        """Compara o estado compartilhado com o último enviado e publica as diferenças (com o lock)"""
+        status = self.estado.listar("status")
+        alterados = {nome: s for nome, s in status.items() if self._status.get(nome) != s}
+        if alterados:
+            self._status.update(alterados)
+            self._publicar("status", alterados)
+        
+        sequencias = sorted(self.estado.listar("sequencia"))
+        if sequencias != self._sequencias:
+            self._sequencias = sequencias
+            self._publicar("sequencias", {"em_execucao": sequencias})
+        
+        # Jobs de outros workers chegam pelo estado compartilhado (os deste, também direto por publicar_job)
+        jobs = self.estado.listar("comando_progresso")
+        for job_id, progresso in jobs.items():
+            if self._jobs.get(job_id) != progresso:
+                self._jobs[job_id] = progresso
+                self._publicar("comandos", progresso)
+        for job_id in set(self._jobs) - set(jobs):
+            del self._jobs[job_id]
+        
+        try:
+            mtime = TOKEN_STATUS_FILE.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime is not None and mtime != self._token_mtime:
+            self._token_mtime = mtime
+            try:
+                with open(TOKEN_STATUS_FILE, 'r') as f:
+                    self._token = json.load(f)
+                self._publicar("token", self._token)
+            except (OSError, ValueError):
+                pass
+        
+        # Do histórico compartilhado (logs.db): o painel recebe os logs de todos os workers, não só deste
+        novos, _ = consultar_logs(self._ultimo_log)
+        if novos:
+            self._ultimo_log = novos[-1]["seq"]
+            self._publicar("logs", novos)
+    
+    def _loop(self):
+        """Verifica mudanças enquanto houver painéis conectados"""
+        while True:
+            time.sleep(config.EVENTOS_INTERVALO)
+            with self._lock:
+                if not self._assinantes:
+                    self._thread = None
+                    return
+                try:
+                    self._verificar_mudancas()
+                except Exception as e:
+                    log(f"[EVENTOS] Erro ao verificar mudanças: {e}", "ERROR")
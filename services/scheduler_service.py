@@ -1,20 +1,342 @@
 """
 Serviço de Agendamento
-Gerencia tarefas agendadas (renovação de token, keep alive)
+Gerencia tarefas agendadas (renovação de token, keep alive, ligamento automático)
 """
 
-import schedule
+import heapq
+import itertools
 import threading
 import time
-import importlib
+from datetime import datetime, timedelta
+from functools import partial
 from typing import Optional, Callable
 from utils import log
+from utils.executor import obter_executor, obter_pool
+from utils.metricas import Contador, Histograma
+from utils.estado_compartilhado import obter_estado
+from utils.token_acesso import obter_token
 from utils.renovador_token import RenovadorTokenSmartThings
 from controllers import SmartThingsTV
 from controllers.tv_control import pressionar_enter
+from .agenda_store import AgendaStore, TIPO_LIGAR_TVS, TIPO_RENOVAR_TOKEN, TIPO_KEEP_ALIVE
 import config
 
 
+# Políticas para quando uma tarefa vence enquanto a execução anterior ainda está rodando
+POLITICA_PULAR = "pular"  # Descarta a nova execução
+POLITICA_ENFILEIRAR = "enfileirar"  # Executa todas as pendentes em sequência
+POLITICA_COALESCER = "coalescer"  # Junta as pendentes em uma única execução
+POLITICAS = (POLITICA_PULAR, POLITICA_ENFILEIRAR, POLITICA_COALESCER)
+
+
+class _Tarefa:
+    """Tarefa agendada (diária em um horário ou periódica em segundos)"""
+    
+    def __init__(self, nome: str, funcao: Callable, horario: Optional[str] = None, intervalo: Optional[float] = None,
+                 politica: str = POLITICA_PULAR, tempo_maximo: Optional[float] = None, pool: Optional[str] = None):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política inválida: {politica}")
+        self.nome = nome
+        self.funcao = funcao
+        self.horario = horario
+        self.intervalo = intervalo
+        self.politica = politica
+        self.tempo_maximo = tempo_maximo
+        self.pool = pool
+        self.cancelada = False
+        # Controle de sobreposição (protegido pela condição do Agendador)
+        self.execucao_atual = 0
+        self.inicio_execucao = None
+        self.pendentes = 0
+        # Execuções liberadas pelo tempo máximo que ainda ocupam um worker do pool
+        self.abandonadas = set()
+        self.puladas = 0
+        self.estouros = 0
+        self.ultima_duracao = None
+        self.proxima = 0.0
+        self.execucoes = 0
+        self.ultimo_atraso = None
+        self.atraso_max = 0.0
+        self.atraso_total = 0.0
+    
+    def calcular_proxima(self, referencia: float) -> float:
+        """Calcula a próxima execução após o instante de referência"""
+        if self.intervalo is not None:
+            return referencia + self.intervalo
+        
+        hora, minuto = map(int, self.horario.split(':'))
+        alvo = datetime.fromtimestamp(referencia).replace(hour=hora, minute=minuto, second=0, microsecond=0)
+        if alvo.timestamp() <= referencia:
+            alvo += timedelta(days=1)
+        return alvo.timestamp()
+
+
+DURACAO_TAREFAS = Histograma(
+    "apptvs_agendador_tarefa_duracao_segundos",
+    "Duração de cada execução das tarefas agendadas",
+    ("tarefa",)
+)
+EXECUCOES_TAREFAS = Contador(
+    "apptvs_agendador_tarefa_execucoes_total",
+    "Execuções das tarefas agendadas por resultado (ok, erro)",
+    ("tarefa", "resultado")
+)
+
+
+class Agendador:
+    """
+    Scheduler baseado em heap de timers
+    Dorme exatamente até a próxima tarefa e acorda quando a agenda muda.
+    As tarefas rodam no pool compartilhado; o loop do scheduler nunca bloqueia nelas.
+    """
+    
+    # Limite da espera contínua, para acompanhar ajustes no relógio do sistema
+    ESPERA_MAXIMA = 30
+    
+    def __init__(self):
+        self._heap = []
+        self._tarefas = {}
+        self._sequencia = itertools.count()
+        self._condicao = threading.Condition()
+        self._ids_execucao = itertools.count(1)
+        # Tarefas com execução em andamento (por nome), mesmo se canceladas ou substituídas
+        self._rodando = {}
+    
+    def agendar_diario(self, nome: str, horario: str, funcao: Callable,
+                       politica: str = POLITICA_PULAR, tempo_maximo: Optional[float] = None,
+                       pool: Optional[str] = None):
+        """
+        Agenda (ou substitui) uma tarefa diária no horário HH:MM
+        
+        Args:
+            pool: Pool dedicado de config.AGENDADOR_POOLS (padrão: pool compartilhado)
+        """
+        datetime.strptime(horario, "%H:%M")
+        self._adicionar(_Tarefa(nome, funcao, horario=horario, politica=politica, tempo_maximo=tempo_maximo, pool=pool))
+    
+    def agendar_intervalo(self, nome: str, segundos: float, funcao: Callable,
+                          politica: str = POLITICA_PULAR, tempo_maximo: Optional[float] = None,
+                          primeira_em: Optional[float] = None, pool: Optional[str] = None):
+        """
+        Agenda (ou substitui) uma tarefa periódica
+        
+        Args:
+            primeira_em: Segundos até a primeira execução (padrão: um intervalo)
+            pool: Pool dedicado de config.AGENDADOR_POOLS (padrão: pool compartilhado)
+        """
+        tarefa = _Tarefa(nome, funcao, intervalo=segundos, politica=politica, tempo_maximo=tempo_maximo, pool=pool)
+        self._adicionar(tarefa, None if primeira_em is None else time.time() + primeira_em)
+    
+    def _adicionar(self, tarefa: _Tarefa, primeira: Optional[float] = None):
+        with self._condicao:
+            anterior = self._tarefas.get(tarefa.nome)
+            if anterior:
+                anterior.cancelada = True
+            em_execucao = self._rodando.get(tarefa.nome)
+            if em_execucao:
+                # A execução em andamento continua valendo para a nova definição (sobreposição e tempo máximo)
+                tarefa.execucao_atual = em_execucao.execucao_atual
+                tarefa.inicio_execucao = em_execucao.inicio_execucao
+                tarefa.pendentes = em_execucao.pendentes
+                tarefa.abandonadas = em_execucao.abandonadas
+                self._rodando[tarefa.nome] = tarefa
+            tarefa.proxima = primeira if primeira is not None else tarefa.calcular_proxima(time.time())
+            self._tarefas[tarefa.nome] = tarefa
+            heapq.heappush(self._heap, (tarefa.proxima, next(self._sequencia), tarefa))
+            self._condicao.notify()
+    
+    def cancelar(self, nome: str):
+        """Remove uma tarefa da agenda"""
+        with self._condicao:
+            tarefa = self._tarefas.pop(nome, None)
+            if tarefa:
+                tarefa.cancelada = True
+                self._condicao.notify()
+    
+    def cancelar_prefixo(self, prefixo: str):
+        """Remove todas as tarefas cujo nome começa com o prefixo"""
+        with self._condicao:
+            for nome in [n for n in self._tarefas if n.startswith(prefixo)]:
+                self._tarefas.pop(nome).cancelada = True
+            self._condicao.notify()
+    
+    def executar_agora(self, nome: str) -> bool:
+        """
+        Dispara uma execução extra da tarefa fora do horário (ex: recuperação de execução perdida)
+        Respeita a política de sobreposição, o tempo máximo e o pool da tarefa; a agenda não muda
+        Retorna False se a tarefa não existe
+        """
+        with self._condicao:
+            tarefa = self._tarefas.get(nome)
+        if tarefa is None:
+            return False
+        self._despachar(tarefa)
+        return True
+    
+    def limpar(self):
+        """Remove todas as tarefas"""
+        with self._condicao:
+            for tarefa in self._tarefas.values():
+                tarefa.cancelada = True
+            self._tarefas.clear()
+            self._heap.clear()
+            self._condicao.notify()
+    
+    def _proxima_vencida(self) -> _Tarefa:
+        """Bloqueia até a próxima tarefa vencer e a retira do heap"""
+        with self._condicao:
+            while True:
+                if not self._heap:
+                    self._condicao.wait()
+                    continue
+                
+                proxima, _, tarefa = self._heap[0]
+                if tarefa.cancelada:
+                    heapq.heappop(self._heap)
+                    continue
+                
+                espera = proxima - time.time()
+                if espera > 0:
+                    self._condicao.wait(min(espera, self.ESPERA_MAXIMA))
+                    continue
+                
+                heapq.heappop(self._heap)
+                return tarefa
+    
+    def _reagendar(self, tarefa: _Tarefa, planejado: float):
+        """Recoloca a tarefa no heap a partir do horário planejado (sem acumular atraso)"""
+        with self._condicao:
+            if tarefa.cancelada:
+                return
+            proxima = tarefa.calcular_proxima(planejado)
+            agora = time.time()
+            while proxima <= agora:
+                proxima = tarefa.calcular_proxima(proxima)
+            tarefa.proxima = proxima
+            heapq.heappush(self._heap, (proxima, next(self._sequencia), tarefa))
+    
+    def executar(self):
+        """Loop principal: despacha as tarefas no horário e registra o atraso (planejado x real)"""
+        while True:
+            tarefa = self._proxima_vencida()
+            planejado = tarefa.proxima
+            atraso = time.time() - planejado
+            
+            tarefa.execucoes += 1
+            tarefa.ultimo_atraso = atraso
+            tarefa.atraso_max = max(tarefa.atraso_max, atraso)
+            tarefa.atraso_total += atraso
+            
+            try:
+                self._despachar(tarefa)
+            except Exception as e:
+                log(f"[SCHEDULER] Erro ao despachar '{tarefa.nome}': {e}", "ERROR")
+            finally:
+                self._reagendar(tarefa, planejado)
+    
+    def _despachar(self, tarefa: _Tarefa):
+        """Envia a tarefa ao pool, aplicando a política de sobreposição"""
+        with self._condicao:
+            if tarefa.inicio_execucao is not None:
+                decorrido = time.time() - tarefa.inicio_execucao
+                if tarefa.tempo_maximo and decorrido > tarefa.tempo_maximo:
+                    if tarefa.abandonadas:
+                        # Já há uma execução travada ocupando um worker: não abandona outra (não esgota o pool)
+                        tarefa.puladas += 1
+                        log(f"[SCHEDULER] '{tarefa.nome}' excedeu o tempo máximo e a execução abandonada anterior ainda não terminou - pulando", "ERROR")
+                        return
+                    # Execução travada: libera a tarefa para não bloquear as próximas
+                    # (a thread não pode ser interrompida e continua ocupando um worker do pool até terminar)
+                    log(f"[SCHEDULER] '{tarefa.nome}' excedeu o tempo máximo ({decorrido:.0f}s > {tarefa.tempo_maximo:.0f}s) - liberando nova execução", "ERROR")
+                    tarefa.estouros += 1
+                    tarefa.abandonadas.add(tarefa.execucao_atual)
+                    tarefa.inicio_execucao = None
+                elif tarefa.politica == POLITICA_PULAR:
+                    tarefa.puladas += 1
+                    log(f"[SCHEDULER] '{tarefa.nome}' ainda em execução ({decorrido:.0f}s) - pulando", "WARNING")
+                    return
+                else:
+                    if tarefa.politica == POLITICA_ENFILEIRAR:
+                        tarefa.pendentes += 1
+                    else:
+                        tarefa.pendentes = 1
+                    log(f"[SCHEDULER] '{tarefa.nome}' ainda em execução - {tarefa.pendentes} pendente(s)", "INFO")
+                    return
+            
+            execucao = next(self._ids_execucao)
+            tarefa.execucao_atual = execucao
+            tarefa.inicio_execucao = time.time()
+            self._rodando[tarefa.nome] = tarefa
+        
+        self._pool(tarefa).submit(self._rodar, tarefa, execucao)
+    
+    @staticmethod
+    def _pool(tarefa: _Tarefa):
+        """Pool dedicado da tarefa (config.AGENDADOR_POOLS) ou o pool compartilhado"""
+        if tarefa.pool:
+            return obter_pool(tarefa.pool, config.AGENDADOR_POOLS[tarefa.pool])
+        return obter_executor()
+    
+    def _rodar(self, tarefa: _Tarefa, execucao: int):
+        """Executa a tarefa no pool e, ao terminar, dispara as execuções pendentes"""
+        while True:
+            inicio = time.time()
+            resultado = "ok"
+            try:
+                tarefa.funcao()
+            except Exception as e:
+                resultado = "erro"
+                log(f"[SCHEDULER] Erro na tarefa '{tarefa.nome}': {e}", "ERROR")
+            duracao = time.time() - inicio
+            DURACAO_TAREFAS.observar(duracao, tarefa=tarefa.nome)
+            EXECUCOES_TAREFAS.inc(tarefa=tarefa.nome, resultado=resultado)
+            
+            with self._condicao:
+                # Se a tarefa foi substituída durante a execução (agenda reaplicada), a nova definição assume
+                tarefa = self._rodando.get(tarefa.nome, tarefa)
+                tarefa.ultima_duracao = duracao
+                if execucao in tarefa.abandonadas:
+                    # Já foi liberada pelo guarda de tempo máximo; outra execução assumiu
+                    tarefa.abandonadas.discard(execucao)
+                    return
+                if tarefa.pendentes > 0 and not tarefa.cancelada:
+                    tarefa.pendentes -= 1
+                    tarefa.inicio_execucao = time.time()
+                    continue
+                tarefa.inicio_execucao = None
+                self._rodando.pop(tarefa.nome, None)
+                return
+    
+    def em_execucao(self) -> int:
+        """Quantidade de tarefas executando agora"""
+        with self._condicao:
+            return sum(1 for t in self._tarefas.values() if t.inicio_execucao is not None)
+    
+    def obter_metricas(self) -> list:
+        """Retorna próxima execução e atraso de disparo de cada tarefa"""
+        with self._condicao:
+            tarefas = list(self._tarefas.values())
+        return [{
+            "nome": t.nome,
+            "horario": t.horario,
+            "intervalo_segundos": t.intervalo,
+            "proxima_execucao": datetime.fromtimestamp(t.proxima).isoformat(timespec='seconds'),
+            "execucoes": t.execucoes,
+            "ultimo_atraso_ms": round(t.ultimo_atraso * 1000, 1) if t.ultimo_atraso is not None else None,
+            "atraso_medio_ms": round(t.atraso_total / t.execucoes * 1000, 1) if t.execucoes else None,
+            "atraso_max_ms": round(t.atraso_max * 1000, 1),
+            "politica": t.politica,
+            "tempo_maximo_segundos": t.tempo_maximo,
+            "em_execucao_ha_segundos": round(time.time() - t.inicio_execucao, 1) if t.inicio_execucao else None,
+            "ultima_duracao_segundos": round(t.ultima_duracao, 1) if t.ultima_duracao is not None else None,
+            "pendentes": t.pendentes,
+            "puladas": t.puladas,
+            "estouros": t.estouros,
+            "abandonadas_em_execucao": len(t.abandonadas),
+            "pool": t.pool or "compartilhado"
+        } for t in tarefas]
+
+
 class SchedulerService:
     """Gerencia todas as tarefas agendadas do sistema"""
     
@@ -23,130 +345,374 @@ class SchedulerService:
         self.tv_controller = tv_controller
         self.renovador_token = RenovadorTokenSmartThings()
         self.scheduler_thread: Optional[threading.Thread] = None
+        self.agendador = Agendador()
+        # Estatísticas do keep alive ficam no estado compartilhado (lidas por qualquer worker)
+        self.estado = obter_estado()
+        self._keep_alive_lock = threading.Lock()
+        self.agenda = AgendaStore(config.AGENDA_FILE)
+        self._versao_agenda = 0
     
-    def iniciar_renovacao_token(self, horario: str = '02:00'):
-        """Agenda renovação automática de token"""
-        def renovar_e_recarregar():
-            log("[TOKEN] Iniciando renovação automática...", "INFO")
-            resultado = self.renovador_token.renovar()
-            if resultado:
-                importlib.reload(config)
-                self.tv_service.recarregar_token()
-                log("[TOKEN] Token renovado e configuração recarregada!", "SUCCESS")
-                log(f"[TOKEN] Novo token: {config.ACCESS_TOKEN[:20]}...", "INFO")
-            else:
-                log("[TOKEN] Falha na renovação automática", "ERROR")
-            return resultado
-        
-        schedule.every().day.at(horario).do(renovar_e_recarregar)
-        log(f"[TOKEN] Renovação agendada para {horario}", "SUCCESS")
+    def _renovar_token(self):
+        """Renova o token (os demais workers passam a usá-lo ao perceber o config.py alterado)"""
+        log("[TOKEN] Iniciando renovação automática...", "INFO")
+        resultado = self.renovador_token.renovar()
+        if resultado:
+            token = self.tv_service.recarregar_token()
+            log("[TOKEN] Token renovado e configuração recarregada!", "SUCCESS")
+            log(f"[TOKEN] Novo token: {token[:20]}...", "INFO")
+        else:
+            log("[TOKEN] Falha na renovação automática", "ERROR")
+        return resultado
     
     def iniciar_keep_alive(self, intervalo_minutos: int = 5, setores_ignorar: list = None):
-        """Agenda execução periódica de keep alive"""
+        """
+        Agenda o keep alive escalonado: cada TV recebe seu próprio slot dentro do intervalo,
+        espalhando as chamadas à API de forma uniforme em vez de rajadas a cada ciclo
+        """
+        tvs = self.tvs_keep_alive(setores_ignorar)
+        
+        self.agendador.cancelar_prefixo("keep_alive:")
+        if not tvs:
+            log("[KEEP-ALIVE] Nenhuma TV elegível - keep alive não agendado", "WARNING")
+            return
+        
+        intervalo = intervalo_minutos * 60
+        for i, nome in enumerate(tvs):
+            # Fases uniformes: a TV i roda em (i + 1) / N do intervalo
+            self.agendador.agendar_intervalo(
+                f"keep_alive:{nome}", intervalo, partial(self._keep_alive_tv, nome),
+                politica=POLITICA_PULAR, tempo_maximo=intervalo,
+                primeira_em=intervalo * (i + 1) / len(tvs), pool="keep_alive"
+            )
+        
+        log(f"[KEEP-ALIVE] Agendado a cada {intervalo_minutos} minutos para {len(tvs)} TVs (uma a cada {intervalo / len(tvs):.1f}s)", "SUCCESS")
+    
+    def tvs_keep_alive(self, setores_ignorar: list = None) -> list:
+        """TVs elegíveis ao keep alive (fora dos setores ignorados e das salas de reunião)"""
         if setores_ignorar is None:
             setores_ignorar = config.KEEP_ALIVE_IGNORE_SETORES
+        return [
+            nome for nome, info in self.tv_service.obter_tvs().items()
+            if info.get("setor", "") not in setores_ignorar
+            and "REUNIÃO" not in nome.upper() and "REUNIAO" not in nome.upper()
+        ]
+    
+    def _registrar_keep_alive(self, nome: str, resultado: str, duracao: float):
+        """Atualiza as estatísticas de keep alive de uma TV (no estado compartilhado)"""
+        with self._keep_alive_lock:
+            stats = self.estado.obter("keep_alive", nome) or {
+                "executadas": 0, "puladas": 0, "falhas": 0,
+                "ultimo_resultado": None, "ultima_execucao": None, "ultima_duracao_segundos": None
+            }
+            if resultado == "ok":
+                stats["executadas"] += 1
+            elif resultado == "falha":
+                stats["falhas"] += 1
+            else:
+                stats["puladas"] += 1
+            stats["ultimo_resultado"] = resultado
+            stats["ultima_execucao"] = datetime.now().isoformat(timespec='seconds')
+            stats["ultima_duracao_segundos"] = round(duracao, 2)
+            self.estado.definir("keep_alive", nome, stats)
+    
+    def _avaliar_keep_alive(self, nome: str, status: dict) -> tuple:
+        """
+        Decide se uma TV ligada precisa do keep alive
         
-        def executar_keep_alive():
-            # Importa aqui para evitar importação circular
-            from .tv_controller import TVController
+        Returns:
+            (motivo, None) se precisa de comando, ou (None, resultado do pulo) se está saudável
+        """
+        if status.get("ultima_atividade"):
+            try:
+                atividade = datetime.fromisoformat(status["ultima_atividade"].replace("Z", "+00:00"))
+                idade = (datetime.now(atividade.tzinfo) - atividade).total_seconds()
+                if idade < config.KEEP_ALIVE_ATIVIDADE_RECENTE:
+                    # Alguém (ou uma sequência) mexeu na TV agora - não interfere
+                    return None, "pulada_atividade_recente"
+            except ValueError:
+                pass
+        
+        esperado = self.tv_service.obter_estado_esperado(nome)
+        if esperado is None:
+            return "sem estado de referência", None
+        
+        if (status.get("input_source") == esperado.get("input_source")
+                and status.get("current_app") == esperado.get("current_app")):
+            return None, "pulada_saudavel"
+        
+        return f"entrada={status.get('input_source')}, app={status.get('current_app')} diferente do esperado", None
+    
+    def _keep_alive_tv(self, nome: str):
+        """Keep alive de uma TV: se estiver ligada e fora do estado esperado, Enter + 10s + Enter"""
+        # Importa aqui para evitar importação circular
+        from .tv_controller import TVController
+        
+        inicio = time.time()
+        resultado = "ok"
+        try:
+            info = self.tv_service.obter_tv(nome)
+            if info is None:
+                resultado = "pulada_nao_encontrada"
+                return
             
-            # Verifica se há sequências em execução
+            # Não interfere em sequências em andamento
             if TVController.alguma_sequencia_em_execucao():
-                log("[KEEP-ALIVE] Pulando ciclo - há sequências em execução no momento", "WARNING")
+                log(f"[KEEP-ALIVE] {nome}: há sequências em execução - pulando", "INFO")
+                resultado = "pulada_sequencia"
                 return
             
-            log("[KEEP-ALIVE] Iniciando ciclo de verificação...", "INFO")
-            tv_client = SmartThingsTV(config.ACCESS_TOKEN)
-            
-            def processar_tv(nome, info):
-                try:
-                    # Importa aqui para evitar importação circular
-                    from .tv_controller import TVController
-                    
-                    setor = info.get("setor", "")
-                    if setor in setores_ignorar or "REUNIÃO" in nome.upper() or "REUNIAO" in nome.upper():
-                        return
-                    
-                    # Verifica se esta TV específica está executando sequência
-                    if TVController.esta_executando_sequencia(nome):
-                        log(f"[KEEP-ALIVE] {nome} está executando sequência - pulando", "INFO")
-                        return
-                    
-                    tv_id = info["id"] if isinstance(info, dict) else info
-                    
-                    # Verifica se está ligada
-                    status = tv_client.obter_status(tv_id)
-                    is_on = False
-                    if status:
-                        try:
-                            switch = status['components']['main']['switch']['switch']['value']
-                            is_on = (switch == 'on')
-                        except:
-                            pass
-                    
-                    if is_on:
-                        log(f"[KEEP-ALIVE] Executando em {nome}...", "INFO")
-                        pressionar_enter(tv_client, tv_id, nome, delay=10)
-                        pressionar_enter(tv_client, tv_id, nome, delay=0)
-                        
-                except Exception as e:
-                    log(f"[KEEP-ALIVE] Erro em {nome}: {e}", "ERROR")
-            
-            # Processa em lotes de 2
-            tvs_list = list(self.tv_service.obter_tvs().items())
-            batch_size = 2
-            
-            for i in range(0, len(tvs_list), batch_size):
-                batch = tvs_list[i:i + batch_size]
-                threads = []
-                
-                log(f"[KEEP-ALIVE] Processando lote {i//batch_size + 1} ({len(batch)} TVs)...", "INFO")
-                
-                for nome, info in batch:
-                    t = threading.Thread(target=processar_tv, args=(nome, info))
-                    threads.append(t)
-                    t.start()
-                
-                for t in threads:
-                    t.join()
+            # Status em cache (ex: do dashboard) evita uma chamada extra à API
+            status = self.tv_service.obter_status_tv(nome, max_idade=config.KEEP_ALIVE_STATUS_MAX_IDADE)
+            if not status or not status["is_online"]:
+                resultado = "falha"
+                return
+            if not status["is_on"]:
+                resultado = "pulada_desligada"
+                return
             
-            log("[KEEP-ALIVE] Ciclo finalizado.", "INFO")
-        
-        schedule.every(intervalo_minutos).minutes.do(executar_keep_alive)
-        log(f"[KEEP-ALIVE] Agendado para rodar a cada {intervalo_minutos} minutos", "SUCCESS")
-    
-    def iniciar_ligamento_automatico(self, horario: str = '06:20'):
-        """Agenda ligamento automático de todas as TVs em dias úteis"""
-        def ligar_todas_automatico():
-            import datetime
-            # Verifica se é dia útil (segunda a sexta)
-            dia_semana = datetime.datetime.now().weekday()
-            if dia_semana >= 5:  # 5 = Sábado, 6 = Domingo
-                log("[AUTO-LIGAR] Hoje não é dia útil - pulando execução", "INFO")
+            motivo, resultado_pulo = self._avaliar_keep_alive(nome, status)
+            if motivo is None:
+                resultado = resultado_pulo
                 return
             
-            log("[AUTO-LIGAR] Iniciando ligamento automático de todas as TVs...", "INFO")
-            if self.tv_controller:
-                self.tv_controller.ligar_todas_automatico()
+            # Reserva a TV como os demais comandos: não se intercala com jobs ou toggles
+            if not TVController.reservar_tv(nome):
+                log(f"[KEEP-ALIVE] {nome}: TV ocupada por outro comando - pulando", "INFO")
+                resultado = "pulada_sequencia"
+                return
+            try:
+                tv_client = SmartThingsTV(obter_token())
+                tv_id = info["id"] if isinstance(info, dict) else info
+                
+                log(f"[KEEP-ALIVE] Executando em {nome} ({motivo})...", "INFO")
+                ok = pressionar_enter(tv_client, tv_id, nome, delay=10)
+                ok = pressionar_enter(tv_client, tv_id, nome, delay=0) and ok
+                self.tv_service.invalidar_status(nome)
+            finally:
+                TVController.liberar_tv(nome)
+            if not ok:
+                resultado = "falha"
+        except Exception as e:
+            resultado = "falha"
+            log(f"[KEEP-ALIVE] Erro em {nome}: {e}", "ERROR")
+        finally:
+            self._registrar_keep_alive(nome, resultado, time.time() - inicio)
+    
+    def obter_status_keep_alive(self) -> dict:
+        """Retorna tempo e contagem (executadas, puladas, falhas) do keep alive por TV"""
+        return self.estado.listar("keep_alive")
+    
+    def _ligar_automatico(self, setor: Optional[str] = None, dias_uteis: bool = True):
+        """Liga as TVs (todas ou de um setor), pulando fins de semana se dias_uteis"""
+        # Verifica se é dia útil (segunda a sexta)
+        if dias_uteis and datetime.now().weekday() >= 5:  # 5 = Sábado, 6 = Domingo
+            log("[AUTO-LIGAR] Hoje não é dia útil - pulando execução", "INFO")
+            return
+        
+        alvo = f"setor {setor}" if setor else "todas as TVs"
+        log(f"[AUTO-LIGAR] Iniciando ligamento automático ({alvo})...", "INFO")
+        if self.tv_controller:
+            self.tv_controller.ligar_todas_automatico(
+                pipeline=config.AUTO_LIGAR_PIPELINE,
+                aguardar_vm=config.AUTO_LIGAR_AGUARDAR_VM,
+                aguardar=True,
+                setores=[setor] if setor else None
+            )
+        else:
+            log("[AUTO-LIGAR] ERRO: TV Controller não disponível", "ERROR")
+    
+    def _semear_agenda(self):
+        """Cria a agenda inicial a partir das constantes do config.py"""
+        self.agenda.criar({
+            "tipo": TIPO_RENOVAR_TOKEN,
+            "horario": config.TOKEN_HORARIO_RENOVACAO,
+            "ativo": config.TOKEN_AUTO_RENOVACAO
+        })
+        
+        horarios_setor = config.AUTO_LIGAR_HORARIOS_SETOR or {None: config.AUTO_LIGAR_HORARIO}
+        for setor, horario in horarios_setor.items():
+            self.agenda.criar({
+                "tipo": TIPO_LIGAR_TVS,
+                "horario": horario,
+                "setor": setor,
+                "ativo": config.AUTO_LIGAR_ATIVO
+            })
+        
+        self.agenda.criar({
+            "tipo": TIPO_KEEP_ALIVE,
+            "intervalo_minutos": config.KEEP_ALIVE_INTERVALO,
+            "ativo": config.KEEP_ALIVE_ATIVO
+        })
+        log(f"[AGENDA] Agenda inicial criada a partir do config.py ({self.agenda.arquivo.name})", "INFO")
+    
+    def carregar_agenda(self):
+        """Agenda as tarefas persistidas e executa as que foram perdidas enquanto o sistema estava parado"""
+        if not self.agenda.listar():
+            self._semear_agenda()
+        
+        for agendamento in self.agenda.listar():
+            self._aplicar_agendamento(agendamento)
+        self._versao_agenda = self.agenda.versao_externa
+        
+        self._recuperar_perdidos()
+        
+        # Alterações feitas em /api/schedules por outros workers chegam pelo arquivo
+        self.agendador.agendar_intervalo("sincronizar_agenda", config.AGENDA_SINCRONIZAR_SEGUNDOS,
+                                         self._sincronizar_agenda, politica=POLITICA_PULAR)
+    
+    def _sincronizar_agenda(self):
+        """Reaplica a agenda se o arquivo foi alterado por outro worker"""
+        versao = self.agenda.sincronizar()
+        if versao == self._versao_agenda:
+            return
+        
+        self._versao_agenda = versao
+        self.agendador.cancelar_prefixo("agenda:")
+        agendamentos = self.agenda.listar()
+        if not any(a["tipo"] == TIPO_KEEP_ALIVE for a in agendamentos):
+            self.agendador.cancelar_prefixo("keep_alive:")
+        for agendamento in agendamentos:
+            self._aplicar_agendamento(agendamento)
+        log("[AGENDA] Agenda alterada por outro worker - tarefas reaplicadas", "INFO")
+    
+    def _aplicar_agendamento(self, agendamento: dict):
+        """(Re)agenda a tarefa de um agendamento; desativado apenas cancela"""
+        nome = f"agenda:{agendamento['id']}"
+        tipo = agendamento["tipo"]
+        
+        if tipo == TIPO_KEEP_ALIVE:
+            if agendamento["ativo"]:
+                self.iniciar_keep_alive(agendamento["intervalo_minutos"])
             else:
-                log("[AUTO-LIGAR] ERRO: TV Controller não disponível", "ERROR")
+                self.agendador.cancelar_prefixo("keep_alive:")
+                log("[KEEP-ALIVE] Keep alive desativado", "INFO")
+            return
+        
+        self.agendador.cancelar(nome)
+        if not agendamento["ativo"]:
+            log(f"[AGENDA] {tipo} ({agendamento['horario']}) desativado", "INFO")
+            return
         
-        schedule.every().day.at(horario).do(ligar_todas_automatico)
-        log(f"[AUTO-LIGAR] Ligamento automático agendado para {horario} (dias úteis)", "SUCCESS")
+        executar = partial(self._executar_agendamento, agendamento["id"])
+        if tipo == TIPO_RENOVAR_TOKEN:
+            self.agendador.agendar_diario(nome, agendamento["horario"], executar,
+                                          politica=POLITICA_PULAR, tempo_maximo=30 * 60)
+            log(f"[TOKEN] Renovação agendada para {agendamento['horario']}", "SUCCESS")
+        else:
+            self.agendador.agendar_diario(nome, agendamento["horario"], executar,
+                                          politica=POLITICA_COALESCER, tempo_maximo=3 * 60 * 60, pool="frota")
+            alvo = f"setor {agendamento['setor']}" if agendamento["setor"] else "todas as TVs"
+            log(f"[AUTO-LIGAR] Ligamento automático agendado para {agendamento['horario']} ({alvo})", "SUCCESS")
+    
+    def _executar_agendamento(self, agendamento_id: str):
+        """Executa um agendamento registrando o horário (base da recuperação de execuções perdidas)"""
+        agendamento = self.agenda.obter(agendamento_id)
+        if agendamento is None or not agendamento["ativo"]:
+            return
+        
+        self.agenda.registrar_execucao(agendamento_id, datetime.now())
+        if agendamento["tipo"] == TIPO_RENOVAR_TOKEN:
+            self._renovar_token()
+        elif agendamento["tipo"] == TIPO_LIGAR_TVS:
+            self._ligar_automatico(agendamento["setor"], agendamento["dias_uteis"])
+    
+    def _execucao_perdida(self, agendamento: dict, agora: datetime) -> bool:
+        """True se o horário de hoje já passou (dentro da janela de recuperação) sem execução registrada"""
+        if (agendamento["tipo"] == TIPO_KEEP_ALIVE or not agendamento["ativo"]
+                or not agendamento["recuperar_perdidos"]):
+            return False
+        
+        hora, minuto = map(int, agendamento["horario"].split(":"))
+        planejado = agora.replace(hour=hora, minute=minuto, second=0, microsecond=0)
+        if planejado > agora or agora - planejado > timedelta(hours=config.AGENDA_RECUPERAR_HORAS):
+            return False
+        if agendamento["dias_uteis"] and planejado.weekday() >= 5:
+            return False
+        
+        # Referência: última execução ou, se nunca rodou, a criação do agendamento
+        referencia = agendamento.get("ultima_execucao") or agendamento.get("criado_em")
+        return referencia is not None and datetime.fromisoformat(referencia) < planejado
+    
+    def _recuperar_perdidos(self):
+        """Executa uma vez os agendamentos cujo horário passou enquanto o sistema estava parado"""
+        agora = datetime.now()
+        for agendamento in self.agenda.listar():
+            if self._execucao_perdida(agendamento, agora):
+                log(f"[AGENDA] Execução de {agendamento['horario']} perdida ({agendamento['tipo']}"
+                    f"{' - ' + agendamento['setor'] if agendamento['setor'] else ''}) - executando agora", "WARNING")
+                self.agendador.executar_agora(f"agenda:{agendamento['id']}")
+    
+    def listar_agendamentos(self) -> list:
+        """Retorna os agendamentos com o próximo horário previsto"""
+        proximas = {m["nome"]: m.get("proxima_execucao") for m in self.agendador.obter_metricas()}
+        agendamentos = self.agenda.listar()
+        for agendamento in agendamentos:
+            agendamento["proxima_execucao"] = proximas.get(f"agenda:{agendamento['id']}")
+        return agendamentos
+    
+    def obter_agendamento(self, agendamento_id: str) -> Optional[dict]:
+        """Retorna um agendamento pelo ID"""
+        return self.agenda.obter(agendamento_id)
+    
+    def criar_agendamento(self, dados: dict) -> dict:
+        """Cria e agenda um novo agendamento (ValueError se inválido)"""
+        agendamento = self.agenda.criar(dados)
+        self._aplicar_agendamento(agendamento)
+        return agendamento
+    
+    def atualizar_agendamento(self, agendamento_id: str, dados: dict) -> Optional[dict]:
+        """Atualiza e reagenda um agendamento (None se não existir)"""
+        agendamento = self.agenda.atualizar(agendamento_id, dados)
+        if agendamento:
+            self._aplicar_agendamento(agendamento)
+        return agendamento
+    
+    def configurar_renovacao_token(self, horario: str) -> dict:
+        """Atualiza o horário do agendamento de renovação de token (cria se não existir)"""
+        existente = next((a for a in self.agenda.listar() if a["tipo"] == TIPO_RENOVAR_TOKEN), None)
+        if existente:
+            return self.atualizar_agendamento(existente["id"], {"horario": horario, "ativo": True})
+        return self.criar_agendamento({"tipo": TIPO_RENOVAR_TOKEN, "horario": horario})
+    
+    def remover_agendamento(self, agendamento_id: str) -> bool:
+        """Remove um agendamento e cancela sua tarefa"""
+        agendamento = self.agenda.obter(agendamento_id)
+        if agendamento is None:
+            return False
+        
+        self.agenda.remover(agendamento_id)
+        if agendamento["tipo"] == TIPO_KEEP_ALIVE:
+            self.agendador.cancelar_prefixo("keep_alive:")
+        else:
+            self.agendador.cancelar(f"agenda:{agendamento_id}")
+        log(f"[AGENDA] Agendamento {agendamento_id} ({agendamento['tipo']}) removido", "INFO")
+        return True
+    
+    def iniciar_monitor_status(self):
+        """Mantém o status de todas as TVs atualizado no estado compartilhado (uma consulta para todos os painéis)"""
+        self.agendador.agendar_intervalo(
+            "monitor_status", config.STATUS_MONITOR_INTERVALO,
+            partial(self.tv_service.atualizar_status_todas, max_idade=config.STATUS_MAX_IDADE),
+            politica=POLITICA_PULAR, primeira_em=0
+        )
+        log(f"[STATUS] Monitor de status ativo (a cada {config.STATUS_MONITOR_INTERVALO}s, cache de {config.STATUS_MAX_IDADE}s)", "SUCCESS")
     
     def iniciar_scheduler(self):
         """Inicia a thread de execução do scheduler"""
-        def run_schedule():
-            while True:
-                schedule.run_pending()
-                time.sleep(60)
-        
         if self.scheduler_thread is None or not self.scheduler_thread.is_alive():
-            self.scheduler_thread = threading.Thread(target=run_schedule, daemon=True)
+            self.scheduler_thread = threading.Thread(target=self.agendador.executar, daemon=True)
             self.scheduler_thread.start()
             log("[SCHEDULER] Thread de agendamento iniciada", "SUCCESS")
     
+    def scheduler_ativo(self) -> bool:
+        """True se este processo executa os agendamentos (worker líder)"""
+        return self.scheduler_thread is not None and self.scheduler_thread.is_alive()
+    
     def parar_scheduler(self):
         """Para todas as tarefas agendadas"""
-        schedule.clear()
+        self.agendador.limpar()
         log("[SCHEDULER] Todas as tarefas agendadas foram canceladas", "INFO")
+    
+    def obter_metricas(self) -> list:
+        """Retorna as tarefas agendadas com o atraso entre horário planejado e real"""
+        return self.agendador.obter_metricas()
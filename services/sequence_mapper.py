@@ -3,7 +3,11 @@ Mapeador de Sequências
 Responsável por mapear TVs às suas sequências de inicialização
 """
 
+import threading
+from typing import Callable, Dict, Optional
 from utils import log
+from utils.logger import logs_silenciados
+from utils.relogio import relogio_simulado
 from sequences import (
     sequencia_ti,
     sequencia_atlas,
@@ -26,11 +30,76 @@ from sequences import (
 )
 
 
+class _ClienteGravador:
+    """Cliente falso que apenas registra os comandos enviados (usado para simular sequências)"""
+    
+    def __init__(self):
+        self.comandos = []
+    
+    def obter_status(self, device_id):
+        return None
+    
+    def _executar_comando_com_retry(self, device_id, capability, command, arguments=None, max_tentativas=5, delay_retry=2):
+        self.comandos.append((capability, command, arguments))
+        return True
+
+
+class _ClienteComPortao:
+    """Repassa comandos ao cliente real, chamando o portão antes do último comando da sequência"""
+    
+    def __init__(self, tv, total_comandos: int, portao: Callable[[], None]):
+        self._tv = tv
+        self._total = total_comandos
+        self._portao = portao
+        self._enviados = 0
+    
+    def __getattr__(self, nome):
+        return getattr(self._tv, nome)
+    
+    def _executar_comando_com_retry(self, device_id, capability, command, arguments=None, max_tentativas=5, delay_retry=2):
+        self._enviados += 1
+        if self._enviados == self._total and arguments and arguments[0] == "OK":
+            self._portao()
+        return self._tv._executar_comando_com_retry(device_id, capability, command, arguments, max_tentativas, delay_retry)
+
+
 class SequenceMapper:
     """Mapeia TVs para suas sequências de inicialização"""
     
-    def executar_sequencia(self, tv, tv_id, tv_nome):
-        """Executa a sequência correta para uma TV"""
+    def __init__(self):
+        self._total_comandos: Dict[str, int] = {}
+        self._total_lock = threading.Lock()
+    
+    def contar_comandos(self, tv_nome: str) -> int:
+        """Conta quantos comandos a sequência da TV envia (simulação sem esperas, resultado em cache)"""
+        with self._total_lock:
+            if tv_nome in self._total_comandos:
+                return self._total_comandos[tv_nome]
+        
+        gravador = _ClienteGravador()
+        with relogio_simulado(), logs_silenciados():
+            self._despachar(gravador, "simulacao", tv_nome)
+        
+        with self._total_lock:
+            self._total_comandos[tv_nome] = len(gravador.comandos)
+        return len(gravador.comandos)
+    
+    def executar_sequencia(self, tv, tv_id, tv_nome, antes_enter_final: Optional[Callable[[], None]] = None):
+        """
+        Executa a sequência correta para uma TV
+        
+        Args:
+            antes_enter_final: Chamado (bloqueante) antes do ENTER final que abre o BI
+        """
+        if antes_enter_final is not None:
+            total = self.contar_comandos(tv_nome)
+            if total > 0:
+                tv = _ClienteComPortao(tv, total, antes_enter_final)
+        
+        self._despachar(tv, tv_id, tv_nome)
+    
+    def _despachar(self, tv, tv_id, tv_nome):
+        """Identifica e executa a sequência da TV"""
         
         # TI
         if tv_nome in ["TI01", "TI02", "TI03"]:
@@ -3,12 +3,16 @@ Controlador de TVs
 Gerencia operações de controle e execução de sequências
 """
 
+import os
 import threading
-import time
 from typing import Optional
 from controllers import SmartThingsTV
-from controllers.tv_control import pressionar_enter
+from controllers.tv_control import pressionar_enter, desligar_tv
 from utils import log
+from utils.relogio import dormir
+from utils.rastreamento import span, propagar
+from utils.estado_compartilhado import obter_estado
+from utils.token_acesso import obter_token
 from .webhook_service import WebhookService
 from .sequence_mapper import SequenceMapper
 import config
@@ -17,9 +21,10 @@ import config
 class TVController:
     """Controla operações de TVs (ligar, desligar, sequências)"""
     
-    # Controle de sequências em execução (compartilhado entre instâncias)
-    _sequencias_em_execucao = set()
+    # Controle de sequências em execução (no estado compartilhado: visível para todos os workers)
     _sequencias_lock = threading.Lock()
+    # Reservas de TV feitas por cada thread (reservar_tv é reentrante)
+    _reservas_locais = threading.local()
     
     def __init__(self, tv_service, webhook_service: Optional[WebhookService] = None):
         self.tv_service = tv_service
@@ -29,29 +34,77 @@ class TVController:
     @classmethod
     def esta_executando_sequencia(cls, tv_nome: str) -> bool:
         """Verifica se uma TV está executando sequência no momento"""
-        with cls._sequencias_lock:
-            return tv_nome in cls._sequencias_em_execucao
+        return obter_estado().obter("sequencia", tv_nome) is not None
     
     @classmethod
     def alguma_sequencia_em_execucao(cls) -> bool:
         """Verifica se há alguma sequência em execução"""
-        with cls._sequencias_lock:
-            return len(cls._sequencias_em_execucao) > 0
+        return len(obter_estado().listar("sequencia")) > 0
     
     @classmethod
     def _marcar_inicio_sequencia(cls, tv_nome: str):
         """Marca que uma sequência iniciou para uma TV"""
         with cls._sequencias_lock:
-            cls._sequencias_em_execucao.add(tv_nome)
+            # Expira sozinha se o worker morrer no meio da sequência
+            obter_estado().definir("sequencia", tv_nome, os.getpid(), ttl=config.SEQUENCIA_MAX_DURACAO)
             log(f"[{tv_nome}] Sequência marcada como EM EXECUÇÃO", "INFO")
     
     @classmethod
     def _marcar_fim_sequencia(cls, tv_nome: str):
         """Marca que uma sequência finalizou para uma TV"""
         with cls._sequencias_lock:
-            cls._sequencias_em_execucao.discard(tv_nome)
+            obter_estado().remover("sequencia", tv_nome)
+            # Força o monitor a consultar o status real da TV após os comandos
+            obter_estado().remover("status", tv_nome)
             log(f"[{tv_nome}] Sequência marcada como FINALIZADA", "INFO")
     
+    @classmethod
+    def reservar_tv(cls, tv_nome: str, dono: Optional[dict] = None) -> bool:
+        """
+        Reserva a TV para um comando (em estado.db: vale para todos os workers); False se outro comando a ocupa
+        Reentrante na mesma thread (ex: job que já reservou a TV chamando ligar_tv); expira sozinha
+        após SEQUENCIA_MAX_DURACAO se o worker morrer no meio
+        """
+        reservas = cls._reservas_da_thread()
+        if reservas.get(tv_nome):
+            reservas[tv_nome] += 1
+            return True
+        if not obter_estado().reservar("tv_ocupada", tv_nome, dono or {"worker": os.getpid()},
+                                       ttl=config.SEQUENCIA_MAX_DURACAO):
+            return False
+        reservas[tv_nome] = 1
+        return True
+    
+    @classmethod
+    def liberar_tv(cls, tv_nome: str):
+        """Desfaz uma reserva de reservar_tv (libera a TV na última da thread)"""
+        reservas = cls._reservas_da_thread()
+        reservas[tv_nome] -= 1
+        if not reservas[tv_nome]:
+            del reservas[tv_nome]
+            obter_estado().remover("tv_ocupada", tv_nome)
+    
+    @classmethod
+    def ocupante_tv(cls, tv_nome: str) -> Optional[dict]:
+        """Dono da reserva atual da TV (None se livre)"""
+        return obter_estado().obter("tv_ocupada", tv_nome)
+    
+    @classmethod
+    def _reservas_da_thread(cls) -> dict:
+        """Contagem de reservas feitas pela thread atual, por TV"""
+        if not hasattr(cls._reservas_locais, "contagem"):
+            cls._reservas_locais.contagem = {}
+        return cls._reservas_locais.contagem
+    
+    def _reservar_para_comando(self, tv_nome: str) -> bool:
+        """reservar_tv com aviso no log quando a TV está ocupada"""
+        if self.reservar_tv(tv_nome):
+            return True
+        ocupante = self.ocupante_tv(tv_nome) or {}
+        origem = f"job {ocupante['job']}" if ocupante.get("job") else f"worker {ocupante.get('worker')}"
+        log(f"[{tv_nome}] TV ocupada por outro comando ({origem}) - comando ignorado", "WARNING")
+        return False
+    
     def toggle_tv(self, tv_nome: str) -> bool:
         """
         Toggle de uma TV: se ligada desliga, se desligada liga + executa sequência
@@ -60,11 +113,14 @@ class TVController:
             log(f"[{tv_nome}] TV não encontrada", "ERROR")
             return False
         
+        if not self._reservar_para_comando(tv_nome):
+            return False
+        
         try:
             # Marca início da sequência
             self._marcar_inicio_sequencia(tv_nome)
             
-            tv = SmartThingsTV(config.ACCESS_TOKEN)
+            tv = SmartThingsTV(obter_token())
             tv_info = self.tv_service.obter_tv(tv_nome)
             tv_id = tv_info["id"] if isinstance(tv_info, dict) else tv_info
             
@@ -95,24 +151,38 @@ class TVController:
         finally:
             # Marca fim da sequência (sempre executa, mesmo com erro)
             self._marcar_fim_sequencia(tv_nome)
+            self.liberar_tv(tv_nome)
     
-    def ligar_tv(self, tv_nome: str, enviar_webhook: bool = True) -> bool:
+    def ligar_tv(self, tv_nome: str, enviar_webhook: bool = True, aguardar_vm: bool = False) -> bool:
         """
         Liga uma TV específica (força ligar, não faz toggle)
         
         Args:
             tv_nome: Nome da TV
             enviar_webhook: Se True, envia webhook para ligar BI. Se False, apenas liga a TV
+            aguardar_vm: Se True, aguarda o sinal de VM pronta antes do ENTER final que abre o BI
         """
+        # Dentro de um job de frota, a sequência da TV vira um span filho
+        with span("tv.ligar", tv=tv_nome, webhook=enviar_webhook) as atual:
+            sucesso = self._ligar_tv(tv_nome, enviar_webhook, aguardar_vm)
+            if atual:
+                atual.definir(sucesso=sucesso)
+            return sucesso
+    
+    def _ligar_tv(self, tv_nome: str, enviar_webhook: bool, aguardar_vm: bool) -> bool:
+        """Sequência de ligar (ver ligar_tv)"""
         if not self.tv_service.tv_existe(tv_nome):
             log(f"[{tv_nome}] TV não encontrada", "ERROR")
             return False
         
+        if not self._reservar_para_comando(tv_nome):
+            return False
+        
         try:
             # Marca início da sequência
             self._marcar_inicio_sequencia(tv_nome)
             
-            tv = SmartThingsTV(config.ACCESS_TOKEN)
+            tv = SmartThingsTV(obter_token())
             tv_info = self.tv_service.obter_tv(tv_nome)
             tv_id = tv_info["id"] if isinstance(tv_info, dict) else tv_info
             
@@ -136,12 +206,16 @@ class TVController:
             
             # Envia webhook para ligar máquina virtual (apenas se solicitado)
             if enviar_webhook:
-                self.webhook_service.enviar_comando_ligar(tv_nome)
+                if aguardar_vm:
+                    self.webhook_service.resetar_vm_pronta(tv_nome)
+                self.webhook_service.enfileirar_comando_ligar(tv_nome)
             else:
-                log(f"[{tv_nome}] Webhook ignorado (BI já está ligado)", "INFO")
+                log(f"[{tv_nome}] Webhook não enviado por esta TV (já enviado em lote ou desativado)", "INFO")
             
             # Executa sequência de inicialização
-            self.sequence_mapper.executar_sequencia(tv, tv_id, tv_nome)
+            self.sequence_mapper.executar_sequencia(tv, tv_id, tv_nome, self._portao_vm(tv_nome, aguardar_vm))
+            # Referência de estado saudável para o keep alive
+            self._registrar_estado_esperado_depois(tv_nome, enviar_webhook or aguardar_vm)
             
             return True
         except Exception as e:
@@ -150,6 +224,30 @@ class TVController:
         finally:
             # Marca fim da sequência (sempre executa, mesmo com erro)
             self._marcar_fim_sequencia(tv_nome)
+            self.liberar_tv(tv_nome)
+    
+    def desligar_tv(self, tv_nome: str) -> bool:
+        """Desliga uma TV específica"""
+        if not self.tv_service.tv_existe(tv_nome):
+            log(f"[{tv_nome}] TV não encontrada", "ERROR")
+            return False
+        
+        if not self._reservar_para_comando(tv_nome):
+            return False
+        
+        try:
+            tv = SmartThingsTV(obter_token())
+            tv_info = self.tv_service.obter_tv(tv_nome)
+            tv_id = tv_info["id"] if isinstance(tv_info, dict) else tv_info
+            
+            resultado = bool(desligar_tv(tv, tv_id, tv_nome, delay=0))
+            self.tv_service.invalidar_status(tv_nome)
+            return resultado
+        except Exception as e:
+            log(f"[{tv_nome}] Erro ao desligar: {e}", "ERROR")
+            return False
+        finally:
+            self.liberar_tv(tv_nome)
     
     def reconectar_tv(self, tv_nome: str) -> bool:
         """Executa sequência de reconexão: Enter -> Wait 10s -> Enter"""
@@ -157,8 +255,11 @@ class TVController:
             log(f"[{tv_nome}] TV não encontrada", "ERROR")
             return False
         
+        if not self._reservar_para_comando(tv_nome):
+            return False
+        
         try:
-            tv = SmartThingsTV(config.ACCESS_TOKEN)
+            tv = SmartThingsTV(obter_token())
             tv_info = self.tv_service.obter_tv(tv_nome)
             tv_id = tv_info["id"] if isinstance(tv_info, dict) else tv_info
             
@@ -171,6 +272,8 @@ class TVController:
         except Exception as e:
             log(f"[{tv_nome}] Erro na reconexão: {e}", "ERROR")
             return False
+        finally:
+            self.liberar_tv(tv_nome)
     
     def desligar_tvs_exceto_reuniao(self) -> dict:
         """
@@ -225,14 +328,19 @@ class TVController:
                 tv_id = tv_info["id"] if isinstance(tv_info, dict) else tv_info
                 
                 def desligar_thread(nome, tv_id):
+                    if not self._reservar_para_comando(nome):
+                        tvs_com_erro.append(nome)
+                        return
                     try:
-                        tv = SmartThingsTV(config.ACCESS_TOKEN)
+                        tv = SmartThingsTV(obter_token())
                         desligar_tv(tv, tv_id, nome, delay=1)
                         tvs_desligadas.append(nome)
                         log(f"✅ [{nome}] Desligada com sucesso", "SUCCESS")
                     except Exception as e:
                         tvs_com_erro.append(nome)
                         log(f"❌ [{nome}] Erro ao desligar: {e}", "ERROR")
+                    finally:
+                        self.liberar_tv(nome)
                 
                 thread = threading.Thread(target=desligar_thread, args=(nome_tv, tv_id))
                 thread.daemon = True
@@ -246,7 +354,7 @@ class TVController:
             # Intervalo de 10 segundos entre lotes (exceto no último)
             if i + 2 < len(tvs_para_desligar):
                 log("a\\n⏳  Aguardando 10 segundos antes do próximo lote...", "INFO")
-                time.sleep(10)
+                dormir(10)
         
         # Relatório final
         log("\\n" + "="*80, "INFO")
@@ -267,37 +375,141 @@ class TVController:
             "total_erros": len(tvs_com_erro)
         }
     
-    def toggle_todas(self, enviar_webhook: bool = True) -> bool:
+    def _obter_tvs_ordenadas(self, setores: list = None) -> list:
+        """Retorna as TVs na ordem de ligamento da frota (TVs de reunião por último), opcionalmente só de alguns setores"""
+        # Ordem específica das TVs (TVs de reunião por último)
+        ordem_tvs = [
+            "TI01", "TI02", "TI03",
+            "Operação 1 - TV1", "Operação 2 - TV2",
+            "TV 1 Painel - TV3", "TV 2 Painel - TV4",
+            "TV 3 Painel - TV5", "TV 4 Painel - TV6",
+            "Gestão Industria", "Antifraude",
+            "Controladoria", "Financeiro",
+            "Cobrança", "TV-JURIDICO",
+            "TvCadastro",
+            "Cozinha Entrada", "Recepção"
+        ]
+        
+        # Adiciona TVs de reunião no final
+        tvs_disponiveis = self.tv_service.obter_tvs()
+        tvs_reuniao = [nome for nome in tvs_disponiveis.keys() 
+                      if "REUNIÃO" in nome.upper() or "REUNIAO" in nome.upper() 
+                      or nome in ["TV-ATLAS", "TV-DIA D", "TV-MOSSAD", "TV-GEO-FOREST"]]
+        
+        # Filtra apenas TVs que existem no sistema
+        tvs_ordenadas = [tv for tv in ordem_tvs if tv in tvs_disponiveis]
+        tvs_ordenadas.extend(tvs_reuniao)
+        if setores:
+            tvs_ordenadas = [tv for tv in tvs_ordenadas if tvs_disponiveis[tv].get("setor") in setores]
+        return tvs_ordenadas
+    
+    def _registrar_estado_esperado_depois(self, tv_nome: str, esperar_vm: bool):
+        """Amostra o estado saudável em segundo plano, depois da VM pronta e de KEEP_ALIVE_ESTADO_ESPERADO_ATRASO"""
+        def registrar():
+            if esperar_vm and self.webhook_service.tv_tem_webhook(tv_nome):
+                self.webhook_service.aguardar_vm_pronta(tv_nome, config.PIPELINE_VM_TIMEOUT)
+            dormir(config.KEEP_ALIVE_ESTADO_ESPERADO_ATRASO)
+            self.tv_service.registrar_estado_esperado(tv_nome)
+        
+        thread = threading.Thread(target=propagar(registrar))
+        thread.daemon = True
+        thread.start()
+    
+    def _tvs_desligadas(self, tvs_ordenadas: list) -> list:
+        """TVs que o status (cache de até STATUS_MAX_IDADE) não mostra ligadas: no toggle só elas vão ligar"""
+        status = self.tv_service.atualizar_status_todas(max_idade=config.STATUS_MAX_IDADE)
+        return [tv for tv in tvs_ordenadas if not (status.get(tv) or {}).get("is_on")]
+    
+    def _portao_vm(self, tv_nome: str, aguardar_vm: bool):
+        """Retorna a espera pela VM pronta usada antes do ENTER final (ou None se desativada)"""
+        if not aguardar_vm or not self.webhook_service.tv_tem_webhook(tv_nome):
+            return None
+        
+        def aguardar():
+            log(f"[{tv_nome}] Aguardando máquina virtual ficar pronta antes do ENTER final...", "INFO")
+            if self.webhook_service.aguardar_vm_pronta(tv_nome, config.PIPELINE_VM_TIMEOUT):
+                log(f"[{tv_nome}] Máquina virtual pronta - abrindo BI", "SUCCESS")
+            else:
+                log(f"[{tv_nome}] VM não sinalizou em {config.PIPELINE_VM_TIMEOUT}s - abrindo BI mesmo assim", "WARNING")
+        
+        return aguardar
+    
+    def _executar_pipeline(self, tvs_ordenadas: list, executar_tv, enviar_webhook: bool, aguardar_vm: bool,
+                           tvs_aquecer: Optional[list] = None):
+        """
+        Modo pipeline: liga todas as VMs antes (com limite de taxa) e executa as sequências
+        conforme os slots liberam, sem esperar o bloco inteiro terminar
+        
+        Args:
+            executar_tv: Função (tv_nome, enviar_webhook, aguardar_vm) executada para cada TV
+            tvs_aquecer: TVs cujas VMs são pré-aquecidas (None = todas); as demais enviam o próprio webhook
+        """
+        total_tvs = len(tvs_ordenadas)
+        webhook_pendente = set()
+        
+        if enviar_webhook:
+            if tvs_aquecer is None:
+                tvs_aquecer = tvs_ordenadas
+            webhook_pendente.update(tv for tv in tvs_ordenadas if tv not in tvs_aquecer)
+            tvs_com_webhook = [tv for tv in tvs_aquecer if self.webhook_service.tv_tem_webhook(tv)]
+            lote = config.PIPELINE_WEBHOOK_LOTE
+            log(f"[PIPELINE] Pré-aquecendo {len(tvs_com_webhook)} máquinas virtuais (lotes de {lote})...", "INFO")
+            
+            for i in range(0, len(tvs_com_webhook), lote):
+                tvs_lote = tvs_com_webhook[i:i + lote]
+                if aguardar_vm:
+                    for tv_nome in tvs_lote:
+                        self.webhook_service.resetar_vm_pronta(tv_nome)
+                # Lote que falhar volta a enviar o webhook individualmente no início da sequência
+                if not self.webhook_service.enviar_comando_ligar_lote(tvs_lote):
+                    webhook_pendente.update(tvs_lote)
+                if i + lote < len(tvs_com_webhook):
+                    dormir(config.PIPELINE_WEBHOOK_INTERVALO)
+        
+        slots = threading.Semaphore(config.PIPELINE_SLOTS)
+        threads = []
+        
+        def executar_slot(tv_nome):
+            try:
+                executar_tv(tv_nome, tv_nome in webhook_pendente, aguardar_vm and enviar_webhook)
+            finally:
+                slots.release()
+        
+        log(f"[PIPELINE] Executando {total_tvs} sequências ({config.PIPELINE_SLOTS} slots)...", "INFO")
+        for idx, tv_nome in enumerate(tvs_ordenadas, 1):
+            slots.acquire()
+            log(f"[PIPELINE] ({idx}/{total_tvs}) Slot livre - iniciando {tv_nome}", "INFO")
+            thread = threading.Thread(target=propagar(executar_slot), args=(tv_nome,))
+            thread.daemon = True
+            threads.append(thread)
+            thread.start()
+            if idx < total_tvs:
+                dormir(config.PIPELINE_INTERVALO_INICIO)
+        
+        for thread in threads:
+            thread.join()
+        
+        log("[PIPELINE] Todas as sequências finalizadas!", "SUCCESS")
+    
+    def toggle_todas(self, enviar_webhook: bool = True, pipeline: bool = False, aguardar_vm: bool = False,
+                     aguardar: bool = False) -> bool:
         """
         Executa toggle em todas as TVs em blocos de 2 com execução intercalada e intervalo de 10s
         
         Args:
             enviar_webhook: Se True, envia webhook para ligar BIs. Se False, apenas liga TVs
+            pipeline: Se True, usa o modo pipeline (VMs pré-aquecidas, slots em vez de blocos)
+            aguardar_vm: No modo pipeline, aguarda a VM pronta antes do ENTER final
+            aguardar: Se True, bloqueia até todas as TVs terminarem (usado pelos benchmarks)
         """
+        def executar_pipeline():
+            tvs_ordenadas = self._obter_tvs_ordenadas()
+            log(f"Iniciando toggle de {len(tvs_ordenadas)} TVs em modo PIPELINE ({'COM' if enviar_webhook else 'SEM'} webhook para BIs)...", "INFO")
+            tvs_aquecer = self._tvs_desligadas(tvs_ordenadas) if enviar_webhook else []
+            self._executar_pipeline(tvs_ordenadas, self._toggle_tv_interno, enviar_webhook, aguardar_vm, tvs_aquecer)
+        
         def executar_todas():
-            # Ordem específica das TVs (TVs de reunião por último)
-            ordem_tvs = [
-                "TI01", "TI02", "TI03",
-                "Operação 1 - TV1", "Operação 2 - TV2",
-                "TV 1 Painel - TV3", "TV 2 Painel - TV4",
-                "TV 3 Painel - TV5", "TV 4 Painel - TV6",
-                "Gestão Industria", "Antifraude",
-                "Controladoria", "Financeiro",
-                "Cobrança", "TV-JURIDICO",
-                "TvCadastro",
-                "Cozinha Entrada", "Recepção"
-            ]
-            
-            # Adiciona TVs de reunião no final
-            tvs_disponiveis = self.tv_service.obter_tvs()
-            tvs_reuniao = [nome for nome in tvs_disponiveis.keys() 
-                          if "REUNIÃO" in nome.upper() or "REUNIAO" in nome.upper() 
-                          or nome in ["TV-ATLAS", "TV-DIA D", "TV-MOSSAD", "TV-GEO-FOREST"]]
-            
-            # Filtra apenas TVs que existem no sistema
-            tvs_ordenadas = [tv for tv in ordem_tvs if tv in tvs_disponiveis]
-            tvs_ordenadas.extend(tvs_reuniao)
-            
+            tvs_ordenadas = self._obter_tvs_ordenadas()
             total_tvs = len(tvs_ordenadas)
             
             if enviar_webhook:
@@ -305,6 +517,14 @@ class TVController:
             else:
                 log(f"Iniciando toggle de {total_tvs} TVs em blocos de 2 INTERCALADOS (SEM webhook - BIs já ligados)...", "INFO")
             
+            # Liga em uma única requisição só as máquinas virtuais das TVs desligadas (as ligadas serão desligadas).
+            # As TVs fora do lote, ou todas se ele falhar, enviam o próprio webhook se estiverem desligadas no toggle.
+            webhook_por_tv = set(tvs_ordenadas) if enviar_webhook else set()
+            if enviar_webhook:
+                tvs_lote = self._tvs_desligadas(tvs_ordenadas)
+                if tvs_lote and self.webhook_service.enviar_comando_ligar_lote(tvs_lote):
+                    webhook_por_tv -= set(tvs_lote)
+            
             # Processa em blocos de 2 com execução intercalada
             for i in range(0, total_tvs, 2):
                 bloco = tvs_ordenadas[i:i+2]
@@ -317,23 +537,23 @@ class TVController:
                     tv1, tv2 = bloco[0], bloco[1]
                     
                     # Inicia threads para ambas as TVs
-                    thread1 = threading.Thread(target=self._toggle_tv_interno, args=(tv1, enviar_webhook))
-                    thread2 = threading.Thread(target=self._toggle_tv_interno, args=(tv2, enviar_webhook))
+                    thread1 = threading.Thread(target=propagar(self._toggle_tv_interno), args=(tv1, tv1 in webhook_por_tv))
+                    thread2 = threading.Thread(target=propagar(self._toggle_tv_interno), args=(tv2, tv2 in webhook_por_tv))
                     
                     thread1.start()
                     log(f"[BLOCO {bloco_num}] {tv1} iniciada, aguardando 10s...", "INFO")
-                    time.sleep(10)
+                    dormir(10)
                     
                     thread2.start()
                     log(f"[BLOCO {bloco_num}] {tv2} iniciada, aguardando 10s...", "INFO")
-                    time.sleep(10)
+                    dormir(10)
                     
                     # Aguarda ambas finalizarem
                     thread1.join()
                     thread2.join()
                 else:
                     # Apenas 1 TV no bloco (última TV ímpar)
-                    thread = threading.Thread(target=self._toggle_tv_interno, args=(bloco[0], enviar_webhook))
+                    thread = threading.Thread(target=propagar(self._toggle_tv_interno), args=(bloco[0], bloco[0] in webhook_por_tv))
                     thread.start()
                     thread.join()
                 
@@ -341,22 +561,40 @@ class TVController:
             
             log("Todas as sequências finalizadas!", "SUCCESS")
         
-        thread = threading.Thread(target=executar_todas)
+        def executar():
+            # Job de frota: span raiz do trace (cada TV é um filho)
+            with span("frota.toggle_todas", raiz=True, modo="pipeline" if pipeline else "blocos", webhook=enviar_webhook):
+                (executar_pipeline if pipeline else executar_todas)()
+        
+        thread = threading.Thread(target=executar)
         thread.daemon = True
         thread.start()
+        if aguardar:
+            thread.join()
         return True
     
-    def _toggle_tv_interno(self, tv_nome: str, enviar_webhook: bool) -> bool:
+    def _toggle_tv_interno(self, tv_nome: str, enviar_webhook: bool, aguardar_vm: bool = False) -> bool:
         """Método interno para toggle com controle de webhook"""
+        with span("tv.toggle", tv=tv_nome, webhook=enviar_webhook) as atual:
+            sucesso = self._toggle_tv(tv_nome, enviar_webhook, aguardar_vm)
+            if atual:
+                atual.definir(sucesso=sucesso)
+            return sucesso
+    
+    def _toggle_tv(self, tv_nome: str, enviar_webhook: bool, aguardar_vm: bool) -> bool:
+        """Sequência de toggle (ver _toggle_tv_interno)"""
         if not self.tv_service.tv_existe(tv_nome):
             log(f"[{tv_nome}] TV não encontrada", "ERROR")
             return False
         
+        if not self._reservar_para_comando(tv_nome):
+            return False
+        
         try:
             # Marca início da sequência
             self._marcar_inicio_sequencia(tv_nome)
             
-            tv = SmartThingsTV(config.ACCESS_TOKEN)
+            tv = SmartThingsTV(obter_token())
             tv_info = self.tv_service.obter_tv(tv_nome)
             tv_id = tv_info["id"] if isinstance(tv_info, dict) else tv_info
             
@@ -380,12 +618,16 @@ class TVController:
                 
                 # Envia webhook se solicitado
                 if enviar_webhook:
-                    self.webhook_service.enviar_comando_ligar(tv_nome)
+                    if aguardar_vm:
+                        self.webhook_service.resetar_vm_pronta(tv_nome)
+                    self.webhook_service.enfileirar_comando_ligar(tv_nome)
                 else:
-                    log(f"[{tv_nome}] Webhook ignorado", "INFO")
+                    log(f"[{tv_nome}] Webhook não enviado por esta TV (já enviado em lote ou desativado)", "INFO")
                 
                 # Executa sequência
-                self.sequence_mapper.executar_sequencia(tv, tv_id, tv_nome)
+                self.sequence_mapper.executar_sequencia(tv, tv_id, tv_nome, self._portao_vm(tv_nome, aguardar_vm))
+                # Referência de estado saudável para o keep alive
+                self._registrar_estado_esperado_depois(tv_nome, enviar_webhook or aguardar_vm)
             
             return True
         except Exception as e:
@@ -394,45 +636,45 @@ class TVController:
         finally:
             # Marca fim da sequência (sempre executa, mesmo com erro)
             self._marcar_fim_sequencia(tv_nome)
+            self.liberar_tv(tv_nome)
 
-    def ligar_todas_automatico(self):
+    def ligar_todas_automatico(self, pipeline: bool = False, aguardar_vm: bool = False, aguardar: bool = False,
+                               setores: list = None):
         """
         Liga todas as TVs automaticamente (agendamento diário)
         Executa de 2 em 2 TVs com intervalo de 20 segundos entre grupos
+        
+        Args:
+            pipeline: Se True, usa o modo pipeline (VMs pré-aquecidas, slots em vez de blocos)
+            aguardar_vm: No modo pipeline, aguarda a VM pronta antes do ENTER final
+            aguardar: Se True, bloqueia até todas as TVs terminarem (usado pelo scheduler)
+            setores: Liga apenas as TVs destes setores (None = todas)
         """
+        def executar_pipeline():
+            tvs_ordenadas = self._obter_tvs_ordenadas(setores)
+            log("="*80, "INFO")
+            log(f" LIGAMENTO AUTOMÁTICO (PIPELINE) - {len(tvs_ordenadas)} TVs ({config.PIPELINE_SLOTS} slots)", "INFO")
+            log("="*80, "INFO")
+            # TVs já ligadas são puladas por ligar_tv: não acorda as VMs delas
+            self._executar_pipeline(tvs_ordenadas, self.ligar_tv, True, aguardar_vm, self._tvs_desligadas(tvs_ordenadas))
+            log(" LIGAMENTO AUTOMÁTICO FINALIZADO!", "SUCCESS")
+        
         def executar_todas():
-            # Ordem específica das TVs (TVs de reunião por último)
-            ordem_tvs = [
-                "TI01", "TI02", "TI03",
-                "Operação 1 - TV1", "Operação 2 - TV2",
-                "TV 1 Painel - TV3", "TV 2 Painel - TV4",
-                "TV 3 Painel - TV5", "TV 4 Painel - TV6",
-                "Gestão Industria", "Antifraude",
-                "Controladoria", "Financeiro",
-                "Cobrança", "TV-JURIDICO",
-                "TvCadastro",
-                "Cozinha Entrada", "Recepção"
-            ]
-            
-            # Adiciona TVs de reunião no final
-            tvs_disponiveis = self.tv_service.obter_tvs()
-            tvs_reuniao = [nome for nome in tvs_disponiveis.keys() 
-                          if "REUNIÃO" in nome.upper() or "REUNIAO" in nome.upper() 
-                          or nome in ["TV-ATLAS", "TV-DIA D", "TV-MOSSAD", "TV-GEO-FOREST"]]
-            
-            # Filtra apenas TVs que existem no sistema
-            tvs_ordenadas = [tv for tv in ordem_tvs if tv in tvs_disponiveis]
-            tvs_ordenadas.extend(tvs_reuniao)
-            
+            tvs_ordenadas = self._obter_tvs_ordenadas(setores)
             total_tvs = len(tvs_ordenadas)
             
             log("="*80, "INFO")
             log(f" LIGAMENTO AUTOMÁTICO - {total_tvs} TVs (grupos de 2)", "INFO")
             log("="*80, "INFO")
             
-            # Envia webhook ANTES de começar (DESATIVADO por enquanto)
-            # log(" Enviando webhook para ligar BIs...", "INFO")
-            # self.webhook_service.enviar_webhook(tvs_ordenadas)
+            # Envia webhook ANTES de começar (uma única requisição para os BIs das TVs desligadas).
+            # As TVs fora do lote, ou todas se ele falhar, enviam o próprio webhook se estiverem desligadas.
+            webhook_por_tv = set(tvs_ordenadas)
+            tvs_lote = self._tvs_desligadas(tvs_ordenadas)
+            if tvs_lote:
+                log(f" Enviando webhook para ligar {len(tvs_lote)} BIs...", "INFO")
+                if self.webhook_service.enviar_comando_ligar_lote(tvs_lote):
+                    webhook_por_tv -= set(tvs_lote)
             
             # Processa em blocos de 2 com 20 segundos de intervalo
             for i in range(0, total_tvs, 2):
@@ -446,9 +688,9 @@ class TVController:
                 for idx, tv_nome in enumerate(bloco):
                     if idx > 0:
                         log(f"  Aguardando 10 segundos para iniciar a próxima TV do bloco...", "INFO")
-                        time.sleep(10)
+                        dormir(10)
                         
-                    thread = threading.Thread(target=self.ligar_tv, args=(tv_nome, True))  # True = envia webhook
+                    thread = threading.Thread(target=propagar(self.ligar_tv), args=(tv_nome, tv_nome in webhook_por_tv))
                     thread.daemon = True
                     threads.append(thread)
                     thread.start()
@@ -462,13 +704,21 @@ class TVController:
                 # Aguarda 20 segundos antes do próximo bloco (exceto no último)
                 if i + 2 < total_tvs:
                     log(f"  Aguardando 60 segundos antes do próximo bloco...", "INFO")
-                    time.sleep(60)
+                    dormir(60)
             
             log("\n" + "="*80, "INFO")
             log(" LIGAMENTO AUTOMÁTICO FINALIZADO!", "SUCCESS")
             log("="*80, "INFO")
         
-        thread = threading.Thread(target=executar_todas)
+        def executar():
+            # Job de frota: span raiz do trace (cada TV é um filho)
+            with span("frota.ligar_automatico", raiz=True, modo="pipeline" if pipeline else "blocos",
+                      setores=",".join(setores) if setores else "todos"):
+                (executar_pipeline if pipeline else executar_todas)()
+        
+        thread = threading.Thread(target=executar)
         thread.daemon = True
         thread.start()
+        if aguardar:
+            thread.join()
         return True
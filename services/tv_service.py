@@ -3,10 +3,14 @@ Serviço de gerenciamento de TVs
 Responsável por toda lógica relacionada às TVs
 """
 
-import requests
-from typing import Dict, Optional, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+from typing import Dict, Iterator, Optional, List
 from controllers import SmartThingsTV
-from utils import log
+from utils import log, cliente_http
+from utils.estado_compartilhado import obter_estado
+from utils.token_acesso import obter_token
 import config
 
 
@@ -15,17 +19,22 @@ class TVService:
     
     def __init__(self):
         self.tvs_cache: Dict[str, Dict] = {}
-        self.access_token = config.ACCESS_TOKEN
+        # Status em cache ("status") e estado esperado com o BI aberto ("estado_esperado")
+        # ficam no estado compartilhado, visível para todos os workers
+        self.estado = obter_estado()
+        # Uma consulta por TV de cada vez: painéis simultâneos com o cache vencido esperam a mesma resposta
+        self._consultas = {}
+        self._consultas_lock = threading.Lock()
     
     def carregar_tvs(self) -> bool:
         """Busca todas as TVs da API e monta o dicionário com nome, id e setor"""
         try:
-            url = "https://api.smartthings.com/v1/devices"
+            url = f"{config.SMARTTHINGS_API_URL}/devices"
             headers = {
                 "Authorization": f"Bearer {self.access_token}",
                 "Content-Type": "application/json"
             }
-            response = requests.get(url, headers=headers, timeout=10)
+            response = cliente_http.get("smartthings", "listar_dispositivos", url, headers=headers, timeout=10)
             
             if response.status_code == 200:
                 devices = response.json().get('items', [])
@@ -80,11 +89,33 @@ class TVService:
         """Verifica se uma TV existe no cache"""
         return nome in self.tvs_cache
     
-    def obter_status_tv(self, nome: str) -> Optional[Dict]:
-        """Obtém o status completo de uma TV"""
+    def obter_status_tv(self, nome: str, max_idade: Optional[float] = None) -> Optional[Dict]:
+        """
+        Obtém o status completo de uma TV
+        
+        Args:
+            max_idade: Se informado, reaproveita o status em cache com até esse número de segundos
+        """
         if nome not in self.tvs_cache:
             return None
         
+        if max_idade is not None:
+            status = self.estado.obter("status", nome, max_idade=max_idade)
+            if status is not None:
+                return status
+            with self._consultas_lock:
+                consulta = self._consultas.setdefault(nome, threading.Lock())
+            with consulta:
+                # Outra thread pode ter consultado enquanto esta esperava
+                status = self.estado.obter("status", nome, max_idade=max_idade)
+                if status is not None:
+                    return status
+                return self._consultar_status(nome)
+        
+        return self._consultar_status(nome)
+    
+    def _consultar_status(self, nome: str) -> Dict:
+        """Consulta o status na API e grava no estado compartilhado"""
         tv = SmartThingsTV(self.access_token)
         tv_info = self.tvs_cache[nome]
         tv_id = tv_info["id"] if isinstance(tv_info, dict) else tv_info
@@ -95,9 +126,11 @@ class TVService:
         current_app = None
         input_source = None
         volume = None
+        ultima_atividade = None
         
         if status_data:
             is_online = True
+            ultima_atividade = self._ultima_atividade(status_data)
             try:
                 switch_value = status_data['components']['main']['switch']['switch']['value']
                 is_on = (switch_value == 'on')
@@ -119,17 +152,116 @@ class TVService:
             except (KeyError, TypeError):
                 pass
         
-        return {
+        status = {
             "is_on": is_on,
             "is_online": is_online,
             "current_app": current_app,
             "input_source": input_source,
             "volume": volume,
+            "ultima_atividade": ultima_atividade,
             "setor": tv_info.get("setor", "Sem Setor")
         }
+        
+        self.estado.definir("status", nome, status)
+        return status
+    
+    def atualizar_status_todas(self, max_idade: Optional[float] = None) -> Dict[str, Dict]:
+        """Obtém o status de todas as TVs em paralelo (reaproveitando o cache com até max_idade segundos)"""
+        nomes = list(self.tvs_cache.keys())
+        if not nomes:
+            return {}
+        with ThreadPoolExecutor(max_workers=config.STATUS_WORKERS) as executor:
+            resultados = executor.map(lambda nome: self.obter_status_tv(nome, max_idade=max_idade), nomes)
+            return {nome: status for nome, status in zip(nomes, resultados) if status}
+    
+    def status_conforme_chegam(self, prazo: float, max_idade: Optional[float] = None) -> Iterator[Dict]:
+        """
+        Consulta o status de todas as TVs em um pool limitado e entrega cada uma assim que responde
+        
+        Args:
+            prazo: Segundos máximos para a frota inteira; TVs pendentes saem com erro "prazo"
+            max_idade: Se informado, reaproveita status em cache com até esse número de segundos
+        
+        Yields:
+            {"tv", "status" ou "erro", "latencia_ms" (da consulta da TV), "chegada_ms" (desde o início)}
+        """
+        inicio = time.time()
+        
+        def consultar(nome):
+            inicio_tv = time.time()
+            try:
+                return self.obter_status_tv(nome, max_idade), None, time.time() - inicio_tv
+            except Exception as e:
+                return None, str(e), time.time() - inicio_tv
+        
+        executor = ThreadPoolExecutor(max_workers=config.STATUS_WORKERS)
+        futuros = {executor.submit(consultar, nome): nome for nome in self.tvs_cache}
+        pendentes = set(futuros)
+        try:
+            for futuro in as_completed(futuros, timeout=prazo):
+                pendentes.discard(futuro)
+                status, erro, duracao = futuro.result()
+                linha = {"tv": futuros[futuro]}
+                if status is not None:
+                    linha["status"] = status
+                else:
+                    linha["erro"] = erro or "TV não encontrada"
+                linha["latencia_ms"] = round(duracao * 1000)
+                linha["chegada_ms"] = round((time.time() - inicio) * 1000)
+                yield linha
+        except FuturesTimeout:
+            for futuro in pendentes:
+                yield {"tv": futuros[futuro], "erro": "prazo", "latencia_ms": None,
+                       "chegada_ms": round((time.time() - inicio) * 1000)}
+        finally:
+            # Não espera as consultas atrasadas (terminam sozinhas no timeout do cliente HTTP)
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def invalidar_status(self, nome: str):
+        """Descarta o status em cache de uma TV (ex: após enviar comandos)"""
+        self.estado.remover("status", nome)
+    
+    @staticmethod
+    def _ultima_atividade(status_data: Dict) -> Optional[str]:
+        """Retorna o timestamp (ISO) mais recente entre os atributos de energia, entrada e app"""
+        caminhos = [
+            ('switch', 'switch'),
+            ('samsungvd.mediaInputSource', 'inputSource'),
+            ('tvChannel', 'tvChannelName')
+        ]
+        timestamps = []
+        for capability, atributo in caminhos:
+            try:
+                timestamp = status_data['components']['main'][capability][atributo]['timestamp']
+                if timestamp:
+                    timestamps.append(timestamp)
+            except (KeyError, TypeError):
+                pass
+        # Timestamps ISO 8601 em UTC são comparáveis como texto
+        return max(timestamps) if timestamps else None
+    
+    def registrar_estado_esperado(self, nome: str) -> Optional[Dict]:
+        """Memoriza entrada/app atuais da TV como o estado saudável (BI aberto)"""
+        status = self.obter_status_tv(nome)
+        if not status or not status["is_on"]:
+            return None
+        
+        estado = {"input_source": status["input_source"], "current_app": status["current_app"]}
+        self.estado.definir("estado_esperado", nome, estado)
+        log(f"[{nome}] Estado esperado registrado: entrada={estado['input_source']}, app={estado['current_app']}", "INFO")
+        return estado
+    
+    def obter_estado_esperado(self, nome: str) -> Optional[Dict]:
+        """Retorna o estado saudável da TV (configurado em config.py ou aprendido após a sequência)"""
+        if nome in config.KEEP_ALIVE_ESTADO_ESPERADO:
+            return config.KEEP_ALIVE_ESTADO_ESPERADO[nome]
+        return self.estado.obter("estado_esperado", nome)
+    
+    @property
+    def access_token(self) -> str:
+        """Token atual (relido do config.py quando a renovação o reescreve, em qualquer worker)"""
+        return obter_token()
     
-    def recarregar_token(self):
+    def recarregar_token(self) -> str:
         """Atualiza o token de acesso"""
-        import importlib
-        importlib.reload(config)
-        self.access_token = config.ACCESS_TOKEN
+        return obter_token()
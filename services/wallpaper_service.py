@@ -0,0 +1,116 @@
+"""
+Serviço de Wallpaper
+Processa imagens enviadas (redimensiona, recomprime) e evita reenvios idênticos por TV
+"""
+
+import base64
+import binascii
+import hashlib
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+from PIL import Image, ImageOps
+from utils import log
+from utils.estado_compartilhado import obter_estado
+import config
+
+
+class WallpaperService:
+    """Pipeline de upload de wallpapers: redimensiona, gera hash e envia via webhook"""
+    
+    def __init__(self, webhook_service):
+        self.webhook_service = webhook_service
+        # Hash do wallpaper atual por TV no estado compartilhado (um upload em qualquer worker vale para todos)
+        self.estado = obter_estado()
+        self._migrar_hashes(Path(config.WALLPAPER_HASHES_FILE))
+    
+    def _migrar_hashes(self, arquivo: Path):
+        """Importa os hashes do antigo wallpaper_hashes.json (só as TVs ainda sem hash no estado compartilhado)"""
+        try:
+            if arquivo.exists():
+                with open(arquivo, 'r', encoding='utf-8') as f:
+                    for tv_nome, hash_imagem in json.load(f).items():
+                        if self.estado.obter("wallpaper_hash", tv_nome) is None:
+                            self.estado.definir("wallpaper_hash", tv_nome, hash_imagem)
+        except Exception as e:
+            log(f"[WALLPAPER] Erro ao migrar hashes de {arquivo.name}: {e}", "WARNING")
+    
+    def _salvar_hash(self, tv_nome: str, hash_imagem: str):
+        """Registra o hash do wallpaper atual de uma TV"""
+        self.estado.definir("wallpaper_hash", tv_nome, hash_imagem)
+    
+    def registrar_base64(self, tv_nome: str, base64_image: str):
+        """Atualiza o hash após um envio pelo endpoint legado (base64); se não decodificar, descarta o hash"""
+        try:
+            imagem = base64.b64decode(base64_image.split(",", 1)[-1], validate=True)
+        except (binascii.Error, ValueError):
+            self.estado.remover("wallpaper_hash", tv_nome)
+            return
+        self._salvar_hash(tv_nome, hashlib.sha256(imagem).hexdigest())
+    
+    def obter_resolucao(self, tv_nome: str) -> tuple:
+        """Retorna a resolução (largura, altura) da TV"""
+        return tuple(config.WALLPAPER_RESOLUCOES.get(tv_nome, config.WALLPAPER_RESOLUCAO_PADRAO))
+    
+    def processar_imagem(self, arquivo, resolucao: tuple) -> bytes:
+        """
+        Reduz a imagem para caber na resolução da TV e recomprime em JPEG
+        
+        Args:
+            arquivo: Objeto file-like (lido diretamente do upload, sem cópia em memória)
+            resolucao: (largura, altura) máxima
+        """
+        arquivo.seek(0)
+        with Image.open(arquivo) as imagem:
+            # Reduz a decodificação de JPEGs grandes já na leitura
+            imagem.draft("RGB", resolucao)
+            imagem = ImageOps.exif_transpose(imagem)
+            if imagem.mode != "RGB":
+                imagem = imagem.convert("RGB")
+            imagem.thumbnail(resolucao, Image.LANCZOS)
+            
+            saida = io.BytesIO()
+            imagem.save(saida, format="JPEG", quality=config.WALLPAPER_QUALIDADE, optimize=True, progressive=True)
+        return saida.getvalue()
+    
+    def enviar(self, tv_nome: str, imagem: bytes, forcar: bool = False) -> dict:
+        """Envia o wallpaper processado, pulando o webhook se a TV já tem a mesma imagem"""
+        hash_imagem = hashlib.sha256(imagem).hexdigest()
+        
+        hash_atual = self.estado.obter("wallpaper_hash", tv_nome)
+        
+        if not forcar and hash_atual == hash_imagem:
+            log(f"[{tv_nome}] Wallpaper idêntico ao atual ({hash_imagem[:12]}) - envio ignorado", "INFO")
+            return {"success": True, "ignorado": True, "hash": hash_imagem}
+        
+        log(f"[{tv_nome}] Wallpaper processado: {len(imagem) // 1024} KB ({hash_imagem[:12]})", "INFO")
+        sucesso = self.webhook_service.enviar_comando_wallpaper(tv_nome, base64.b64encode(imagem).decode("ascii"))
+        if sucesso:
+            self._salvar_hash(tv_nome, hash_imagem)
+        
+        return {"success": sucesso, "ignorado": False, "hash": hash_imagem}
+    
+    def enviar_upload(self, tv_nomes: List[str], arquivo, forcar: bool = False) -> Dict[str, dict]:
+        """
+        Processa um upload uma vez por resolução e envia para as TVs em paralelo
+        
+        Returns:
+            dict: Resultado por TV
+        """
+        imagens_por_resolucao = {}
+        for tv_nome in tv_nomes:
+            resolucao = self.obter_resolucao(tv_nome)
+            if resolucao not in imagens_por_resolucao:
+                imagens_por_resolucao[resolucao] = self.processar_imagem(arquivo, resolucao)
+        
+        def enviar_tv(tv_nome):
+            try:
+                return self.enviar(tv_nome, imagens_por_resolucao[self.obter_resolucao(tv_nome)], forcar)
+            except Exception as e:
+                log(f"[{tv_nome}] Erro ao enviar wallpaper: {e}", "ERROR")
+                return {"success": False, "error": str(e)}
+        
+        with ThreadPoolExecutor(max_workers=config.WALLPAPER_WORKERS) as executor:
+            return dict(zip(tv_nomes, executor.map(enviar_tv, tv_nomes)))
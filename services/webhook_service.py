@@ -4,9 +4,16 @@ Responsável pelo envio de requisições para máquinas virtuais
 """
 
 import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Optional
-from utils import log
+from utils import log, cliente_http
+from utils.estado_compartilhado import obter_estado
 import config
 
 
@@ -31,11 +38,290 @@ TV_WEBHOOK_MAP = {
 }
 
 
+class WebhookOutbox:
+    """
+    Fila persistente (SQLite) para envio assíncrono de webhooks
+    Uma thread em segundo plano entrega os itens com retry e backoff exponencial
+    """
+    
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or config.WEBHOOK_OUTBOX_DB
+        self.janela_dedupe = config.WEBHOOK_OUTBOX_DEDUPE_SEGUNDOS
+        self.max_tentativas = config.WEBHOOK_OUTBOX_MAX_TENTATIVAS
+        self.backoff_base = config.WEBHOOK_OUTBOX_BACKOFF_SEGUNDOS
+        self.backoff_max = config.WEBHOOK_OUTBOX_BACKOFF_MAX_SEGUNDOS
+        
+        # Sessão com pool de conexões reaproveitado entre entregas
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+        
+        self._lock = threading.Lock()
+        self._novo_item = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._latencias = deque(maxlen=200)
+        self._total_enviados = 0
+        self._total_falhas = 0
+        self._total_deduplicados = 0
+        
+        self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        with self._lock, self._conn:
+            # WAL: vários workers enfileiram e entregam no mesmo arquivo
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tv TEXT NOT NULL,
+                    acao TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pendente',
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    criado_em REAL NOT NULL,
+                    proxima_tentativa REAL NOT NULL,
+                    enviado_em REAL,
+                    ultimo_erro TEXT
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_pendentes ON outbox (status, proxima_tentativa)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_dedupe ON outbox (tv, acao, criado_em)")
+            # Histórico de itens finalizados é mantido por 7 dias
+            self._conn.execute(
+                "DELETE FROM outbox WHERE status != 'pendente' AND criado_em < ?",
+                (time.time() - 7 * 24 * 3600,)
+            )
+    
+    def enfileirar(self, tv: str, acao: str, url: str, payload) -> Optional[int]:
+        """
+        Grava um webhook na fila e acorda o sender
+        Retorna o ID do item, ou None se já houver um igual (tv, ação) dentro da janela de dedupe
+        """
+        agora = time.time()
+        with self._lock, self._conn:
+            # Trava de escrita antes da consulta: dois workers não enfileiram o mesmo (tv, ação) ao mesmo tempo
+            self._conn.execute("BEGIN IMMEDIATE")
+            duplicado = self._conn.execute(
+                "SELECT id FROM outbox WHERE tv = ? AND acao = ? AND criado_em >= ? AND status != 'falhou' LIMIT 1",
+                (tv, acao, agora - self.janela_dedupe)
+            ).fetchone()
+            if duplicado:
+                self._total_deduplicados += 1
+                log(f"[WEBHOOK-OUTBOX] TV {tv}: '{acao}' já enfileirado há menos de {self.janela_dedupe}s - ignorando duplicado", "INFO")
+                return None
+            
+            cursor = self._conn.execute(
+                "INSERT INTO outbox (tv, acao, url, payload, criado_em, proxima_tentativa) VALUES (?, ?, ?, ?, ?, ?)",
+                (tv, acao, url, json.dumps(payload), agora, agora)
+            )
+            item_id = cursor.lastrowid
+        
+        log(f"[WEBHOOK-OUTBOX] TV {tv}: '{acao}' enfileirado (#{item_id})", "INFO")
+        self.iniciar()
+        self._novo_item.set()
+        return item_id
+    
+    def iniciar(self):
+        """Inicia a thread de entrega (idempotente)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop_envio, daemon=True)
+                self._thread.start()
+    
+    def _proximo_item(self):
+        """Retorna o próximo item pendente e o instante da sua próxima tentativa"""
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT id, tv, acao, url, payload, tentativas, criado_em, proxima_tentativa FROM outbox "
+                "WHERE status = 'pendente' ORDER BY proxima_tentativa LIMIT 1"
+            ).fetchone()
+        if linha is None:
+            return None, None
+        return linha[:7], linha[7]
+    
+    def _reservar(self, item_id: int, proxima: float) -> bool:
+        """
+        Reserva o item para este worker adiando sua próxima tentativa
+        Retorna False se outro worker já o reservou; se este worker morrer, a reserva expira
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE outbox SET proxima_tentativa = ? WHERE id = ? AND status = 'pendente' AND proxima_tentativa = ?",
+                (time.time() + 60, item_id, proxima)
+            )
+            return cursor.rowcount == 1
+    
+    def _loop_envio(self):
+        """Entrega os itens pendentes em ordem, dormindo até a próxima tentativa"""
+        while True:
+            try:
+                item, proxima = self._proximo_item()
+                if item is None:
+                    self._novo_item.wait(timeout=config.WEBHOOK_OUTBOX_POLL_SEGUNDOS)
+                    self._novo_item.clear()
+                    continue
+                
+                espera = proxima - time.time()
+                if espera > 0:
+                    self._novo_item.wait(timeout=min(espera, config.WEBHOOK_OUTBOX_POLL_SEGUNDOS))
+                    self._novo_item.clear()
+                    continue
+                
+                if self._reservar(item[0], proxima):
+                    self._entregar(*item)
+            except Exception as e:
+                log(f"[WEBHOOK-OUTBOX] Erro no loop de envio: {e}", "ERROR")
+                time.sleep(5)
+    
+    def _entregar(self, item_id, tv, acao, url, payload, tentativas, criado_em):
+        """Tenta entregar um item e atualiza seu estado na fila"""
+        tentativas += 1
+        erro = None
+        try:
+            response = cliente_http.post("webhook", acao, url, sessao=self.session, data=payload,
+                                        headers={"Content-Type": "application/json"}, timeout=10)
+            if response.status_code >= 400:
+                erro = f"HTTP {response.status_code}"
+        except Exception as e:
+            erro = str(e)
+        
+        agora = time.time()
+        with self._lock, self._conn:
+            if erro is None:
+                self._conn.execute(
+                    "UPDATE outbox SET status = 'enviado', tentativas = ?, enviado_em = ?, ultimo_erro = NULL WHERE id = ?",
+                    (tentativas, agora, item_id)
+                )
+                self._latencias.append(agora - criado_em)
+                self._total_enviados += 1
+            elif tentativas >= self.max_tentativas:
+                self._conn.execute(
+                    "UPDATE outbox SET status = 'falhou', tentativas = ?, ultimo_erro = ? WHERE id = ?",
+                    (tentativas, erro, item_id)
+                )
+                self._total_falhas += 1
+            else:
+                atraso = min(self.backoff_base * (2 ** (tentativas - 1)), self.backoff_max)
+                self._conn.execute(
+                    "UPDATE outbox SET tentativas = ?, proxima_tentativa = ?, ultimo_erro = ? WHERE id = ?",
+                    (tentativas, agora + atraso, erro, item_id)
+                )
+        
+        if erro is None:
+            log(f"[WEBHOOK-OUTBOX] TV {tv}: '{acao}' entregue (#{item_id}, tentativa {tentativas}, {agora - criado_em:.1f}s na fila)", "SUCCESS")
+        elif tentativas >= self.max_tentativas:
+            log(f"[WEBHOOK-OUTBOX] TV {tv}: '{acao}' descartado após {tentativas} tentativas: {erro}", "ERROR")
+        else:
+            log(f"[WEBHOOK-OUTBOX] TV {tv}: '{acao}' falhou ({erro}) - nova tentativa em {atraso}s", "WARNING")
+    
+    def obter_metricas(self) -> dict:
+        """Retorna profundidade da fila e latência de entrega"""
+        with self._lock:
+            pendentes = self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pendente'").fetchone()[0]
+            latencias = sorted(self._latencias)
+        
+        def percentil(p):
+            if not latencias:
+                return None
+            return round(latencias[min(len(latencias) - 1, int(len(latencias) * p))], 3)
+        
+        return {
+            "profundidade": pendentes,
+            "enviados": self._total_enviados,
+            "falhas": self._total_falhas,
+            "deduplicados": self._total_deduplicados,
+            "latencia_p50": percentil(0.5),
+            "latencia_p95": percentil(0.95),
+            "latencia_max": round(latencias[-1], 3) if latencias else None
+        }
+
+
 class WebhookService:
     """Gerencia envio de webhooks para ligar máquinas virtuais"""
     
-    def __init__(self, webhook_url: Optional[str] = None):
+    def __init__(self, webhook_url: Optional[str] = None, outbox: Optional[WebhookOutbox] = None):
         self.webhook_url = webhook_url or config.WEBHOOK_URL
+        self.outbox = outbox or WebhookOutbox()
+        # Sinal de prontidão das máquinas virtuais (número da TV -> evento local)
+        # O sinal também vai para o estado compartilhado: pode chegar em outro worker
+        self._vms_prontas = {}
+        self._vms_lock = threading.Lock()
+        # Cache das listas de BIs no estado compartilhado (número da TV -> bis): uma edição em um worker vale para todos
+    
+    def _bis_em_cache(self, tv_number: str):
+        """Retorna os BIs em cache se ainda estiverem dentro do TTL"""
+        return obter_estado().obter("bis", tv_number)
+    
+    def _atualizar_cache_bis(self, tv_number: str, bis):
+        """Grava (ou substitui) a lista de BIs de uma TV no cache"""
+        obter_estado().definir("bis", tv_number, bis, ttl=config.BI_CACHE_TTL)
+    
+    def invalidar_cache_bis(self, tv_nome: str):
+        """Remove a lista de BIs de uma TV do cache"""
+        tv_number = TV_WEBHOOK_MAP.get(tv_nome)
+        if tv_number:
+            obter_estado().remover("bis", tv_number)
+    
+    def _evento_vm(self, tv_number: str) -> threading.Event:
+        """Retorna (criando se necessário) o evento de prontidão de uma máquina virtual"""
+        with self._vms_lock:
+            if tv_number not in self._vms_prontas:
+                self._vms_prontas[tv_number] = threading.Event()
+            return self._vms_prontas[tv_number]
+    
+    def resetar_vm_pronta(self, tv_nome: str):
+        """Marca a máquina virtual da TV como ainda não pronta (antes de ligá-la)"""
+        tv_number = TV_WEBHOOK_MAP.get(tv_nome)
+        if tv_number:
+            self._evento_vm(tv_number).clear()
+            obter_estado().remover("vm_pronta", tv_number)
+    
+    def marcar_vm_pronta(self, tv_nome: str) -> bool:
+        """Registra o sinal de que a máquina virtual da TV terminou de iniciar"""
+        tv_number = TV_WEBHOOK_MAP.get(tv_nome)
+        if not tv_number:
+            log(f"[{tv_nome}] TV não mapeada para webhook. Ignorando sinal de VM pronta.", "WARNING")
+            return False
+        obter_estado().definir("vm_pronta", tv_number, True, ttl=config.PIPELINE_VM_TIMEOUT * 2)
+        self._evento_vm(tv_number).set()
+        log(f"[{tv_nome}] Máquina virtual pronta (TV {tv_number})", "SUCCESS")
+        return True
+    
+    def aguardar_vm_pronta(self, tv_nome: str, timeout: float) -> bool:
+        """Bloqueia até a máquina virtual da TV sinalizar que está pronta (ou até o timeout)"""
+        tv_number = TV_WEBHOOK_MAP.get(tv_nome)
+        if not tv_number:
+            return True
+        
+        evento = self._evento_vm(tv_number)
+        limite = time.time() + timeout
+        while True:
+            if obter_estado().obter("vm_pronta", tv_number):
+                return True
+            restante = limite - time.time()
+            if restante <= 0:
+                return False
+            # Acorda na hora se o sinal chegar neste worker; senão consulta o estado a cada segundo
+            if evento.wait(min(restante, 1)):
+                return True
+    
+    def enfileirar_comando_ligar(self, tv_nome: str) -> bool:
+        """
+        Enfileira no outbox o webhook para ligar a máquina virtual de uma TV
+        Não bloqueia: a entrega (com retry) é feita pela thread do outbox
+        """
+        tv_number = TV_WEBHOOK_MAP.get(tv_nome)
+        
+        if not tv_number:
+            log(f"[{tv_nome}] TV não mapeada para webhook. Ignorando envio.", "WARNING")
+            return False
+        
+        if not self.webhook_url:
+            log(f"[{tv_nome}] WEBHOOK_URL não configurada. Ignorando envio.", "WARNING")
+            return False
+        
+        webhook_data = [{"output": json.dumps([{"tv": tv_number, "mode": "Turn on"}])}]
+        self.outbox.enfileirar(tv_number, "Turn on", self.webhook_url, webhook_data)
+        return True
     
     def enviar_comando_ligar(self, tv_nome: str) -> bool:
         """
@@ -54,7 +340,7 @@ class WebhookService:
             webhook_data = [{"output": inner_json}]
             
             log(f"[{tv_nome}] Enviando webhook para ligar máquina virtual...", "INFO")
-            response = requests.post(self.webhook_url, json=webhook_data, timeout=5)
+            response = cliente_http.post("webhook", "ligar_vm", self.webhook_url, json=webhook_data, timeout=5)
             
             if response.status_code >= 400:
                 log(f"[{tv_nome}] Erro no Webhook: {response.status_code}", "ERROR")
@@ -67,6 +353,45 @@ class WebhookService:
             log(f"[{tv_nome}] Erro ao enviar webhook: {e}", "ERROR")
             return False
     
+    def enviar_comando_ligar_lote(self, tv_nomes: list) -> bool:
+        """
+        Envia um único webhook para ligar as máquinas virtuais de várias TVs
+        Formato: [{"output": "[{\"tv\": \"X\", \"mode\": \"Turn on\"}, {\"tv\": \"Y\", ...}]"}]
+        """
+        try:
+            itens = []
+            tv_numbers = []
+            for tv_nome in tv_nomes:
+                tv_number = TV_WEBHOOK_MAP.get(tv_nome)
+                if not tv_number:
+                    log(f"[{tv_nome}] TV não mapeada para webhook. Ignorando envio.", "WARNING")
+                    continue
+                # Aliases do mapeamento apontam para a mesma máquina virtual
+                if tv_number in tv_numbers:
+                    continue
+                tv_numbers.append(tv_number)
+                itens.append({"tv": tv_number, "mode": "Turn on"})
+            
+            if not itens:
+                log("[WEBHOOK] Nenhuma TV mapeada no lote. Ignorando envio.", "WARNING")
+                return False
+            
+            webhook_data = [{"output": json.dumps(itens)}]
+            
+            log(f"[WEBHOOK] Enviando webhook em lote para ligar {len(itens)} máquinas virtuais...", "INFO")
+            response = cliente_http.post("webhook", "ligar_vm_lote", self.webhook_url, json=webhook_data, timeout=15)
+            
+            if response.status_code >= 400:
+                log(f"[WEBHOOK] Erro no webhook em lote: {response.status_code}", "ERROR")
+                return False
+            else:
+                log(f"[WEBHOOK] Webhook em lote enviado (TVs {', '.join(tv_numbers)}): {response.status_code}", "SUCCESS")
+                return True
+                
+        except Exception as e:
+            log(f"[WEBHOOK] Erro ao enviar webhook em lote: {e}", "ERROR")
+            return False
+    
     def enviar_comando_wallpaper(self, tv_nome: str, base64_image: str) -> bool:
         """
         Envia webhook para alterar o wallpaper de uma TV
@@ -89,7 +414,7 @@ class WebhookService:
             log(f"[{tv_nome}] Enviando webhook para alterar wallpaper...", "INFO")
             log(f"[{tv_nome}] Payload: {payload_preview}", "INFO")
             
-            response = requests.post(self.webhook_url, json=webhook_data, timeout=30)
+            response = cliente_http.post("webhook", "wallpaper", self.webhook_url, json=webhook_data, timeout=30)
             
             if response.status_code >= 400:
                 log(f"[{tv_nome}] Erro no Webhook wallpaper: {response.status_code}", "ERROR")
@@ -102,10 +427,13 @@ class WebhookService:
             log(f"[{tv_nome}] Erro ao enviar webhook wallpaper: {e}", "ERROR")
             return False
     
-    def listar_bis(self, tv_nome: str) -> dict:
+    def listar_bis(self, tv_nome: str, forcar: bool = False) -> dict:
         """
         Lista os BIs (URLs) atuais de uma TV
-        GET request para obter links abertos
+        GET request para obter links abertos (resultado em cache por BI_CACHE_TTL segundos)
+        
+        Args:
+            forcar: Se True, ignora o cache e consulta o webhook
         """
         try:
             tv_number = TV_WEBHOOK_MAP.get(tv_nome)
@@ -114,6 +442,11 @@ class WebhookService:
                 log(f"[{tv_nome}] TV não mapeada para webhook. Ignorando.", "WARNING")
                 return {"success": False, "error": "TV não mapeada"}
             
+            if not forcar:
+                bis = self._bis_em_cache(tv_number)
+                if bis is not None:
+                    return {"success": True, "bis": bis}
+            
             headers = {
                 "Authorization": f"Basic {config.BI_WEBHOOK_AUTH}",
                 "User-Agent": "Audax-View/1.0"
@@ -123,8 +456,8 @@ class WebhookService:
             
             # Usa files para enviar como multipart/form-data em GET
             # Isso simula o comportamento do curl --form
-            response = requests.get(
-                config.BI_WEBHOOK_URL,
+            response = cliente_http.get(
+                "webhook", "listar_bis", config.BI_WEBHOOK_URL,
                 headers=headers,
                 files={"TV": (None, tv_number)},
                 timeout=10
@@ -139,6 +472,7 @@ class WebhookService:
                     # Trata "No item to return was found" como lista vazia
                     if error_data.get("message") == "No item to return was found":
                         log(f"[{tv_nome}] Nenhum BI configurado nesta TV", "INFO")
+                        self._atualizar_cache_bis(tv_number, [])
                         return {"success": True, "bis": []}
                 except:
                     pass
@@ -149,16 +483,43 @@ class WebhookService:
             # Tenta parsear a resposta
             try:
                 data = response.json()
-                log(f"[{tv_nome}] BIs obtidos: {data}", "SUCCESS")
-                return {"success": True, "bis": data}
             except:
-                log(f"[{tv_nome}] Resposta: {response.text}", "INFO")
-                return {"success": True, "bis": response.text}
+                data = response.text
+            
+            self._atualizar_cache_bis(tv_number, data)
+            log(f"[{tv_nome}] BIs obtidos ({len(response.content)} bytes)", "SUCCESS")
+            return {"success": True, "bis": data}
                 
         except Exception as e:
             log(f"[{tv_nome}] Erro ao listar BIs: {e}", "ERROR")
             return {"success": False, "error": str(e)}
     
+    def listar_bis_todas(self, tv_nomes: list) -> dict:
+        """
+        Lista os BIs de várias TVs em uma única chamada
+        Usa o cache e consulta em paralelo apenas as TVs com cache vencido
+        """
+        resultados = {}
+        vencidas = []
+        
+        for tv_nome in tv_nomes:
+            tv_number = TV_WEBHOOK_MAP.get(tv_nome)
+            if not tv_number:
+                continue
+            bis = self._bis_em_cache(tv_number)
+            if bis is not None:
+                resultados[tv_nome] = {"success": True, "bis": bis}
+            else:
+                vencidas.append(tv_nome)
+        
+        if vencidas:
+            log(f"[BIs] Atualizando {len(vencidas)} listas de BIs vencidas em paralelo...", "INFO")
+            with ThreadPoolExecutor(max_workers=config.BI_CACHE_WORKERS) as executor:
+                for tv_nome, resultado in zip(vencidas, executor.map(self.listar_bis, vencidas)):
+                    resultados[tv_nome] = resultado
+        
+        return resultados
+    
     def editar_bis(self, tv_nome: str, urls: list) -> bool:
         """
         Edita os BIs (URLs) de uma TV
@@ -185,8 +546,8 @@ class WebhookService:
             log(f"[{tv_nome}] Payload: TV={tv_number}, currentcontent={urls_json}", "INFO")
             
             # Usa files para enviar como multipart/form-data (igual ao curl --form)
-            response = requests.post(
-                config.BI_WEBHOOK_URL,
+            response = cliente_http.post(
+                "webhook", "editar_bis", config.BI_WEBHOOK_URL,
                 headers=headers,
                 files={
                     "TV": (None, tv_number),
@@ -201,6 +562,8 @@ class WebhookService:
                 log(f"[{tv_nome}] Erro ao editar BIs: {response.status_code} - {response.text}", "ERROR")
                 return False
             
+            # Write-through: o cache passa a refletir as URLs recém gravadas
+            self._atualizar_cache_bis(tv_number, {"currentcontent": urls})
             log(f"[{tv_nome}] BIs editados com sucesso: {response.status_code}", "SUCCESS")
             return True
                 
@@ -225,7 +588,8 @@ class WebhookService:
             webhook_data = [{"output": inner_json}]
             
             log(f"[{tv_nome}] Enviando webhook para abrir BI (Turn on)...", "INFO")
-            response = requests.post(self.webhook_url, json=webhook_data, timeout=5)
+            response = cliente_http.post("webhook", "abrir_bi", self.webhook_url, json=webhook_data, timeout=5)
+            self.invalidar_cache_bis(tv_nome)
             
             if response.status_code >= 400:
                 log(f"[{tv_nome}] Erro ao abrir BI: {response.status_code}", "ERROR")
@@ -255,7 +619,8 @@ class WebhookService:
             webhook_data = [{"output": inner_json}]
             
             log(f"[{tv_nome}] Enviando webhook para fechar BI (Turn off)...", "INFO")
-            response = requests.post(self.webhook_url, json=webhook_data, timeout=5)
+            response = cliente_http.post("webhook", "fechar_bi", self.webhook_url, json=webhook_data, timeout=5)
+            self.invalidar_cache_bis(tv_nome)
             
             if response.status_code >= 400:
                 log(f"[{tv_nome}] Erro ao fechar BI: {response.status_code}", "ERROR")
@@ -274,19 +639,14 @@ class WebhookService:
     
     def enviar_webhook(self, tvs: Optional[list] = None) -> bool:
         """
-        Envia webhook para ligar máquinas virtuais de múltiplas TVs
+        Envia webhook para ligar máquinas virtuais de múltiplas TVs (uma única requisição)
         Args:
             tvs: Lista de nomes de TVs para ligar. Se None, liga todas as TVs mapeadas
         Returns:
-            True se pelo menos um webhook foi enviado com sucesso
+            True se o webhook em lote foi enviado com sucesso
         """
         if tvs is None:
             # Se não especificado, usa todas as TVs do mapeamento
-            tvs = list(set(TV_WEBHOOK_MAP.keys()))
-        
-        sucesso = False
-        for tv_nome in tvs:
-            if self.enviar_comando_ligar(tv_nome):
-                sucesso = True
+            tvs = list(TV_WEBHOOK_MAP.keys())
         
-        return sucesso
+        return self.enviar_comando_ligar_lote(tvs)
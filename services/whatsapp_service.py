@@ -3,9 +3,8 @@ Serviço de WhatsApp
 Responsável pela integração com Evolution API
 """
 
-import requests
 from typing import Optional
-from utils import log
+from utils import log, cliente_http
 import config
 
 
@@ -44,7 +43,7 @@ class WhatsAppService:
                 "text": texto
             }
             
-            response = requests.post(url, json=payload, headers=self._get_headers(), timeout=10)
+            response = cliente_http.post("evolution", "enviar_mensagem", url, json=payload, headers=self._get_headers(), timeout=10)
             
             if response.status_code == 201 or response.status_code == 200:
                 log(f"[WhatsApp] Mensagem enviada para {numero}", "SUCCESS")
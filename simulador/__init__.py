@@ -0,0 +1 @@
+"""Simuladores locais das APIs externas (testes e medições sem as TVs reais)"""
@@ -0,0 +1,251 @@
+"""
+Simulador de menus das TVs Samsung
+Máquina de estados (tela, foco, app/entrada em primeiro plano) guiada pelas mesmas teclas do controle
+que as sequências enviam. Com o relógio virtual, cada sequência roda em milissegundos e termina
+verificando se a TV chegou ao app/entrada esperado (layouts em simulador/telas_tv.py):
+
+    python -m simulador.menu_tv                      # Todas as TVs com layout
+    python -m simulador.menu_tv --tv TV-ATLAS -v     # Mostra cada tecla, a tela e o item em foco
+
+Teclas enviadas enquanto a TV liga ou uma tela carrega são perdidas (como na TV real) e aparecem no relatório.
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+# Permite rodar como script (python simulador/menu_tv.py) e importar os serviços
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.logger import logs_silenciados
+from utils.relogio import relogio_simulado
+from simulador.telas_tv import LAYOUTS, TEMPO_LIGAR
+
+DIRECOES = {"UP": (-1, 0), "DOWN": (1, 0), "LEFT": (0, -1), "RIGHT": (0, 1)}
+
+
+class RelogioVirtual:
+    """Tempo simulado: dormir() apenas avança o relógio"""
+    
+    def __init__(self):
+        self.agora = 0.0
+    
+    def dormir(self, segundos):
+        self.agora += segundos
+
+
+class MenuTV:
+    """Estado dos menus de uma TV: pilha de telas, foco, app/entrada em primeiro plano e teclas perdidas"""
+    
+    def __init__(self, nome: str, layout: Dict, agora: Callable[[], float]):
+        self.nome = nome
+        self.layout = layout
+        self.telas = layout["telas"]
+        self._agora = agora
+        self.ligada = False
+        self.pilha: List[str] = []
+        self.foco = (0, 0)
+        self.app = ""
+        self.entrada = "dtv"
+        self.ocupada_ate = 0.0
+        self.historico: List[Dict] = []
+        self.perdidas: List[Dict] = []
+        self.erros: List[str] = []
+    
+    @property
+    def tela(self) -> Optional[str]:
+        return self.pilha[-1] if self.pilha else None
+    
+    def item_em_foco(self) -> Optional[str]:
+        """Item da grade da tela atual sob o foco"""
+        if not self.tela:
+            return None
+        linha, coluna = self.foco
+        return self.telas[self.tela]["grade"][linha][coluna]
+    
+    def _entrar(self, nome: str, empilhar: bool = True):
+        """Abre uma tela (empilhando ou substituindo a atual) e aplica app/entrada/carregamento"""
+        if nome not in self.telas:
+            # As sequências engolem exceções; o erro de layout fica registrado para o relatório
+            self.erros.append(f"Tela '{nome}' não existe no layout")
+            return
+        tela = self.telas[nome]
+        if empilhar:
+            self.pilha.append(nome)
+        else:
+            self.pilha[-1] = nome
+        self.foco = tuple(tela.get("foco", (0, 0)))
+        if "app" in tela:
+            self.app = tela["app"]
+        if "entrada" in tela:
+            self.entrada = tela["entrada"]
+            self.app = ""
+        if tela.get("carregar"):
+            self.ocupada_ate = max(self.ocupada_ate, self._agora() + tela["carregar"])
+    
+    def ligar(self):
+        if self.ligada:
+            return
+        self.ligada = True
+        self.pilha = []
+        self.ocupada_ate = self._agora() + TEMPO_LIGAR
+        self._entrar(self.layout["ao_ligar"])
+    
+    def desligar(self):
+        self.ligada = False
+        self.pilha = []
+        self.app = ""
+    
+    def _mover(self, tecla: str) -> bool:
+        """Move o foco na grade; retorna False se já estava na borda"""
+        grade = self.telas[self.tela]["grade"]
+        linha, coluna = self.foco
+        dl, dc = DIRECOES[tecla]
+        nova_linha = min(max(linha + dl, 0), len(grade) - 1)
+        nova_coluna = min(max(coluna + dc, 0), len(grade[nova_linha]) - 1)
+        if (nova_linha, nova_coluna) == (linha, coluna):
+            return False
+        self.foco = (nova_linha, nova_coluna)
+        return True
+    
+    def pressionar(self, tecla: str):
+        """Aplica uma tecla do controle (perdida se a TV estiver desligada, ligando ou carregando)"""
+        instante = self._agora()
+        if not self.ligada or instante < self.ocupada_ate:
+            self.perdidas.append({"t": instante, "tecla": tecla, "tela": self.tela,
+                                  "motivo": "desligada" if not self.ligada else "carregando"})
+            self._registrar(instante, tecla, "perdida")
+            return
+        if self.tela is None:
+            self._registrar(instante, tecla, "sem efeito")
+            return
+        
+        tela = self.telas[self.tela]
+        efeito = "sem efeito"
+        if tecla == "HOME" and "Home" in self.telas:
+            self.pilha = []
+            self._entrar("Home")
+            efeito = "home"
+        elif tecla == "BACK" and len(self.pilha) > 1:
+            self.pilha.pop()
+            self.foco = tuple(self.telas[self.tela].get("foco", (0, 0)))
+            efeito = "voltar"
+        elif tecla == "OK" and self.item_em_foco() in tela.get("abre", {}):
+            self._entrar(tela["abre"][self.item_em_foco()])
+            efeito = "abrir"
+        elif tecla == "RIGHT" and tela.get("direita_abre") and self.item_em_foco() in tela.get("abre", {}):
+            self._entrar(tela["abre"][self.item_em_foco()])
+            efeito = "abrir"
+        elif tecla in DIRECOES:
+            if self._mover(tecla):
+                efeito = "mover"
+            elif tecla in tela.get("bordas", {}):
+                self._entrar(tela["bordas"][tecla], empilhar=False)
+                efeito = "borda"
+        self._registrar(instante, tecla, efeito)
+    
+    def _registrar(self, instante: float, tecla: str, efeito: str):
+        self.historico.append({"t": instante, "tecla": tecla, "efeito": efeito,
+                               "tela": self.tela, "foco": self.item_em_foco()})
+    
+    def estado(self) -> Dict:
+        return {"ligada": self.ligada, "tela": self.tela, "foco": self.item_em_foco(),
+                "app": self.app, "entrada": self.entrada}
+
+
+class ClienteMenu:
+    """Cliente falso no lugar do SmartThingsAPI: repassa liga/desliga e teclas ao MenuTV"""
+    
+    def __init__(self, menu: MenuTV):
+        self.menu = menu
+    
+    def obter_status(self, device_id):
+        return None
+    
+    def _executar_comando_com_retry(self, device_id, capability, command, arguments=None, max_tentativas=5, delay_retry=2):
+        if capability == "switch":
+            self.menu.ligar() if command == "on" else self.menu.desligar()
+        elif capability == "samsungvd.remoteControl" and command == "send" and arguments:
+            self.menu.pressionar(arguments[0])
+        return True
+
+
+def validar_sequencia(tv_nome: str, layout: Optional[Dict] = None) -> Dict:
+    """Roda a sequência da TV contra o layout com relógio virtual e compara com o estado esperado"""
+    from services.sequence_mapper import SequenceMapper
+    
+    layout = layout or LAYOUTS[tv_nome]
+    relogio = RelogioVirtual()
+    menu = MenuTV(tv_nome, layout, lambda: relogio.agora)
+    inicio = time.perf_counter()
+    with relogio_simulado(relogio.dormir), logs_silenciados():
+        SequenceMapper().executar_sequencia(ClienteMenu(menu), "simulacao", tv_nome)
+    erro = "; ".join(menu.erros) or None
+    
+    estado = menu.estado()
+    divergencias = {campo: {"esperado": valor, "obtido": estado.get(campo)}
+                    for campo, valor in layout["esperado"].items() if estado.get(campo) != valor}
+    return {
+        "tv": tv_nome,
+        "ok": erro is None and not divergencias,
+        "erro": erro,
+        "estado": estado,
+        "esperado": layout["esperado"],
+        "divergencias": divergencias,
+        "teclas": len(menu.historico),
+        "perdidas": menu.perdidas,
+        "tempo_simulado_s": round(relogio.agora, 1),
+        "duracao_ms": round((time.perf_counter() - inicio) * 1000, 2),
+        "historico": menu.historico
+    }
+
+
+def validar_todas(nomes: Optional[List[str]] = None) -> List[Dict]:
+    """Valida as sequências de todas as TVs com layout (ou só as indicadas)"""
+    return [validar_sequencia(nome) for nome in (nomes or LAYOUTS)]
+
+
+def _imprimir(resultado: Dict, verbose: bool):
+    estado = resultado["estado"]
+    destino = estado["app"] or estado["entrada"]
+    marca = "✅" if resultado["ok"] else "❌"
+    print(f"{marca} {resultado['tv']:<20} {resultado['teclas']:>3} teclas  {resultado['tempo_simulado_s']:>6.0f}s simulados "
+          f"em {resultado['duracao_ms']:>6.2f}ms  → {destino} / {estado['tela']}")
+    if resultado["erro"]:
+        print(f"      erro: {resultado['erro']}")
+    for campo, valores in resultado["divergencias"].items():
+        print(f"      {campo}: esperado '{valores['esperado']}', obtido '{valores['obtido']}'")
+    for perdida in resultado["perdidas"]:
+        print(f"      ⚠️  {perdida['tecla']} perdida em t={perdida['t']:.0f}s ({perdida['motivo']}: {perdida['tela']})")
+    if verbose:
+        for passo in resultado["historico"]:
+            print(f"      t={passo['t']:>5.0f}s {passo['tecla']:<6} {passo['efeito']:<10} {passo['tela']} [{passo['foco']}]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida as sequências das TVs contra o simulador de menus")
+    parser.add_argument("--tv", action="append", help="Valida só esta TV (pode repetir)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Mostra cada tecla, o efeito e a tela")
+    args = parser.parse_args()
+    
+    desconhecidas = [nome for nome in (args.tv or []) if nome not in LAYOUTS]
+    if desconhecidas:
+        parser.error(f"TVs sem layout em simulador/telas_tv.py: {', '.join(desconhecidas)}")
+    
+    inicio = time.perf_counter()
+    resultados = validar_todas(args.tv)
+    for resultado in resultados:
+        _imprimir(resultado, args.verbose)
+    
+    falhas = [r["tv"] for r in resultados if not r["ok"]]
+    simulado = sum(r["tempo_simulado_s"] for r in resultados)
+    print(f"\n{len(resultados) - len(falhas)}/{len(resultados)} sequências no destino esperado "
+          f"({simulado / 60:.0f} min simulados em {(time.perf_counter() - inicio) * 1000:.0f}ms)")
+    if falhas:
+        print(f"Falharam: {', '.join(falhas)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
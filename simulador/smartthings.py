@@ -0,0 +1,401 @@
+"""
+Simulador local da API SmartThings
+Serve /v1/devices, /v1/devices/<id>/status e /v1/devices/<id>/commands com TVs que guardam
+estado (energia, entrada, app, volume, teclas recebidas), latência configurável e injeção
+de respostas 409/429/401. A aplicação inteira roda contra ele:
+
+    python -m simulador.smartthings --porta 8088 --latencia 80 --taxa-409 0.05
+    SMARTTHINGS_API_URL=http://127.0.0.1:8088/v1 python app.py
+
+Controle em tempo de execução: GET /simulador/estado, GET /simulador/requisicoes, PATCH /simulador/config,
+POST /simulador/reset
+POST /webhook responde 200 a qualquer payload (substitui o n8n: WEBHOOK_URL=http://127.0.0.1:8088/webhook)
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from flask import Flask, jsonify, request
+
+# Permite rodar como script (python simulador/smartthings.py) e importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.limitador import LimitadorTaxa
+import config
+
+
+# Nome (label) de cada TV de config.TV_CONFIG, como a ordem da frota e as sequências esperam
+ROTULOS = {
+    "a856316a-8b57-f399-e72b-fd595c67edd3": "Operação 2 - TV2",
+    "eb80c602-ae51-a7b6-eaa2-d305b45dd23c": "TV-REUNIÃO-01",
+    "65a53ea8-334d-1510-94c0-915fbbd2ceb1": "TV-ATLAS",
+    "541381f7-f709-60f1-312e-4157dd324528": "TV 1 Painel - TV3",
+    "a72afd67-bc90-db11-e16b-55ad1adf253f": "TV 4 Painel - TV6",
+    "66d85860-b9b3-0b1d-0ad4-6577159d60c6": "Controladoria",
+    "a94e2b55-c2db-2945-9407-7b4514d829c1": "TV 3 Painel - TV5",
+    "d339553c-5dc4-e28d-e0f2-e188e81b0fca": "TV-JURIDICO",
+    "6282866e-47cb-2dde-cbc4-15c381ff6540": "TV-REUNIÃO-02",
+    "741ef7e0-f033-809b-1e09-7313e1e37ef0": "TvCadastro",
+    "abb860b1-4190-c03a-4ac7-19459adc6bcc": "TV-MOSSAD",
+    "4321bd17-6f06-cdfc-08ac-8edef0b768ae": "Operação 1 - TV1",
+    "b836e65f-4c6f-0019-ae1b-26dc4f08f634": "TI02",
+    "9aec8b23-27bd-cbf5-ed28-36ae181bf20d": "TI03",
+    "391051ba-fa19-0afc-81cb-9a8114ff6726": "Antifraude",
+    "4a26a59f-1f9e-858f-bf7f-f448389b7c22": "TV-DIA D",
+    "98c6e6f8-95b4-cebd-58c3-89b0c8914c98": "TI01",
+    "04523f83-6676-e648-87e4-c72543aaee45": "Gestão Industria",
+    "033209fe-3ae3-2d71-be86-75b2f1d4268b": "TV-GEO-FOREST",
+    "cd98ec70-e345-2960-c042-ec2bcd783f24": "TV 2 Painel - TV4",
+    "22b8779b-16f5-9c79-687b-70c275d6e550": "Cobrança",
+    "50f875f3-b76b-b808-396e-b343a899a517": "Financeiro",
+    "e83bb859-9240-2b35-c6e1-b4b217b6821b": "Cozinha Entrada",
+    "61fcb532-3d44-f253-c838-16e031135519": "Recepção"
+}
+
+ENTRADAS = ["dtv", "HDMI1", "HDMI2", "HDMI3"]
+TECLAS = {"UP", "DOWN", "LEFT", "RIGHT", "OK", "HOME", "BACK", "MENU"}
+PORTA_PADRAO = 8088
+
+
+def _agora_iso() -> str:
+    """Timestamp no formato da API ("2025-01-10T12:00:00.000Z")"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def frota_padrao(extras: int = 0) -> List[Tuple[str, str]]:
+    """(id, nome) das TVs de config.TV_CONFIG mais `extras` TVs sintéticas (ids fixos entre execuções)"""
+    frota = [(tv["id"], ROTULOS.get(tv["id"], tv["id"][:8])) for tv in config.TV_CONFIG]
+    for i in range(1, extras + 1):
+        frota.append((str(uuid.uuid5(uuid.NAMESPACE_URL, f"apptvs-simulador-{i}")), f"TV-SIM-{i:04d}"))
+    return frota
+
+
+class ErroSimulado(Exception):
+    """Resposta de erro no formato da API (status HTTP, código e mensagem)"""
+    
+    def __init__(self, status: int, codigo: str, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+        self.codigo = codigo
+        self.mensagem = mensagem
+
+
+class TVSimulada:
+    """Modelo de uma TV: energia, entrada, app em primeiro plano, volume e teclas recebidas"""
+    
+    def __init__(self, device_id: str, nome: str):
+        self.device_id = device_id
+        self.nome = nome
+        self.reiniciar()
+    
+    def reiniciar(self, ligada: bool = False):
+        """Volta ao estado inicial (desligada ou já ligada, na entrada padrão)"""
+        agora = _agora_iso()
+        self.ligada = ligada
+        self.entrada = "dtv"
+        self.app = ""
+        self.volume = 10
+        self.pronta_em = 0.0  # Instante (monotonic) em que a TV termina de ligar
+        self.teclas = deque(maxlen=50)
+        self.total_comandos = 0
+        self.timestamps = {"switch": agora, "inputSource": agora, "tvChannelName": agora, "volume": agora}
+    
+    def _alterar(self, atributo: str, **valores):
+        for nome, valor in valores.items():
+            setattr(self, nome, valor)
+        self.timestamps[atributo] = _agora_iso()
+    
+    def executar(self, capability: str, comando: str, argumentos: list, tempo_ligar: float):
+        """Aplica um comando; lança ErroSimulado se a TV não puder recebê-lo agora"""
+        if capability == "switch":
+            if comando == "on" and not self.ligada:
+                self._alterar("switch", ligada=True, pronta_em=time.monotonic() + tempo_ligar)
+            elif comando == "off" and self.ligada:
+                self._alterar("switch", ligada=False)
+                self._alterar("tvChannelName", app="")
+            elif comando not in ("on", "off"):
+                raise ErroSimulado(422, "UnprocessableEntityError", f"Comando desconhecido: switch.{comando}")
+            self.total_comandos += 1
+            return
+        
+        # Desligada ou ainda ligando: o dispositivo não responde (a API devolve 409)
+        if not self.ligada or time.monotonic() < self.pronta_em:
+            raise ErroSimulado(409, "ConflictError", "Device is offline or busy")
+        
+        if capability == "samsungvd.remoteControl" and comando == "send":
+            tecla = argumentos[0] if argumentos else None
+            if tecla not in TECLAS:
+                raise ErroSimulado(422, "UnprocessableEntityError", f"Tecla inválida: {tecla}")
+            self.teclas.append(tecla)
+        elif capability == "samsungvd.mediaInputSource" and comando == "setInputSource":
+            if not argumentos or argumentos[0] not in ENTRADAS:
+                raise ErroSimulado(422, "UnprocessableEntityError", f"Entrada inválida: {argumentos}")
+            self._alterar("inputSource", entrada=argumentos[0])
+        elif capability == "audioVolume" and comando in ("setVolume", "volumeUp", "volumeDown"):
+            volume = {"setVolume": int(argumentos[0]) if argumentos else self.volume,
+                      "volumeUp": self.volume + 1, "volumeDown": self.volume - 1}[comando]
+            self._alterar("volume", volume=max(0, min(100, volume)))
+        elif capability == "tvChannel" and comando == "setTvChannelName":
+            self._alterar("tvChannelName", app=argumentos[0] if argumentos else "")
+        else:
+            raise ErroSimulado(422, "UnprocessableEntityError", f"Comando não suportado: {capability}.{comando}")
+        self.total_comandos += 1
+    
+    def dispositivo(self) -> Dict:
+        """Item de GET /devices"""
+        return {
+            "deviceId": self.device_id,
+            "name": "[TV] Samsung Q60 Series",
+            "label": self.nome,
+            "manufacturerName": "Samsung Electronics",
+            "deviceTypeName": "Samsung OCF TV",
+            "type": "OCF",
+            "components": [{"id": "main", "capabilities": [
+                {"id": "switch"}, {"id": "audioVolume"}, {"id": "tvChannel"},
+                {"id": "samsungvd.mediaInputSource"}, {"id": "samsungvd.remoteControl"}
+            ]}]
+        }
+    
+    def status(self) -> Dict:
+        """Corpo de GET /devices/<id>/status (apenas o componente main, com os atributos lidos pela app)"""
+        t = self.timestamps
+        return {"components": {"main": {
+            "switch": {"switch": {"value": "on" if self.ligada else "off", "timestamp": t["switch"]}},
+            "samsungvd.mediaInputSource": {
+                "inputSource": {"value": self.entrada, "timestamp": t["inputSource"]},
+                "supportedInputSourcesMap": {"value": [{"id": e, "name": e} for e in ENTRADAS], "timestamp": t["inputSource"]}
+            },
+            "tvChannel": {
+                "tvChannelName": {"value": self.app, "timestamp": t["tvChannelName"]},
+                "tvChannel": {"value": "", "timestamp": t["tvChannelName"]}
+            },
+            "audioVolume": {"volume": {"value": self.volume, "unit": "%", "timestamp": t["volume"]}}
+        }}}
+    
+    def resumo(self) -> Dict:
+        """Estado interno (GET /simulador/estado)"""
+        return {
+            "id": self.device_id,
+            "nome": self.nome,
+            "ligada": self.ligada,
+            "entrada": self.entrada,
+            "app": self.app,
+            "volume": self.volume,
+            "comandos": self.total_comandos,
+            "ultimas_teclas": list(self.teclas)[-10:]
+        }
+
+
+class Simulador:
+    """Frota simulada, parâmetros de latência/falhas e contadores de requisições"""
+    
+    # Parâmetros alteráveis por PATCH /simulador/config
+    PARAMETROS = ("latencia", "jitter", "taxa_409", "taxa_429", "taxa_401", "token", "limite_rps", "rajada", "tempo_ligar")
+    
+    def __init__(self, frota: Optional[List[Tuple[str, str]]] = None, latencia: float = 0.0, jitter: float = 0.0,
+                 taxa_409: float = 0.0, taxa_429: float = 0.0, taxa_401: float = 0.0, token: Optional[str] = None,
+                 limite_rps: float = 0.0, rajada: int = 10, tempo_ligar: float = 0.0, semente: Optional[int] = None):
+        """
+        Args:
+            latencia/jitter: Segundos somados a cada resposta (jitter uniforme em ±jitter)
+            taxa_409/429/401: Probabilidade de cada erro injetado (409 apenas em comandos)
+            token: Se informado, outros tokens recebem 401 (None aceita qualquer Bearer)
+            limite_rps/rajada: Cota por token bucket (acima dela → 429, como a API real); 0 desativa
+            tempo_ligar: Segundos após "switch on" em que a TV ainda não aceita outros comandos (409)
+        """
+        self.tvs: Dict[str, TVSimulada] = {d: TVSimulada(d, n) for d, n in (frota or frota_padrao())}
+        self.latencia = latencia
+        self.jitter = jitter
+        self.taxa_409 = taxa_409
+        self.taxa_429 = taxa_429
+        self.taxa_401 = taxa_401
+        self.token = token
+        self.limite_rps = limite_rps
+        self.rajada = rajada
+        self.tempo_ligar = tempo_ligar
+        self._aleatorio = random.Random(semente)
+        self._limitador = LimitadorTaxa(limite_rps, rajada) if limite_rps else None
+        self._lock = threading.Lock()
+        # (rota, status) → total
+        self.requisicoes: Dict[Tuple[str, int], int] = {}
+    
+    def configurar(self, **parametros):
+        """Altera parâmetros em tempo de execução (ignora nomes desconhecidos)"""
+        with self._lock:
+            for nome, valor in parametros.items():
+                if nome in self.PARAMETROS:
+                    setattr(self, nome, valor)
+            self._limitador = LimitadorTaxa(self.limite_rps, self.rajada) if self.limite_rps else None
+    
+    def reiniciar(self, ligadas: bool = False):
+        """Volta todas as TVs ao estado inicial (desligadas, ou ligadas) e zera os contadores"""
+        with self._lock:
+            for tv in self.tvs.values():
+                tv.reiniciar(ligadas)
+            self.requisicoes.clear()
+    
+    def esperar_latencia(self):
+        atraso = self.latencia + (self._aleatorio.uniform(-self.jitter, self.jitter) if self.jitter else 0)
+        if atraso > 0:
+            time.sleep(atraso)
+    
+    def verificar(self, autorizacao: Optional[str], comando: bool):
+        """Autenticação, cota e falhas injetadas (lança ErroSimulado)"""
+        token = (autorizacao or "").removeprefix("Bearer ").strip()
+        with self._lock:
+            sorteio = self._aleatorio.random
+            if not token or (self.token and token != self.token) or sorteio() < self.taxa_401:
+                raise ErroSimulado(401, "UnauthorizedError", "Invalid or expired token")
+            if (self._limitador and not self._limitador.tentar()) or sorteio() < self.taxa_429:
+                raise ErroSimulado(429, "TooManyRequestError", "Rate limit exceeded")
+            if comando and sorteio() < self.taxa_409:
+                raise ErroSimulado(409, "ConflictError", "Device is busy")
+    
+    def obter_tv(self, device_id: str) -> TVSimulada:
+        tv = self.tvs.get(device_id)
+        if tv is None:
+            raise ErroSimulado(404, "NotFoundError", f"Device {device_id} not found")
+        return tv
+    
+    def executar_comandos(self, device_id: str, comandos: List[Dict]) -> List[Dict]:
+        """Aplica os comandos do POST (todos no mesmo lock: a TV processa um pedido por vez)"""
+        tv = self.obter_tv(device_id)
+        with self._lock:
+            for item in comandos:
+                tv.executar(item.get("capability", ""), item.get("command", ""), item.get("arguments") or [], self.tempo_ligar)
+        return [{"id": str(uuid.uuid4()), "status": "ACCEPTED"} for _ in comandos]
+    
+    def contar(self, rota: str, status: int):
+        with self._lock:
+            self.requisicoes[(rota, status)] = self.requisicoes.get((rota, status), 0) + 1
+    
+    def total_requisicoes(self, rota: Optional[str] = None) -> int:
+        """Requisições recebidas (todas ou de uma rota), com qualquer status"""
+        with self._lock:
+            return sum(t for (r, _), t in self.requisicoes.items() if rota is None or r == rota)
+    
+    def contadores(self) -> List[Dict]:
+        """Requisições por rota e status"""
+        with self._lock:
+            return [{"rota": r, "status": s, "total": t} for (r, s), t in sorted(self.requisicoes.items())]
+    
+    def estado(self) -> Dict:
+        requisicoes = self.contadores()
+        with self._lock:
+            return {
+                "config": {nome: getattr(self, nome) for nome in self.PARAMETROS},
+                "requisicoes": requisicoes,
+                "tvs": [tv.resumo() for tv in self.tvs.values()]
+            }
+
+
+def criar_app(simulador: Simulador) -> Flask:
+    """Aplicação Flask com as rotas da API e as de controle do simulador"""
+    app = Flask(__name__)
+    
+    def responder(rota: str, funcao, comando: bool = False):
+        simulador.esperar_latencia()
+        try:
+            simulador.verificar(request.headers.get("Authorization"), comando)
+            corpo, status = funcao(), 200
+        except ErroSimulado as e:
+            corpo = {"requestId": str(uuid.uuid4()), "error": {"code": e.codigo, "message": e.mensagem, "details": []}}
+            status = e.status
+        simulador.contar(rota, status)
+        resposta = jsonify(corpo)
+        resposta.status_code = status
+        if status == 429:
+            resposta.headers["Retry-After"] = "1"
+        return resposta
+    
+    @app.route('/v1/devices', methods=['GET'])
+    def listar_dispositivos():
+        return responder("devices", lambda: {"items": [tv.dispositivo() for tv in simulador.tvs.values()], "_links": {}})
+    
+    @app.route('/v1/devices/<device_id>/status', methods=['GET'])
+    def status_dispositivo(device_id):
+        return responder("status", lambda: simulador.obter_tv(device_id).status())
+    
+    @app.route('/v1/devices/<device_id>/commands', methods=['POST'])
+    def comandos_dispositivo(device_id):
+        comandos = (request.get_json(silent=True) or {}).get("commands", [])
+        return responder("commands", lambda: {"results": simulador.executar_comandos(device_id, comandos)}, comando=True)
+    
+    @app.route('/webhook', methods=['POST'])
+    def webhook():
+        simulador.contar("webhook", 200)
+        return jsonify({"success": True})
+    
+    @app.route('/simulador/estado', methods=['GET'])
+    def estado():
+        return jsonify(simulador.estado())
+    
+    @app.route('/simulador/requisicoes', methods=['GET'])
+    def requisicoes():
+        """Só os contadores (o estado completo de uma frota grande é pesado)"""
+        return jsonify({"total": simulador.total_requisicoes(), "requisicoes": simulador.contadores()})
+    
+    @app.route('/simulador/config', methods=['PATCH'])
+    def configurar():
+        simulador.configurar(**(request.get_json(silent=True) or {}))
+        return jsonify(simulador.estado()["config"])
+    
+    @app.route('/simulador/reset', methods=['POST'])
+    def reiniciar():
+        simulador.reiniciar(bool((request.get_json(silent=True) or {}).get("ligadas")))
+        return jsonify({"success": True})
+    
+    return app
+
+
+def iniciar_em_thread(simulador: Simulador, host: str = "127.0.0.1", porta: int = 0):
+    """
+    Sobe o simulador em uma thread (porta 0 = livre) para benchmarks e scripts
+    Retorna (servidor, url base para SMARTTHINGS_API_URL); encerrar com servidor.shutdown()
+    """
+    from werkzeug.serving import make_server
+    servidor = make_server(host, porta, criar_app(simulador), threaded=True)
+    threading.Thread(target=servidor.serve_forever, name="simulador-smartthings", daemon=True).start()
+    return servidor, f"http://{host}:{servidor.server_port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador local da API SmartThings")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    parser.add_argument("--latencia", type=float, default=0, help="Latência por requisição (ms)")
+    parser.add_argument("--jitter", type=float, default=0, help="Variação da latência, ± (ms)")
+    parser.add_argument("--taxa-409", type=float, default=0, help="Probabilidade de 409 em comandos (0-1)")
+    parser.add_argument("--taxa-429", type=float, default=0, help="Probabilidade de 429 (0-1)")
+    parser.add_argument("--taxa-401", type=float, default=0, help="Probabilidade de 401 (0-1)")
+    parser.add_argument("--token", default=None, help="Único token aceito (padrão: qualquer um)")
+    parser.add_argument("--limite-rps", type=float, default=0, help="Cota de requisições por segundo (0 = sem cota)")
+    parser.add_argument("--rajada", type=int, default=10)
+    parser.add_argument("--tempo-ligar", type=float, default=0, help="Segundos até a TV aceitar comandos após ligar")
+    parser.add_argument("--extras", type=int, default=0, help="TVs sintéticas além das de config.TV_CONFIG")
+    parser.add_argument("--semente", type=int, default=None, help="Semente das falhas injetadas (reprodutível)")
+    parser.add_argument("--verbose", action="store_true", help="Mostra cada requisição")
+    args = parser.parse_args()
+    
+    simulador = Simulador(
+        frota_padrao(args.extras), latencia=args.latencia / 1000, jitter=args.jitter / 1000,
+        taxa_409=args.taxa_409, taxa_429=args.taxa_429, taxa_401=args.taxa_401, token=args.token,
+        limite_rps=args.limite_rps, rajada=args.rajada, tempo_ligar=args.tempo_ligar, semente=args.semente
+    )
+    if not args.verbose:
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    
+    print(f"📺 Simulador SmartThings com {len(simulador.tvs)} TVs")
+    print(f"   SMARTTHINGS_API_URL=http://{args.host}:{args.porta}/v1")
+    criar_app(simulador).run(host=args.host, port=args.porta, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
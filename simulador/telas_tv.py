@@ -0,0 +1,256 @@
+"""
+Telas das TVs para o simulador de menus (simulador/menu_tv.py)
+Modelo da home, das fontes e dos apps de cada TV como as sequências validadas hoje os percorrem.
+Ao mudar algo na TV (ordem dos apps na barra, fontes, conexões, relatórios), atualize o layout aqui
+e rode `python -m simulador.menu_tv` para ver quais sequências deixam de chegar ao destino.
+
+Cada tela:
+    grade        linhas de itens (o foco anda pelas setas e para nas bordas)
+    foco         (linha, coluna) ao entrar na tela
+    abre         item -> tela aberta pelo OK
+    direita_abre RIGHT também abre o item em foco (menus que expandem para a direita)
+    bordas       tecla -> tela aberta ao tentar passar da borda (ex: LEFT na barra abre o menu lateral)
+    app/entrada  o que fica em primeiro plano ao entrar na tela
+    carregar     segundos em que a tela ainda não responde (teclas nesse intervalo se perdem)
+"""
+
+from typing import Dict, List, Optional
+
+TEMPO_LIGAR = 5  # Segundos até a TV responder ao controle depois de ligar
+TEMPO_APP = 5  # Abrir um app
+TEMPO_POWER_BI = 3  # Trocar de tela dentro do Power BI
+TEMPO_CONEXAO = 8  # Conectar a um PC/VM pelo Acesso remoto
+TEMPO_PAGINA = 8  # Carregar um relatório ou página
+
+MENU_LATERAL = ["Busca", "Fontes", "Ambient", "Configurações"]
+
+
+def _home(barra: List[str], foco: int = 0, acima: Optional[List[List[str]]] = None,
+          abaixo: Optional[List[List[str]]] = None, abre: Optional[Dict[str, str]] = None,
+          fontes: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """Home (barra de apps, com linhas acima/abaixo), o menu lateral à esquerda e a lista de fontes"""
+    acima = acima or []
+    fontes = fontes or ["TV", "HDMI1", "HDMI2"]
+    telas = {
+        "Home": {
+            "grade": acima + [barra] + (abaixo or []),
+            "foco": (len(acima), foco),
+            "abre": abre or {},
+            "bordas": {"LEFT": "Menu"}
+        },
+        "Menu": {
+            "grade": [[item] for item in MENU_LATERAL],
+            "abre": {"Fontes": "Fontes"},
+            "direita_abre": True,
+            "bordas": {"RIGHT": "Home"}
+        },
+        "Fontes": {
+            "grade": [fontes],
+            "abre": {fonte: fonte for fonte in fontes}
+        }
+    }
+    for fonte in fontes:
+        if fonte != "Acesso remoto":
+            telas[fonte] = {"grade": [[fonte]], "entrada": "dtv" if fonte == "TV" else fonte}
+    return telas
+
+
+def _acesso_remoto(pcs: List[str], confirmacoes: int = 1, horizontal: bool = False) -> Dict[str, Dict]:
+    """App Acesso remoto: lista de PCs/VMs, diálogos de confirmação e a sessão aberta"""
+    telas = {
+        "Acesso remoto": {
+            "grade": [pcs] if horizontal else [[pc] for pc in pcs],
+            "abre": {},
+            "app": "Acesso remoto",
+            "carregar": TEMPO_APP
+        }
+    }
+    for pc in pcs:
+        if pc == "Adicionar PC":
+            continue
+        etapas = ["Conectar", "Certificado"][:confirmacoes]
+        telas["Acesso remoto"]["abre"][pc] = f"{etapas[0]}: {pc}" if etapas else f"Sessão: {pc}"
+        for i, etapa in enumerate(etapas):
+            seguinte = f"{etapas[i + 1]}: {pc}" if i + 1 < len(etapas) else f"Sessão: {pc}"
+            telas[f"{etapa}: {pc}"] = {
+                "grade": [["Continuar"]],
+                "abre": {"Continuar": seguinte},
+                "app": "Acesso remoto",
+                "carregar": TEMPO_CONEXAO
+            }
+        telas[f"Sessão: {pc}"] = {"grade": [["Área de trabalho"]], "app": "Acesso remoto",
+                                  "carregar": 0 if etapas else TEMPO_CONEXAO}
+    return telas
+
+
+def _power_bi(workspace: str, relatorios: List[str]) -> Dict[str, Dict]:
+    """App Power BI aberto ao ligar: aviso, abas, workspaces, pastas e relatórios (em tela cheia pelo OK)"""
+    workspaces = ["Meu workspace", "Comercial", "Diretoria", workspace, "RH"]
+    telas = {
+        "Power BI: Aviso": {"grade": [["OK"]], "abre": {"OK": "Power BI: Início"}, "app": "Power BI"},
+        "Power BI: Início": {
+            "grade": [["Início", "Favoritos", "Workspaces", "Apps"]],
+            "abre": {"Workspaces": "Power BI: Workspaces"},
+            "app": "Power BI",
+            "carregar": TEMPO_POWER_BI
+        },
+        "Power BI: Workspaces": {
+            "grade": [[ws] for ws in workspaces],
+            "abre": {workspace: f"Workspace: {workspace}"},
+            "direita_abre": True,
+            "app": "Power BI",
+            "carregar": TEMPO_POWER_BI
+        },
+        f"Workspace: {workspace}": {
+            "grade": [["Painéis", "Painéis arquivados"], ["Conjuntos de dados", "Fluxos de dados"],
+                      ["Relatórios", "Relatórios compartilhados"]],
+            "abre": {"Relatórios": f"Relatórios: {workspace}"},
+            "app": "Power BI",
+            "carregar": TEMPO_POWER_BI
+        },
+        f"Relatórios: {workspace}": {
+            "grade": [["Recentes", "Todos"]],
+            "abre": {"Todos": f"Todos: {workspace}"},
+            "app": "Power BI",
+            "carregar": TEMPO_POWER_BI
+        },
+        f"Todos: {workspace}": {
+            "grade": [[relatorio] for relatorio in relatorios],
+            "abre": {relatorio: relatorio for relatorio in relatorios},
+            "app": "Power BI",
+            "carregar": TEMPO_POWER_BI
+        }
+    }
+    for relatorio in relatorios:
+        telas[relatorio] = {"grade": [["Tela cheia"]], "abre": {"Tela cheia": f"{relatorio} (tela cheia)"},
+                            "app": "Power BI", "carregar": TEMPO_PAGINA}
+        telas[f"{relatorio} (tela cheia)"] = {"grade": [["Relatório"]], "app": "Power BI"}
+    return telas
+
+
+def _navegador(paginas: Dict[str, float]) -> Dict[str, Dict]:
+    """Páginas abertas no Navegador (tempo de carregamento de cada uma) e o modo tela cheia"""
+    telas = {}
+    for pagina, carregar in paginas.items():
+        telas[f"Navegador: {pagina}"] = {"grade": [["Tela cheia"]], "abre": {"Tela cheia": f"{pagina} (tela cheia)"},
+                                         "app": "Navegador", "carregar": carregar}
+        telas[f"{pagina} (tela cheia)"] = {"grade": [["Página"]], "app": "Navegador"}
+    return telas
+
+
+def _layout(ao_ligar: str, esperado: Dict[str, str], *grupos: Dict[str, Dict]) -> Dict:
+    """Junta as telas de uma TV com a tela ao ligar e o estado esperado ao fim da sequência"""
+    telas = {}
+    for grupo in grupos:
+        telas.update(grupo)
+    return {"ao_ligar": ao_ligar, "telas": telas, "esperado": esperado}
+
+
+def _painel_vm(barra: List[str], foco: int, pcs: List[str], pc: str) -> Dict:
+    """TVs que abrem o Acesso remoto pela barra da home e entram na sessão da VM"""
+    return _layout("Home", {"app": "Acesso remoto", "tela": f"Sessão: {pc}"},
+                   _home(barra, foco, abre={"Acesso remoto": "Acesso remoto"}), _acesso_remoto(pcs))
+
+
+def _painel_recentes(vm: str, confirmacoes: int) -> Dict:
+    """TV3/TV6: Acesso remoto fixado na linha acima da barra"""
+    return _layout("Home", {"app": "Acesso remoto", "tela": f"Sessão: {vm}"},
+                   _home(["Netflix", "YouTube", "Navegador", "Galeria", "Prime Video"], foco=4,
+                         acima=[["Galeria", "Navegador", "Acesso remoto"]], abre={"Acesso remoto": "Acesso remoto"}),
+                   _acesso_remoto(["Adicionar PC", vm, "VM Operação"], confirmacoes))
+
+
+def _setor_fontes(fontes: List[str], pcs: List[str], pc: str) -> Dict:
+    """TVs que ligam na home e abrem o Acesso remoto pelas fontes (conexão com certificado)"""
+    return _layout("Home", {"app": "Acesso remoto", "tela": f"Sessão: {pc}"},
+                   _home(["Netflix", "YouTube", "Navegador"], fontes=fontes), _acesso_remoto(pcs, confirmacoes=2))
+
+
+def _setor_power_bi(relatorio: str, outros: List[str], posicao: int, tela_cheia: bool = True) -> Dict:
+    """TVs que ligam no Power BI e abrem um relatório da pasta do setor"""
+    relatorios = outros[:posicao] + [relatorio] + outros[posicao:]
+    return _layout("Power BI: Aviso",
+                   {"app": "Power BI", "tela": f"{relatorio} (tela cheia)" if tela_cheia else relatorio},
+                   _power_bi("Setores", relatorios))
+
+
+_BARRA_OPERACAO = ["Netflix", "YouTube", "Navegador", "Galeria", "Prime Video", "Spotify", "Acesso remoto"]
+_BARRA_PAINEL = ["Netflix", "YouTube", "Navegador", "Galeria", "Prime Video", "Spotify", "Apple TV", "Acesso remoto"]
+_TI = _layout(
+    "Navegador",
+    {"app": "Navegador", "tela": "Zabbix (tela cheia)"},
+    _home(["Netflix", "YouTube", "Navegador"]),
+    {
+        "Navegador": {"grade": [["Favoritos", "Endereço"], ["Abas", "Zoom"], ["Menu", "Página"]], "foco": (2, 1),
+                      "abre": {"Favoritos": "Favoritos"}, "app": "Navegador"},
+        "Favoritos": {"grade": [["Dashboard TI"], ["Zabbix"], ["Grafana"]],
+                      "abre": {"Zabbix": "Navegador: Zabbix"}, "app": "Navegador"}
+    },
+    _navegador({"Zabbix": TEMPO_APP})
+)
+_REUNIAO = _layout("HDMI1", {"entrada": "HDMI1", "tela": "HDMI1"}, _home(["Netflix", "YouTube"]))
+
+
+LAYOUTS: Dict[str, Dict] = {
+    "TI01": _TI,
+    "TI02": _TI,
+    "TI03": _TI,
+    "Operação 1 - TV1": _painel_vm(_BARRA_OPERACAO, 0, ["Adicionar PC", "VM Operação 1", "VM Operação 2"],
+                                   "VM Operação 1"),
+    "Operação 2 - TV2": _painel_vm(_BARRA_PAINEL, 0, ["Adicionar PC", "VM Operação 1", "VM Operação 2", "VM Painel"],
+                                   "VM Operação 2"),
+    "TV 1 Painel - TV3": _painel_recentes("VM Painel TV3", confirmacoes=0),
+    "TV 2 Painel - TV4": _painel_vm(_BARRA_PAINEL, 0, ["Adicionar PC", "VM Painel TV4", "VM Painel TV5"],
+                                    "VM Painel TV4"),
+    "TV 3 Painel - TV5": _layout(
+        "Home",
+        {"app": "Acesso remoto", "tela": "Sessão: VM Painel TV5"},
+        _home(_BARRA_PAINEL, abaixo=[["VM Painel TV5"], ["Dicas"]], abre={"VM Painel TV5": "Conectar: VM Painel TV5"}),
+        _acesso_remoto(["Adicionar PC", "VM Painel TV5"])
+    ),
+    "TV 4 Painel - TV6": _painel_recentes("VM Painel TV6", confirmacoes=1),
+    "Gestão Industria": _setor_fontes(["TV", "HDMI1", "Acesso remoto"],
+                                      ["Adicionar PC", "VM Gestão Industria", "VM Antifraude", "VM Controladoria"],
+                                      "VM Gestão Industria"),
+    "Antifraude": _setor_fontes(["TV", "HDMI1", "HDMI2", "Acesso remoto"],
+                                ["VM Antifraude", "VM Gestão Industria"], "VM Antifraude"),
+    "Controladoria": _layout(
+        "Acesso remoto: Aviso",
+        {"app": "Acesso remoto", "tela": "Sessão: VM Controladoria"},
+        _home(["Netflix", "YouTube", "Acesso remoto"]),
+        {
+            "Acesso remoto: Aviso": {"grade": [["OK"]], "abre": {"OK": "Acesso remoto: Início"}, "app": "Acesso remoto"},
+            "Acesso remoto: Início": {"grade": [["Dispositivos", "Conexões"]], "abre": {"Conexões": "Acesso remoto"},
+                                      "app": "Acesso remoto"}
+        },
+        _acesso_remoto(["VM Controladoria", "VM Financeiro"], confirmacoes=2)
+    ),
+    "Financeiro": _setor_power_bi("BI Financeiro", ["BI Contas a Pagar", "BI Fluxo de Caixa"], 0),
+    "Cobrança": _setor_power_bi("BI Cobrança", ["BI Inadimplência", "BI Acordos"], 0),
+    "TV-JURIDICO": _setor_power_bi("BI Jurídico", ["BI Processos", "BI Prazos"], 0, tela_cheia=False),
+    "TvCadastro": _painel_vm(_BARRA_PAINEL, 0, ["Adicionar PC", "VM Cadastro", "VM Financeiro"], "VM Cadastro"),
+    "TV-ATLAS": _layout(
+        "Home",
+        {"app": "Acesso remoto", "tela": "Sessão: PC Atlas"},
+        _home(["Netflix", "YouTube"], fontes=["TV", "HDMI1", "Acesso remoto"]),
+        _acesso_remoto(["Adicionar PC", "PC Atlas"], confirmacoes=0, horizontal=True)
+    ),
+    "Cozinha Entrada": _layout(
+        "Home",
+        {"app": "Acesso remoto", "tela": "Sessão: PC Cozinha"},
+        _home(["Netflix", "YouTube"], fontes=["TV", "Acesso remoto"]),
+        _acesso_remoto(["PC Cozinha"], confirmacoes=0, horizontal=True)
+    ),
+    "Recepção": _layout(
+        "Home",
+        {"app": "Navegador", "tela": "Painel Recepção (tela cheia)"},
+        _home(["Netflix", "YouTube", "Navegador", "Galeria", "Prime Video"], foco=3,
+              acima=[["Galeria", "Painel Recepção"]], abre={"Painel Recepção": "Navegador: Painel Recepção"}),
+        _navegador({"Painel Recepção": TEMPO_PAGINA})
+    ),
+    "TV-REUNIÃO-01": _REUNIAO,
+    "TV-REUNIÃO-02": _REUNIAO,
+    "TV-MOSSAD": _REUNIAO,
+    "TV-DIA D": _REUNIAO,
+    "TV-GEO-FOREST": _REUNIAO
+}
@@ -1,15 +1,11 @@
-// Atualiza status de todas as TVs
-async function checkAllStatus() {
-    try {
-        const response = await fetch('/api/status/todas');
-        const data = await response.json();
-
-        if (data.success) {
-            updateStatusIndicators(data.status);
-        }
-    } catch (error) {
-        console.error('Erro ao verificar status:', error);
-    }
+// Último status recebido do servidor (via /api/eventos)
+const ultimoStatus = {};
+
+// Reaplica o último status conhecido (remove estados de "carregando" sem consultar a API)
+function restaurarIndicadores() {
+    updateStatusIndicators(Object.fromEntries(
+        Object.entries(ultimoStatus).filter(([tvName]) => !sequenciasAtivas.has(tvName))
+    ));
 }
 
 // Atualiza indicadores de status na sidebar
@@ -71,12 +67,12 @@ async function togglePower(tvName) {
                 }
             }
 
-            // Verifica o status real depois de um tempo para garantir
-            setTimeout(() => checkAllStatus(), 5000);
+            // O status real chega pelo stream de eventos; depois disso, descarta o otimista
+            setTimeout(restaurarIndicadores, 15000);
         }
     } catch (error) {
         console.error('Erro:', error);
-        checkAllStatus();
+        restaurarIndicadores();
     }
 }
 
@@ -132,11 +128,11 @@ async function ligarTodasComBi() {
         const data = await response.json();
 
         if (data.success) {
-            setTimeout(() => checkAllStatus(), 12000);
+            setTimeout(restaurarIndicadores, 15000);
         }
     } catch (error) {
         console.error('Erro:', error);
-        checkAllStatus();
+        restaurarIndicadores();
     }
 }
 
@@ -154,11 +150,11 @@ async function ligarTodasSemBi() {
         const data = await response.json();
 
         if (data.success) {
-            setTimeout(() => checkAllStatus(), 12000);
+            setTimeout(restaurarIndicadores, 15000);
         }
     } catch (error) {
         console.error('Erro:', error);
-        checkAllStatus();
+        restaurarIndicadores();
     }
 }
 
@@ -189,30 +185,11 @@ async function desligarTVsExcetoReunioes() {
 
         if (data.success) {
             // Aguarda tempo suficiente para o desligamento em lote completar
-            setTimeout(() => checkAllStatus(), 15000);
+            setTimeout(restaurarIndicadores, 15000);
         }
     } catch (error) {
         console.error('Erro:', error);
-        checkAllStatus();
-    }
-}
-
-// Verifica status do token
-async function verificarStatusToken() {
-    try {
-        const response = await fetch('/api/token/status');
-        const data = await response.json();
-
-        if (data.success && data.status) {
-            const status = data.status;
-
-            // Se houve erro na última tentativa de renovação
-            if (status.sucesso === false && status.erro) {
-                mostrarPopupErroToken(status.erro);
-            }
-        }
-    } catch (error) {
-        console.error('Erro ao verificar status do token:', error);
+        restaurarIndicadores();
     }
 }
 
@@ -267,23 +244,96 @@ async function retryTokenRenewal() {
     }
 }
 
-// Inicialização
-document.addEventListener('DOMContentLoaded', () => {
-    // Carrega status inicial
-    checkAllStatus();
+// Stream de eventos do servidor: status, sequências, token, logs e comandos em lote (substitui o polling)
+let eventos = null;
+let logsRecebidos = [];
+let sequenciasAtivas = new Set();
+let jobsAtivos = {};
+
+// Andamento dos jobs de /api/commands, atualizado pelo evento 'comandos' (sem consultar /api/commands/<id>)
+function renderizarJobs() {
+    const container = document.getElementById('jobs-progresso');
+    if (!container) return;
+    container.innerHTML = Object.values(jobsAtivos).map(job => {
+        const concluidos = job.ok + job.falhas;
+        const tvsComFalha = Object.entries(job.tvs).filter(([, c]) => c.falha > 0).map(([tvName]) => tvName);
+        const classe = job.status === 'concluido' ? (job.falhas ? 'falha' : 'ok') : '';
+        return `<div class="job-progresso ${classe}" title="${tvsComFalha.length ? 'Falhas: ' + tvsComFalha.join(', ') : ''}">
+            <span>Comandos ${job.id}</span>
+            <span>${concluidos}/${job.total}${job.falhas ? ` (${job.falhas} falha${job.falhas > 1 ? 's' : ''})` : ''}</span>
+        </div>`;
+    }).join('');
+}
 
-    // Atualiza a cada 30 segundos
-    setInterval(checkAllStatus, 30000);
+function conectarEventos() {
+    eventos = new EventSource('/api/eventos');
+
+    eventos.addEventListener('status', (e) => {
+        const alterados = JSON.parse(e.data);
+        Object.assign(ultimoStatus, alterados);
+        // Não sobrescreve o "carregando" de TVs em sequência
+        updateStatusIndicators(Object.fromEntries(
+            Object.entries(alterados).filter(([tvName]) => !sequenciasAtivas.has(tvName))
+        ));
+    });
+
+    // TVs com sequência em execução ficam em "carregando" até a sequência terminar
+    eventos.addEventListener('sequencias', (e) => {
+        const emExecucao = new Set(JSON.parse(e.data).em_execucao);
+        sequenciasAtivas.forEach(tvName => {
+            if (!emExecucao.has(tvName) && ultimoStatus[tvName]) {
+                updateStatusIndicators({ [tvName]: ultimoStatus[tvName] });
+            }
+        });
+        emExecucao.forEach(tvName => {
+            const powerIcon = document.getElementById(`power-${tvName}`);
+            if (powerIcon) {
+                powerIcon.classList.remove('on', 'off');
+                powerIcon.classList.add('loading');
+            }
+        });
+        sequenciasAtivas = emExecucao;
+    });
 
-    // Verifica status do token a cada 5 segundos (Feedback instantâneo)
-    setInterval(verificarStatusToken, 5000);
-    verificarStatusToken();
+    eventos.addEventListener('token', (e) => {
+        const status = JSON.parse(e.data);
+        // Se houve erro na última tentativa de renovação
+        if (status.sucesso === false && status.erro) {
+            mostrarPopupErroToken(status.erro);
+        }
+    });
+
+    eventos.addEventListener('comandos', (e) => {
+        const job = JSON.parse(e.data);
+        jobsAtivos[job.id] = job;
+        if (job.status === 'concluido') {
+            // Mostra o resultado final por alguns segundos
+            setTimeout(() => {
+                delete jobsAtivos[job.id];
+                renderizarJobs();
+            }, 8000);
+        }
+        renderizarJobs();
+    });
+
+    eventos.addEventListener('logs', (e) => {
+        logsRecebidos = logsRecebidos.concat(JSON.parse(e.data)).slice(-500);
+        if (currentLogTvName) renderizarLogsModal();
+    });
+
+    // O EventSource reconecta sozinho (retry enviado pelo servidor)
+    eventos.onerror = () => console.error('Conexão de eventos perdida, reconectando...');
+}
+
+// Inicialização
+document.addEventListener('DOMContentLoaded', () => {
+    // Status inicial, mudanças, token e logs chegam pelo mesmo stream
+    conectarEventos();
 });
 
 // --- Log Modal Logic ---
 
 let currentLogTvName = null;
-let logUpdateInterval = null;
 
 function openLogModal(tvName) {
     currentLogTvName = tvName;
@@ -294,10 +344,8 @@ function openLogModal(tvName) {
         modalTitle.textContent = `Logs - ${tvName}`;
         modal.style.display = 'flex';
 
+        // Histórico inicial; os novos logs chegam pelo stream de eventos
         atualizarLogsModal();
-        // Update logs every 5 seconds while modal is open
-        if (logUpdateInterval) clearInterval(logUpdateInterval);
-        logUpdateInterval = setInterval(atualizarLogsModal, 5000);
     }
 }
 
@@ -306,10 +354,6 @@ function fecharLogModal() {
     if (modal) {
         modal.style.display = 'none';
     }
-    if (logUpdateInterval) {
-        clearInterval(logUpdateInterval);
-        logUpdateInterval = null;
-    }
     currentLogTvName = null;
 }
 
@@ -324,33 +368,10 @@ async function atualizarLogsModal() {
         const data = await response.json();
 
         if (data.logs) {
-            // Filter logs for this TV (case insensitive)
-            const filteredLogs = data.logs.filter(log =>
-                log.mensagem.toLowerCase().includes(currentLogTvName.toLowerCase()) ||
-                log.mensagem.toLowerCase().includes('todas') // Include global logs
-            );
-
-            // Sort by timestamp descending (newest first) - assuming logs are already appended in order, so reverse
-            const sortedLogs = filteredLogs.reverse();
-
-            if (sortedLogs.length === 0) {
-                logContainer.innerHTML = '<div class="log-loading">Nenhum log encontrado para esta TV.</div>';
-                return;
-            }
-
-            logContainer.innerHTML = sortedLogs.map(log => {
-                let typeClass = 'info';
-                if (log.tipo === 'ERROR') typeClass = 'error';
-                if (log.tipo === 'SUCCESS') typeClass = 'success';
-                if (log.tipo === 'WARNING') typeClass = 'warning';
-
-                return `
-                    <div class="log-entry ${typeClass}">
-                        <span class="log-timestamp">[${log.timestamp}]</span>
-                        <span class="log-message">${log.mensagem}</span>
-                    </div>
-                `;
-            }).join('');
+            // Junta o histórico com os logs que já chegaram pelo stream (sem duplicar pelo seq)
+            const ultimoSeq = data.logs.length ? data.logs[data.logs.length - 1].seq : 0;
+            logsRecebidos = data.logs.concat(logsRecebidos.filter(log => log.seq > ultimoSeq)).slice(-500);
+            renderizarLogsModal();
         }
     } catch (error) {
         console.error('Erro ao buscar logs:', error);
@@ -358,6 +379,39 @@ async function atualizarLogsModal() {
     }
 }
 
+function renderizarLogsModal() {
+    const logContainer = document.getElementById('logContainer');
+    if (!logContainer || !currentLogTvName) return;
+
+    // Filter logs for this TV (case insensitive)
+    const filteredLogs = logsRecebidos.filter(log =>
+        log.mensagem.toLowerCase().includes(currentLogTvName.toLowerCase()) ||
+        log.mensagem.toLowerCase().includes('todas') // Include global logs
+    );
+
+    // Newest first (logs are kept in arrival order)
+    const sortedLogs = filteredLogs.slice().reverse();
+
+    if (sortedLogs.length === 0) {
+        logContainer.innerHTML = '<div class="log-loading">Nenhum log encontrado para esta TV.</div>';
+        return;
+    }
+
+    logContainer.innerHTML = sortedLogs.map(log => {
+        let typeClass = 'info';
+        if (log.tipo === 'ERROR') typeClass = 'error';
+        if (log.tipo === 'SUCCESS') typeClass = 'success';
+        if (log.tipo === 'WARNING') typeClass = 'warning';
+
+        return `
+            <div class="log-entry ${typeClass}">
+                <span class="log-timestamp">[${log.timestamp}]</span>
+                <span class="log-message">${log.mensagem}</span>
+            </div>
+        `;
+    }).join('');
+}
+
 // Close modal when clicking outside
 window.onclick = function (event) {
     const modal = document.getElementById('logModal');
@@ -557,7 +611,7 @@ async function reconnectTv(tvName) {
             // Keep spinning for a bit to show activity, since the action is async
             setTimeout(() => {
                 // Optional: Refresh status after sequence might be done (approx 12s)
-                setTimeout(() => checkAllStatus(), 12000);
+                setTimeout(restaurarIndicadores, 15000);
             }, 1000);
         } else {
             console.error('Erro ao reconectar:', data.message);
@@ -627,7 +681,7 @@ async function ligarComBi(tvName) {
         const data = await response.json();
 
         if (data.success) {
-            setTimeout(() => checkAllStatus(), 8000);
+            setTimeout(restaurarIndicadores, 15000);
         }
     } catch (error) {
         console.error('Erro:', error);
@@ -641,12 +695,12 @@ async function ligarComBi(tvName) {
 // --- Wallpaper Modal Logic ---
 
 let currentWallpaperTvName = null;
-let currentWallpaperBase64 = null;
+let currentWallpaperFile = null;
 
 function abrirWallpaperModal(tvName) {
     closeContextMenu();
     currentWallpaperTvName = tvName;
-    currentWallpaperBase64 = null;
+    currentWallpaperFile = null;
 
     const modal = document.getElementById('wallpaperModal');
     const modalTitle = document.getElementById('wallpaperModalTitle');
@@ -681,7 +735,7 @@ function fecharWallpaperModal() {
         modal.style.display = 'none';
     }
     currentWallpaperTvName = null;
-    currentWallpaperBase64 = null;
+    currentWallpaperFile = null;
 }
 
 function previewWallpaper(event) {
@@ -691,24 +745,19 @@ function previewWallpaper(event) {
     const preview = document.getElementById('wallpaperPreview');
     const btnSend = document.getElementById('btnSendWallpaper');
 
-    const reader = new FileReader();
-    reader.onload = function (e) {
-        // Extrai apenas o base64 (remove o prefixo data:image/xxx;base64,)
-        const fullBase64 = e.target.result;
-        currentWallpaperBase64 = fullBase64.split(',')[1];
+    // O arquivo é enviado como upload multipart; o servidor redimensiona e recomprime
+    currentWallpaperFile = file;
 
-        // Mostra preview
-        preview.innerHTML = `<img src="${fullBase64}" alt="Preview do wallpaper">`;
-        preview.classList.add('has-image');
+    // Mostra preview
+    preview.innerHTML = `<img src="${URL.createObjectURL(file)}" alt="Preview do wallpaper">`;
+    preview.classList.add('has-image');
 
-        // Habilita botão de enviar
-        btnSend.disabled = false;
-    };
-    reader.readAsDataURL(file);
+    // Habilita botão de enviar
+    btnSend.disabled = false;
 }
 
 async function enviarWallpaper() {
-    if (!currentWallpaperTvName || !currentWallpaperBase64) {
+    if (!currentWallpaperTvName || !currentWallpaperFile) {
         alert('Selecione uma imagem primeiro.');
         return;
     }
@@ -725,12 +774,12 @@ async function enviarWallpaper() {
     `;
 
     try {
-        const response = await fetch(`/api/wallpaper/${currentWallpaperTvName}`, {
+        const formData = new FormData();
+        formData.append('imagem', currentWallpaperFile);
+
+        const response = await fetch(`/api/wallpaper/${currentWallpaperTvName}/upload`, {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ base64: currentWallpaperBase64 })
+            body: formData
         });
 
         const data = await response.json();
@@ -0,0 +1,63 @@
+"""
+Configuração dos testes (python -m pytest)
+Bancos, logs e traces vão para uma pasta temporária antes de importar o config
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+_PASTA = tempfile.mkdtemp(prefix="apptvs-testes-")
+os.environ.setdefault("ESTADO_DB", os.path.join(_PASTA, "estado.db"))
+os.environ.setdefault("WEBHOOK_OUTBOX_DB", os.path.join(_PASTA, "webhook_outbox.db"))
+os.environ.setdefault("RASTREAMENTO_ARQUIVO", os.path.join(_PASTA, "traces.jsonl"))
+os.environ["LOG_ARQUIVO"] = ""
+os.environ["LOG_DB"] = ""
+
+# Permite importar os módulos do projeto (config, services, utils...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_PASTA, ignore_errors=True)
+
+
+def aguardar(condicao, timeout: float = 5) -> bool:
+    """Espera a condição ficar verdadeira (threads do pool); retorna False se o prazo acabar"""
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicao():
+            return True
+        time.sleep(0.01)
+    return condicao()
+
+
+class FuncaoBloqueante:
+    """Função de tarefa que conta as chamadas e fica presa até liberar()"""
+    
+    def __init__(self):
+        self.chamadas = 0
+        self.iniciada = threading.Event()
+        self._liberada = threading.Event()
+        self._lock = threading.Lock()
+    
+    def __call__(self):
+        with self._lock:
+            self.chamadas += 1
+        self.iniciada.set()
+        self._liberada.wait(5)
+    
+    def liberar(self):
+        self._liberada.set()
+
+
+@pytest.fixture
+def funcao_bloqueante():
+    funcao = FuncaoBloqueante()
+    yield funcao
+    funcao.liberar()
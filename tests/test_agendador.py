@@ -0,0 +1,141 @@
+"""
+Políticas de sobreposição do Agendador (pular, enfileirar, coalescer) e tempo máximo
+As tarefas são despachadas direto (_despachar), sem esperar o horário
+"""
+
+import threading
+
+import pytest
+
+from conftest import aguardar
+from services.scheduler_service import (Agendador, POLITICA_COALESCER, POLITICA_ENFILEIRAR, POLITICA_PULAR,
+                                        _Tarefa)
+
+
+def _iniciar(agendador, tarefa, funcao):
+    """Despacha a primeira execução e espera ela começar"""
+    agendador._despachar(tarefa)
+    assert funcao.iniciada.wait(5)
+
+
+def _aguardar_fim(agendador, tarefa):
+    assert aguardar(lambda: tarefa.nome not in agendador._rodando)
+
+
+def test_pular_descarta_execucao_sobreposta(funcao_bloqueante):
+    agendador = Agendador()
+    tarefa = _Tarefa("pular", funcao_bloqueante, intervalo=60, politica=POLITICA_PULAR)
+    _iniciar(agendador, tarefa, funcao_bloqueante)
+    
+    agendador._despachar(tarefa)
+    agendador._despachar(tarefa)
+    assert tarefa.puladas == 2
+    assert tarefa.pendentes == 0
+    
+    funcao_bloqueante.liberar()
+    _aguardar_fim(agendador, tarefa)
+    assert funcao_bloqueante.chamadas == 1
+    assert tarefa.inicio_execucao is None
+
+
+def test_enfileirar_executa_todas_as_pendentes(funcao_bloqueante):
+    agendador = Agendador()
+    tarefa = _Tarefa("enfileirar", funcao_bloqueante, intervalo=60, politica=POLITICA_ENFILEIRAR)
+    _iniciar(agendador, tarefa, funcao_bloqueante)
+    
+    agendador._despachar(tarefa)
+    agendador._despachar(tarefa)
+    assert tarefa.pendentes == 2
+    
+    funcao_bloqueante.liberar()
+    _aguardar_fim(agendador, tarefa)
+    assert funcao_bloqueante.chamadas == 3
+    assert tarefa.pendentes == 0 and tarefa.puladas == 0
+
+
+def test_coalescer_junta_as_pendentes_em_uma_execucao(funcao_bloqueante):
+    agendador = Agendador()
+    tarefa = _Tarefa("coalescer", funcao_bloqueante, intervalo=60, politica=POLITICA_COALESCER)
+    _iniciar(agendador, tarefa, funcao_bloqueante)
+    
+    for _ in range(3):
+        agendador._despachar(tarefa)
+    assert tarefa.pendentes == 1
+    
+    funcao_bloqueante.liberar()
+    _aguardar_fim(agendador, tarefa)
+    assert funcao_bloqueante.chamadas == 2
+
+
+def test_tempo_maximo_libera_nova_execucao_uma_vez(funcao_bloqueante):
+    agendador = Agendador()
+    tarefa = _Tarefa("travada", funcao_bloqueante, intervalo=60, politica=POLITICA_PULAR, tempo_maximo=10)
+    _iniciar(agendador, tarefa, funcao_bloqueante)
+    
+    # Execução travada além do tempo máximo: a próxima é liberada e a anterior fica abandonada
+    tarefa.inicio_execucao -= 60
+    agendador._despachar(tarefa)
+    assert tarefa.estouros == 1
+    assert len(tarefa.abandonadas) == 1
+    assert aguardar(lambda: funcao_bloqueante.chamadas == 2)
+    
+    # Com uma abandonada ainda ocupando o pool, um novo estouro só pula
+    tarefa.inicio_execucao -= 60
+    agendador._despachar(tarefa)
+    assert tarefa.estouros == 1
+    assert tarefa.puladas == 1
+    
+    funcao_bloqueante.liberar()
+    _aguardar_fim(agendador, tarefa)
+    assert tarefa.abandonadas == set()
+    assert funcao_bloqueante.chamadas == 2
+
+
+def test_substituir_tarefa_em_execucao_mantem_controle_de_sobreposicao(funcao_bloqueante):
+    agendador = Agendador()
+    agendador.agendar_intervalo("keep_alive", 60, funcao_bloqueante, politica=POLITICA_PULAR)
+    tarefa = agendador._tarefas["keep_alive"]
+    _iniciar(agendador, tarefa, funcao_bloqueante)
+    
+    # Agenda reaplicada durante a execução: a nova definição continua vendo a execução em andamento
+    agendador.agendar_intervalo("keep_alive", 60, funcao_bloqueante, politica=POLITICA_PULAR)
+    nova = agendador._tarefas["keep_alive"]
+    assert nova is not tarefa
+    assert nova.inicio_execucao == tarefa.inicio_execucao
+    agendador._despachar(nova)
+    assert nova.puladas == 1
+    
+    funcao_bloqueante.liberar()
+    _aguardar_fim(agendador, nova)
+    assert nova.inicio_execucao is None
+    assert funcao_bloqueante.chamadas == 1
+
+
+def test_politica_invalida():
+    with pytest.raises(ValueError):
+        _Tarefa("invalida", lambda: None, intervalo=60, politica="ignorar")
+
+
+def test_executar_agora_usa_politica_e_pool_da_tarefa(funcao_bloqueante):
+    agendador = Agendador()
+    threads = []
+    
+    def funcao():
+        threads.append(threading.current_thread().name)
+        funcao_bloqueante()
+    
+    agendador.agendar_diario("agenda:ligar", "08:00", funcao, politica=POLITICA_COALESCER, pool="frota")
+    assert agendador.executar_agora("agenda:ligar")
+    assert funcao_bloqueante.iniciada.wait(5)
+    
+    # Recuperação disparada de novo durante a execução: coalescida como um disparo do horário
+    agendador.executar_agora("agenda:ligar")
+    agendador.executar_agora("agenda:ligar")
+    tarefa = agendador._tarefas["agenda:ligar"]
+    assert tarefa.pendentes == 1
+    
+    funcao_bloqueante.liberar()
+    _aguardar_fim(agendador, tarefa)
+    assert funcao_bloqueante.chamadas == 2
+    assert all(nome.startswith("frota") for nome in threads)
+    assert not agendador.executar_agora("inexistente")
@@ -0,0 +1,55 @@
+"""
+Gravação e reprodução das chamadas externas (utils/cliente_http)
+Uma sessão falsa responde no lugar da rede durante a gravação
+"""
+
+import json
+
+import pytest
+import requests
+
+import config
+from utils import cliente_http
+
+
+class SessaoFalsa:
+    """Responde com o status informado no próprio corpo JSON da requisição"""
+    
+    def request(self, metodo, url, **kwargs):
+        response = requests.Response()
+        response.status_code = kwargs["json"]["status"]
+        response._content = b'{"ok": true}'
+        response.headers["Content-Type"] = "application/json"
+        return response
+
+
+@pytest.fixture
+def arquivo(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "HTTP_FIXTURES_CORPO_MAX", 100)
+    yield str(tmp_path / "fixtures.jsonl")
+    cliente_http.desativar()
+
+
+def _post(corpo):
+    return cliente_http.post("n8n", "wallpaper", "http://vm/wallpaper", sessao=SessaoFalsa(), json=corpo)
+
+
+def test_corpo_grande_e_gravado_so_como_hash(arquivo):
+    imagem = {"imagem": "A" * 500, "status": 201}
+    cliente_http.gravar(arquivo)
+    _post({"imagem": "pequena", "status": 200})
+    _post(imagem)
+    cliente_http.desativar()
+    
+    with open(arquivo, encoding="utf-8") as f:
+        conteudo = f.read()
+    assert "A" * 500 not in conteudo
+    pequena, grande = [json.loads(linha) for linha in conteudo.splitlines()]
+    assert pequena["requisicao"] == json.dumps({"imagem": "pequena", "status": 200}, sort_keys=True)
+    corpo = json.dumps(imagem, sort_keys=True)
+    assert grande["requisicao"] == {"sha256": cliente_http._hash(corpo), "tamanho": len(corpo)}
+    
+    # A reprodução acha a chamada pelo hash do corpo, mesmo fora da ordem gravada
+    cliente_http.reproduzir(arquivo, escala=0)
+    assert _post(imagem).status_code == 201
+    assert _post({"imagem": "pequena", "status": 200}).status_code == 200
@@ -0,0 +1,107 @@
+"""
+Comandos em lote: reserva da TV compartilhada com os demais comandos, reagendamento quando ocupada
+e andamento publicado para os painéis (SSE)
+A TV é ocupada direto em estado.db, como se fosse outro worker; as ações não chamam a SmartThings
+"""
+
+import queue
+
+import pytest
+
+import config
+from services.comando_service import ComandoService
+from services.eventos_service import EventosService
+from services.tv_controller import TVController
+from utils.estado_compartilhado import obter_estado
+from conftest import aguardar
+
+
+class TVServiceFalso:
+    def obter_tvs(self):
+        return {"TI01": {"id": "1", "setor": "TI"}}
+    
+    def tv_existe(self, tv_nome):
+        return tv_nome == "TI01"
+
+
+class WebhookFalso:
+    pass
+
+
+class EventosFalso:
+    def __init__(self):
+        self.publicados = []
+    
+    def publicar_job(self, progresso):
+        self.publicados.append(progresso)
+
+
+@pytest.fixture
+def controlador(monkeypatch):
+    monkeypatch.setattr(config, "RELOGIO_ESCALA", 100)
+    controlador = TVController(TVServiceFalso(), WebhookFalso())
+    controlador.reentrante = []
+    
+    def desligar_falso(tv_nome):
+        # A ação roda com a TV já reservada pelo job: a reserva é reentrante na mesma thread
+        controlador.reentrante.append(controlador.reservar_tv(tv_nome))
+        controlador.liberar_tv(tv_nome)
+        return True
+    
+    monkeypatch.setattr(controlador, "desligar_tv", desligar_falso)
+    yield controlador
+    obter_estado().remover("tv_ocupada", "TI01")
+
+
+def _ocupar_por_outro_worker(tv_nome):
+    assert obter_estado().reservar("tv_ocupada", tv_nome, {"job": "outro", "worker": 0}, ttl=60)
+
+
+def test_comando_direto_em_tv_ocupada_e_ignorado():
+    controlador = TVController(TVServiceFalso(), WebhookFalso())
+    _ocupar_por_outro_worker("TI01")
+    try:
+        assert controlador.desligar_tv("TI01") is False
+        assert controlador.ocupante_tv("TI01")["job"] == "outro"
+    finally:
+        obter_estado().remover("tv_ocupada", "TI01")
+
+
+def test_job_espera_a_tv_liberar_sem_falhar(controlador):
+    servico = ComandoService(TVServiceFalso(), controlador)
+    _ocupar_por_outro_worker("TI01")
+    
+    job = servico.criar_job([{"tv": "TI01", "acao": "desligar"}])
+    # Reagendado algumas vezes enquanto a TV está ocupada, sem executar
+    assert not aguardar(lambda: controlador.reentrante, timeout=0.2)
+    assert servico.obter_job(job["id"])["alvos"][0]["status"] == "pendente"
+    
+    obter_estado().remover("tv_ocupada", "TI01")
+    assert aguardar(lambda: servico.obter_job(job["id"])["status"] == "concluido")
+    assert servico.obter_job(job["id"])["alvos"][0]["status"] == "ok"
+    assert controlador.reentrante == [True]
+    # A reserva do job é liberada no fim
+    assert controlador.ocupante_tv("TI01") is None
+
+
+def test_andamento_do_job_vai_para_os_paineis(controlador):
+    eventos = EventosFalso()
+    servico = ComandoService(TVServiceFalso(), controlador, eventos)
+    job = servico.criar_job([{"tv": "TI01", "acao": "desligar"}, {"tv": "TI01", "acao": "desligar"}])
+    assert aguardar(lambda: eventos.publicados[-1]["status"] == "concluido")
+    
+    assert eventos.publicados[0] == {"id": job["id"], "status": "em_execucao", "total": 2, "ok": 0, "falhas": 0,
+                                     "tvs": {"TI01": {"total": 2, "ok": 0, "falha": 0}}}
+    assert eventos.publicados[-1]["ok"] == 2
+    assert eventos.publicados[-1]["tvs"] == {"TI01": {"total": 2, "ok": 2, "falha": 0}}
+    
+    # Painéis de outro worker recebem o mesmo andamento pelo estado compartilhado
+    outro_worker = EventosService()
+    fila = queue.Queue()
+    outro_worker._assinantes.append(fila)
+    outro_worker._verificar_mudancas()
+    comandos = [dados for evento, dados in list(fila.queue) if evento == "comandos"]
+    assert eventos.publicados[-1] in comandos
+    # Sem mudanças, nada é reenviado
+    outro_worker._verificar_mudancas()
+    assert [evento for evento, _ in list(fila.queue)].count("comandos") == len(comandos)
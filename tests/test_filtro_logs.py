@@ -0,0 +1,77 @@
+"""
+Filtro de logs: agrupamento de mensagens repetidas, limite de taxa por categoria e resumos
+Os instantes são passados explicitamente (relógio virtual); só o token bucket usa o relógio real
+"""
+
+import time
+
+from utils.filtro_logs import FiltroLogs, categoria
+
+
+def _filtro(**kwargs):
+    # Taxa quase zero: o bucket não recarrega durante o teste
+    parametros = {"janela": 30, "taxa": 0.001, "rajada": 3, "niveis": ["WARNING", "ERROR"]}
+    parametros.update(kwargs)
+    return FiltroLogs(**parametros)
+
+
+def test_categoria_troca_numeros():
+    assert categoria("✗ Tentativa 2/3 falhou: 409") == "✗ Tentativa #/# falhou: #"
+
+
+def test_repetidas_na_janela_viram_resumo():
+    filtro = _filtro()
+    mensagem = "[TI01] Falha ao consultar status"
+    assert filtro.suprimir(0, "WARNING", mensagem) is None
+    assert filtro.suprimir(1, "WARNING", mensagem) == "duplicado"
+    assert filtro.suprimir(2, "WARNING", mensagem) == "duplicado"
+    
+    # Janela ainda aberta: nenhum resumo
+    assert filtro.resumos(10) == []
+    resumos = filtro.resumos(30)
+    assert resumos == [("WARNING", f"[LOGGER] Repetida 2x nos últimos 30s: {mensagem}")]
+    
+    # Depois do resumo a mensagem volta a ser gravada
+    assert filtro.suprimir(31, "WARNING", mensagem) is None
+
+
+def test_mensagem_unica_nao_gera_resumo():
+    filtro = _filtro()
+    assert filtro.suprimir(0, "ERROR", "[TI01] Erro ao ligar") is None
+    assert filtro.resumos(60) == []
+
+
+def test_niveis_fora_do_filtro_e_separadores_passam():
+    filtro = _filtro()
+    for instante in range(5):
+        assert filtro.suprimir(instante, "INFO", "[TI01] Enter enviado") is None
+        assert filtro.suprimir(instante, "WARNING", "=" * 40) is None
+
+
+def test_limite_de_taxa_por_categoria():
+    # O resumo por taxa conta a janela a partir da criação do filtro (relógio real)
+    filtro = _filtro()
+    agora = time.time()
+    motivos = [filtro.suprimir(agora, "ERROR", f"✗ Tentativa {i}/10 falhou: 409") for i in range(1, 6)]
+    # Mensagens diferentes da mesma categoria: a rajada passa, o resto é limitado
+    assert motivos == [None, None, None, "taxa", "taxa"]
+    # Outra categoria tem o seu próprio bucket
+    assert filtro.suprimir(agora, "ERROR", "[TI01] Timeout na SmartThings") is None
+    
+    assert filtro.resumos(agora + 10) == []
+    resumos = filtro.resumos(agora + 30)
+    assert ("ERROR", "[LOGGER] 2 log(s) suprimido(s) por limite de taxa: ✗ Tentativa #/# falhou: #") in resumos
+    # Os suprimidos por taxa só entram no resumo seguinte uma vez
+    assert filtro.resumos(agora + 60) == []
+
+
+def test_totais_por_categoria():
+    filtro = _filtro()
+    filtro.suprimir(0, "WARNING", "[TI01] Status indisponível")
+    filtro.suprimir(1, "WARNING", "[TI01] Status indisponível")
+    for i in range(5):
+        filtro.suprimir(0, "ERROR", f"✗ Tentativa {i}/5 falhou: 409")
+    
+    totais = filtro.obter_suprimidos()
+    assert totais[0] == {"tipo": "ERROR", "categoria": "✗ Tentativa #/# falhou: #", "duplicado": 0, "taxa": 2}
+    assert totais[1] == {"tipo": "WARNING", "categoria": "[TI#] Status indisponível", "duplicado": 1, "taxa": 0}
@@ -0,0 +1,55 @@
+"""
+Limitador compartilhado: cota única entre workers, com vagas retiradas do SQLite em lotes
+Cada LimitadorCompartilhado no mesmo banco faz o papel de um worker
+"""
+
+import pytest
+
+from utils.limitador import LimitadorCompartilhado
+
+
+@pytest.fixture
+def banco(tmp_path):
+    return str(tmp_path / "estado.db")
+
+
+def _worker(banco, lote=2):
+    # Taxa quase zero: o balde não reabastece durante o teste
+    return LimitadorCompartilhado("teste", taxa=0.001, rajada=4, db_path=banco, lote=lote)
+
+
+def _tokens_no_banco(limitador):
+    return limitador._conexao().execute("SELECT tokens FROM limitador WHERE nome = 'teste'").fetchone()[0]
+
+
+def test_lote_e_gasto_sem_tocar_no_banco(banco):
+    worker = _worker(banco)
+    assert worker.tentar()
+    assert _tokens_no_banco(worker) == 2
+    # A segunda vaga vem do lote local
+    assert worker.tentar()
+    assert _tokens_no_banco(worker) == 2
+
+
+def test_cota_vale_para_todos_os_workers(banco):
+    worker_a, worker_b = _worker(banco), _worker(banco)
+    consumidas = [worker_a.tentar(), worker_b.tentar(), worker_a.tentar(), worker_b.tentar()]
+    assert consumidas == [True] * 4
+    assert not worker_a.tentar()
+    assert not worker_b.tentar()
+
+
+def test_lote_local_vencido_volta_ao_banco(banco):
+    worker_a, worker_b = _worker(banco), _worker(banco, lote=1)
+    assert worker_a.tentar()
+    # Sobras velhas não valem mais: não somam rajadas além da cota
+    worker_a._locais_validade = 0
+    assert worker_a.tentar()
+    assert _tokens_no_banco(worker_a) < 1
+    assert not worker_b.tentar()
+
+
+def test_padrao_divide_a_rajada_entre_os_workers(banco, monkeypatch):
+    monkeypatch.setattr("config.WEB_WORKERS", 4)
+    assert LimitadorCompartilhado("teste", taxa=5, rajada=10, db_path=banco).lote == 2
+    assert LimitadorCompartilhado("teste", taxa=5, rajada=2, db_path=banco).lote == 1
@@ -0,0 +1,38 @@
+"""
+Rotas de logs do painel (/api/logs e /api/logs/limpar)
+Só o blueprint da API, sem serviços: as rotas de logs não usam TVs nem agendador
+"""
+
+import pytest
+from flask import Flask
+
+from routes import create_api_routes
+from utils import log
+from utils.logger import descarregar_logs
+
+
+@pytest.fixture
+def cliente():
+    app = Flask(__name__)
+    app.register_blueprint(create_api_routes(None, None, None, None, None, None, None))
+    return app.test_client()
+
+
+def _mensagens(cliente):
+    descarregar_logs()
+    resposta = cliente.get('/api/logs')
+    assert resposta.status_code == 200
+    return [entrada["mensagem"] for entrada in resposta.get_json()["logs"]]
+
+
+def test_limpar_logs_esconde_os_anteriores(cliente):
+    log("[TI01] antes da limpeza", "INFO", silent=True)
+    assert "[TI01] antes da limpeza" in _mensagens(cliente)
+    
+    resposta = cliente.post('/api/logs/limpar')
+    assert resposta.status_code == 200
+    assert resposta.get_json()["success"] is True
+    
+    mensagens = _mensagens(cliente)
+    assert "[TI01] antes da limpeza" not in mensagens
+    assert "Logs limpos pelo usuário" in mensagens
@@ -0,0 +1,62 @@
+"""
+Webhook em lote das operações de frota: só as VMs das TVs desligadas são acordadas
+Serviços falsos no lugar da SmartThings e do n8n; as esperas entre blocos são comprimidas
+"""
+
+import pytest
+
+import config
+from services.tv_controller import TVController
+
+TVS = ["TI01", "TI02", "TI03", "Financeiro"]
+LIGADAS = {"TI02", "Financeiro"}
+
+
+class TVServiceFalso:
+    def obter_tvs(self):
+        return {nome: {"id": nome, "setor": "TI"} for nome in TVS}
+    
+    def atualizar_status_todas(self, max_idade=None):
+        return {nome: {"is_on": nome in LIGADAS} for nome in TVS}
+
+
+class WebhookFalso:
+    def __init__(self, lote_ok=True):
+        self.lote_ok = lote_ok
+        self.lotes = []
+    
+    def enviar_comando_ligar_lote(self, tvs):
+        self.lotes.append(list(tvs))
+        return self.lote_ok
+    
+    def tv_tem_webhook(self, tv_nome):
+        return True
+    
+    def resetar_vm_pronta(self, tv_nome):
+        pass
+
+
+@pytest.fixture
+def controlador(monkeypatch):
+    monkeypatch.setattr(config, "RELOGIO_ESCALA", 1e6)
+    webhook = WebhookFalso()
+    controlador = TVController(TVServiceFalso(), webhook)
+    controlador.chamadas = {}
+    monkeypatch.setattr(controlador, "ligar_tv",
+                        lambda tv, enviar_webhook=True, aguardar_vm=False: controlador.chamadas.__setitem__(tv, enviar_webhook))
+    return controlador
+
+
+@pytest.mark.parametrize("pipeline", [False, True])
+def test_ligar_todas_envia_lote_so_das_desligadas(controlador, pipeline):
+    controlador.ligar_todas_automatico(pipeline=pipeline, aguardar=True)
+    
+    assert controlador.webhook_service.lotes == [["TI01", "TI03"]]
+    # As desligadas já foram no lote; as ligadas só enviam o próprio webhook se ligar_tv as achar desligadas
+    assert controlador.chamadas == {tv: tv in LIGADAS for tv in TVS}
+
+
+def test_ligar_todas_lote_com_falha_volta_ao_webhook_por_tv(controlador):
+    controlador.webhook_service.lote_ok = False
+    controlador.ligar_todas_automatico(aguardar=True)
+    assert controlador.chamadas == {tv: True for tv in TVS}
@@ -0,0 +1,146 @@
+"""
+Outbox de webhooks: dedupe por (TV, ação), retentativas com backoff e reserva entre workers
+As entregas são feitas direto (_entregar) com um cliente HTTP falso, sem a thread de envio
+"""
+
+import json
+import time
+
+import pytest
+
+from services import webhook_service
+from services.webhook_service import WebhookOutbox
+
+
+class _Resposta:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class ClienteFalso:
+    """Substitui cliente_http.post: responde com os status da lista, em ordem (o último se repete)"""
+    
+    def __init__(self, *status):
+        self.status = list(status)
+        self.chamadas = []
+    
+    def post(self, servico, operacao, url, **kwargs):
+        self.chamadas.append((url, json.loads(kwargs["data"])))
+        status = self.status.pop(0) if len(self.status) > 1 else self.status[0]
+        if isinstance(status, Exception):
+            raise status
+        return _Resposta(status)
+
+
+@pytest.fixture
+def outbox(tmp_path, monkeypatch):
+    # Sem a thread de envio: os testes entregam os itens explicitamente
+    monkeypatch.setattr(WebhookOutbox, "iniciar", lambda self: None)
+    return WebhookOutbox(str(tmp_path / "outbox.db"))
+
+
+def _item(outbox, item_id):
+    linha = outbox._conn.execute(
+        "SELECT status, tentativas, proxima_tentativa, ultimo_erro FROM outbox WHERE id = ?", (item_id,)
+    ).fetchone()
+    return dict(zip(("status", "tentativas", "proxima_tentativa", "ultimo_erro"), linha))
+
+
+def _entregar_proximo(outbox):
+    item, _ = outbox._proximo_item()
+    outbox._entregar(*item)
+    return item[0]
+
+
+def test_dedupe_mesma_tv_e_acao_na_janela(outbox):
+    primeiro = outbox.enfileirar("TI01", "ligar", "http://vm/ligar", {"tv": "15"})
+    assert primeiro is not None
+    assert outbox.enfileirar("TI01", "ligar", "http://vm/ligar", {"tv": "15"}) is None
+    # Outra ação ou outra TV não são duplicados
+    assert outbox.enfileirar("TI01", "desligar", "http://vm/desligar", {"tv": "15"}) is not None
+    assert outbox.enfileirar("TI02", "ligar", "http://vm/ligar", {"tv": "16"}) is not None
+    assert outbox.obter_metricas()["deduplicados"] == 1
+
+
+def test_dedupe_vale_entre_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(WebhookOutbox, "iniciar", lambda self: None)
+    worker_a = WebhookOutbox(str(tmp_path / "outbox.db"))
+    worker_b = WebhookOutbox(str(tmp_path / "outbox.db"))
+    assert worker_a.enfileirar("TI01", "ligar", "http://vm/ligar", {}) is not None
+    assert worker_b.enfileirar("TI01", "ligar", "http://vm/ligar", {}) is None
+
+
+def test_dedupe_ignora_item_que_falhou(outbox, monkeypatch):
+    monkeypatch.setattr(webhook_service.cliente_http, "post", ClienteFalso(500).post)
+    outbox.max_tentativas = 1
+    item_id = outbox.enfileirar("TI01", "ligar", "http://vm/ligar", {})
+    _entregar_proximo(outbox)
+    assert _item(outbox, item_id)["status"] == "falhou"
+    # Um item descartado não impede enfileirar de novo
+    assert outbox.enfileirar("TI01", "ligar", "http://vm/ligar", {}) is not None
+
+
+def test_entrega_com_sucesso(outbox, monkeypatch):
+    cliente = ClienteFalso(200)
+    monkeypatch.setattr(webhook_service.cliente_http, "post", cliente.post)
+    item_id = outbox.enfileirar("TI01", "ligar", "http://vm/ligar", {"tv": "15"})
+    _entregar_proximo(outbox)
+    
+    assert cliente.chamadas == [("http://vm/ligar", {"tv": "15"})]
+    assert _item(outbox, item_id)["status"] == "enviado"
+    assert outbox.obter_metricas()["profundidade"] == 0
+    assert outbox.obter_metricas()["enviados"] == 1
+
+
+def test_retentativas_com_backoff_ate_descartar(outbox, monkeypatch):
+    cliente = ClienteFalso(503, ConnectionError("recusada"), 500)
+    monkeypatch.setattr(webhook_service.cliente_http, "post", cliente.post)
+    outbox.max_tentativas = 4
+    item_id = outbox.enfileirar("TI01", "ligar", "http://vm/ligar", {})
+    
+    atrasos = []
+    for tentativa in range(1, 4):
+        antes = time.time()
+        _entregar_proximo(outbox)
+        item = _item(outbox, item_id)
+        assert item["status"] == "pendente"
+        assert item["tentativas"] == tentativa
+        atrasos.append(item["proxima_tentativa"] - antes)
+        # Antecipa a próxima tentativa (sem esperar o backoff)
+        outbox._conn.execute("UPDATE outbox SET proxima_tentativa = 0 WHERE id = ?", (item_id,))
+    
+    # Backoff exponencial: base, 2x base, 4x base
+    base = outbox.backoff_base
+    for atraso, esperado in zip(atrasos, (base, base * 2, base * 4)):
+        assert esperado <= atraso < esperado + 1
+    assert _item(outbox, item_id)["ultimo_erro"] == "HTTP 500"
+    
+    _entregar_proximo(outbox)
+    item = _item(outbox, item_id)
+    assert item["status"] == "falhou"
+    assert item["tentativas"] == 4
+    assert outbox.obter_metricas()["falhas"] == 1
+
+
+def test_backoff_respeita_o_maximo(outbox, monkeypatch):
+    monkeypatch.setattr(webhook_service.cliente_http, "post", ClienteFalso(500).post)
+    outbox.max_tentativas = 20
+    item_id = outbox.enfileirar("TI01", "ligar", "http://vm/ligar", {})
+    outbox._conn.execute("UPDATE outbox SET tentativas = 15 WHERE id = ?", (item_id,))
+    
+    antes = time.time()
+    _entregar_proximo(outbox)
+    assert _item(outbox, item_id)["proxima_tentativa"] - antes < outbox.backoff_max + 1
+
+
+def test_item_reservado_por_um_worker_so(tmp_path, monkeypatch):
+    monkeypatch.setattr(WebhookOutbox, "iniciar", lambda self: None)
+    worker_a = WebhookOutbox(str(tmp_path / "outbox.db"))
+    worker_b = WebhookOutbox(str(tmp_path / "outbox.db"))
+    worker_a.enfileirar("TI01", "ligar", "http://vm/ligar", {})
+    
+    item_a, proxima_a = worker_a._proximo_item()
+    item_b, proxima_b = worker_b._proximo_item()
+    assert item_a[0] == item_b[0]
+    assert worker_a._reservar(item_a[0], proxima_a)
+    assert not worker_b._reservar(item_b[0], proxima_b)
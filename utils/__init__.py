@@ -1,4 +1,4 @@
 """Utils package"""
-from .logger import log, LOGS, LOGS_LOCK
+from .logger import log, consultar_logs, obter_logs_suprimidos, ultimo_seq_logs, limpar_logs, LOGS, LOGS_LOCK
 
-__all__ = ['log', 'LOGS', 'LOGS_LOCK']
+__all__ = ['log', 'consultar_logs', 'obter_logs_suprimidos', 'ultimo_seq_logs', 'limpar_logs', 'LOGS', 'LOGS_LOCK']
@@ -0,0 +1,57 @@
+"""
+Arquivos JSON lines gravados por vários workers
+A rotação do RotatingFileHandler não é segura entre processos (um worker renomeia o arquivo que outro
+ainda está gravando), então cada processo grava o seu: logs.jsonl → logs.<pid>.jsonl (e .1, .2...)
+Leitores percorrem os arquivos de todos os processos
+"""
+
+import logging
+import os
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import List
+import config
+
+
+def caminho_do_processo(base: str) -> Path:
+    """Arquivo deste processo: traces.jsonl → traces.<pid>.jsonl"""
+    base = Path(base)
+    return base.with_name(f"{base.stem}.{os.getpid()}{base.suffix}")
+
+
+def caminhos_de_todos(base: str) -> List[Path]:
+    """Arquivos de todos os processos (e o arquivo único de versões anteriores), mais antigos primeiro"""
+    base = Path(base)
+    caminhos = list(base.parent.glob(f"{base.stem}.*{base.suffix}*")) + list(base.parent.glob(f"{base.name}*"))
+    existentes = []
+    for caminho in set(caminhos):
+        try:
+            existentes.append((caminho.stat().st_mtime, caminho))
+        except OSError:
+            # Rotacionado ou removido entre o glob e o stat
+            continue
+    return [caminho for _, caminho in sorted(existentes)]
+
+
+def _remover_antigos(base: str):
+    """Apaga arquivos de outros processos sem gravação há mais de ARQUIVOS_PROCESSO_RETER_DIAS (workers que já saíram)"""
+    limite = time.time() - config.ARQUIVOS_PROCESSO_RETER_DIAS * 86400
+    proprio = caminho_do_processo(base).name
+    for caminho in caminhos_de_todos(base):
+        if caminho.name.startswith(proprio):
+            continue
+        try:
+            if caminho.stat().st_mtime < limite:
+                caminho.unlink()
+        except OSError:
+            continue
+
+
+def abrir_arquivo_do_processo(base: str, max_bytes: int, backups: int) -> RotatingFileHandler:
+    """Handler com rotação por tamanho no arquivo deste processo (só ele grava e rotaciona)"""
+    _remover_antigos(base)
+    handler = RotatingFileHandler(caminho_do_processo(base), maxBytes=max_bytes, backupCount=backups,
+                                  encoding='utf-8', delay=True)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
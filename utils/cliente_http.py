@@ -0,0 +1,278 @@
+"""
+Cliente HTTP instrumentado
+Ponto único das chamadas externas (SmartThings, n8n, Evolution API): mede contagem e latência
+por serviço, operação e status HTTP. Também grava as chamadas (requisição, resposta e latência)
+em arquivo e as reproduz sem rede, para repetir offline um problema de tempo visto em produção:
+
+    HTTP_FIXTURES_MODO=gravar python app.py
+    HTTP_FIXTURES_MODO=reproduzir HTTP_FIXTURES_ESCALA=10 python app.py   # latências 10x menores
+"""
+
+import atexit
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from typing import Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+import requests
+from requests.structures import CaseInsensitiveDict
+from utils.metricas import Contador, Histograma
+from utils.rastreamento import span
+import config
+
+
+REQUISICOES = Contador(
+    "apptvs_http_cliente_requisicoes_total",
+    "Requisições a APIs externas por serviço, operação e status HTTP (erro = sem resposta)",
+    ("servico", "operacao", "status")
+)
+LATENCIA = Histograma(
+    "apptvs_http_cliente_duracao_segundos",
+    "Latência das requisições a APIs externas",
+    ("servico", "operacao")
+)
+
+
+def _caminho(url: str, params=None) -> str:
+    """Caminho + query da URL (sem host: a gravação vale contra outro endereço, ex: o simulador)"""
+    partes = urlsplit(url)
+    query = partes.query
+    if params:
+        extra = urlencode(sorted(params.items()) if isinstance(params, dict) else params)
+        query = f"{query}&{extra}" if query else extra
+    return f"{partes.path}?{query}" if query else partes.path
+
+
+def _corpo(kwargs: Dict) -> str:
+    """Corpo da requisição em texto estável (json ordenado, campos de formulário/multipart)"""
+    if kwargs.get("json") is not None:
+        return json.dumps(kwargs["json"], sort_keys=True, ensure_ascii=False)
+    if kwargs.get("files"):
+        campos = {nome: valor[1] if isinstance(valor, tuple) and isinstance(valor[1], str) else "<arquivo>"
+                  for nome, valor in kwargs["files"].items()}
+        return json.dumps(campos, sort_keys=True, ensure_ascii=False)
+    dados = kwargs.get("data")
+    if dados is None:
+        return ""
+    if isinstance(dados, bytes):
+        return dados.decode("utf-8", "replace")
+    if isinstance(dados, dict):
+        return json.dumps(dados, sort_keys=True, ensure_ascii=False)
+    return str(dados)
+
+
+def _hash(corpo: str) -> str:
+    return hashlib.sha256(corpo.encode("utf-8")).hexdigest()
+
+
+def _corpo_gravado(corpo: str, hash_corpo: str):
+    """Corpo como vai para o arquivo: acima de HTTP_FIXTURES_CORPO_MAX, só o sha256 e o tamanho"""
+    tamanho = len(corpo.encode("utf-8"))
+    if tamanho > config.HTTP_FIXTURES_CORPO_MAX:
+        return {"sha256": hash_corpo, "tamanho": tamanho}
+    return corpo
+
+
+class Gravador:
+    """
+    Grava cada chamada externa em JSON lines (gzip se o arquivo terminar em .gz), sem cabeçalhos
+    Corpos de requisição grandes ficam só como hash: a reprodução compara o hash, não o corpo
+    """
+    
+    def __init__(self, arquivo: str, lote: int = 100, intervalo: float = 2.0):
+        self.arquivo = arquivo
+        self.lote = lote
+        self.intervalo = intervalo
+        self._inicio = time.monotonic()
+        self._pendentes: List[str] = []
+        self._ultima_gravacao = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def registrar(self, servico: str, operacao: str, metodo: str, url: str, kwargs: Dict, inicio: float,
+                  duracao: float, response: Optional[requests.Response] = None, erro: Optional[Exception] = None):
+        corpo = _corpo(kwargs)
+        hash_corpo = _hash(corpo)
+        entrada = {
+            "t": round(inicio - self._inicio, 3),
+            "servico": servico,
+            "operacao": operacao,
+            "metodo": metodo,
+            "caminho": _caminho(url, kwargs.get("params")),
+            "hash": hash_corpo,
+            "requisicao": _corpo_gravado(corpo, hash_corpo),
+            "duracao": round(duracao, 4)
+        }
+        if response is not None:
+            entrada.update(status=response.status_code, tipo=response.headers.get("Content-Type", ""),
+                           resposta=response.text)
+        else:
+            entrada.update(erro=type(erro).__name__, mensagem=str(erro))
+        
+        with self._lock:
+            self._pendentes.append(json.dumps(entrada, ensure_ascii=False))
+            if len(self._pendentes) >= self.lote or time.monotonic() - self._ultima_gravacao >= self.intervalo:
+                self._gravar_pendentes()
+    
+    def descarregar(self):
+        with self._lock:
+            self._gravar_pendentes()
+    
+    def _gravar_pendentes(self):
+        """Anexa o lote como um bloco completo (membro gzip) de uma vez: vários processos podem gravar juntos"""
+        self._ultima_gravacao = time.monotonic()
+        if not self._pendentes:
+            return
+        dados = ("\n".join(self._pendentes) + "\n").encode("utf-8")
+        self._pendentes = []
+        if self.arquivo.endswith(".gz"):
+            dados = gzip.compress(dados)
+        with open(self.arquivo, "ab") as f:
+            f.write(dados)
+
+
+def carregar_gravacao(arquivo: str) -> List[Dict]:
+    """Lê as chamadas gravadas (na ordem em que foram feitas)"""
+    abrir = gzip.open if arquivo.endswith(".gz") else open
+    with abrir(arquivo, "rt", encoding="utf-8") as f:
+        entradas = [json.loads(linha) for linha in f if linha.strip()]
+    return sorted(entradas, key=lambda entrada: entrada["t"])
+
+
+class Reprodutor:
+    """Responde às chamadas a partir de uma gravação, na ordem gravada e sem acessar a rede"""
+    
+    def __init__(self, arquivo: str, escala: float = 1.0):
+        self.arquivo = arquivo
+        self.escala = escala
+        self.entradas = carregar_gravacao(arquivo)
+        self._exatas = defaultdict(deque)  # (serviço, operação, método, caminho, hash do corpo) → índices
+        self._por_rota = defaultdict(deque)  # (serviço, operação, método, caminho) → índices
+        self._ultima: Dict[tuple, int] = {}
+        self._usadas = set()
+        self._lock = threading.Lock()
+        for i, entrada in enumerate(self.entradas):
+            rota = (entrada["servico"], entrada["operacao"], entrada["metodo"], entrada["caminho"])
+            self._exatas[rota + (entrada["hash"],)].append(i)
+            self._por_rota[rota].append(i)
+    
+    def _proxima(self, fila: deque) -> Optional[int]:
+        while fila and fila[0] in self._usadas:
+            fila.popleft()
+        return fila.popleft() if fila else None
+    
+    def _escolher(self, servico: str, operacao: str, metodo: str, url: str, kwargs: Dict) -> Dict:
+        """Mesma rota e mesmo corpo primeiro; senão a próxima da rota; esgotada, repete a última"""
+        rota = (servico, operacao, metodo, _caminho(url, kwargs.get("params")))
+        with self._lock:
+            indice = self._proxima(self._exatas[rota + (_hash(_corpo(kwargs)),)])
+            if indice is None:
+                indice = self._proxima(self._por_rota[rota])
+            if indice is None:
+                indice = self._ultima.get(rota)
+            if indice is None:
+                raise requests.exceptions.ConnectionError(f"Sem gravação para {metodo} {rota[3]} ({servico}.{operacao})")
+            self._usadas.add(indice)
+            self._ultima[rota] = indice
+        return self.entradas[indice]
+    
+    def responder(self, servico: str, operacao: str, metodo: str, url: str, kwargs: Dict) -> requests.Response:
+        entrada = self._escolher(servico, operacao, metodo, url, kwargs)
+        if self.escala > 0:
+            time.sleep(entrada["duracao"] / self.escala)
+        if "erro" in entrada:
+            excecao = getattr(requests.exceptions, entrada["erro"], requests.exceptions.RequestException)
+            raise excecao(entrada.get("mensagem", ""))
+        
+        response = requests.Response()
+        response.status_code = entrada["status"]
+        response._content = entrada.get("resposta", "").encode("utf-8")
+        response.headers = CaseInsensitiveDict({"Content-Type": entrada.get("tipo") or "application/json"})
+        response.encoding = "utf-8"
+        response.url = url
+        response.elapsed = timedelta(seconds=entrada["duracao"])
+        return response
+
+
+_gravador: Optional[Gravador] = None
+_reprodutor: Optional[Reprodutor] = None
+
+
+def gravar(arquivo: Optional[str] = None) -> Gravador:
+    """Passa a gravar todas as chamadas externas (desativa a reprodução)"""
+    global _gravador, _reprodutor
+    desativar()
+    _gravador = Gravador(arquivo or config.HTTP_FIXTURES_ARQUIVO)
+    return _gravador
+
+
+def reproduzir(arquivo: Optional[str] = None, escala: Optional[float] = None) -> Reprodutor:
+    """Passa a responder as chamadas externas a partir da gravação (escala divide as latências; 0 = sem espera)"""
+    global _gravador, _reprodutor
+    desativar()
+    _reprodutor = Reprodutor(arquivo or config.HTTP_FIXTURES_ARQUIVO,
+                             config.HTTP_FIXTURES_ESCALA if escala is None else escala)
+    return _reprodutor
+
+
+def desativar():
+    """Volta às chamadas reais sem gravação (grava o que estiver pendente)"""
+    global _gravador, _reprodutor
+    if _gravador is not None:
+        _gravador.descarregar()
+    _gravador = None
+    _reprodutor = None
+
+
+def _executar(servico: str, operacao: str, metodo: str, url: str, sessao, kwargs: Dict) -> requests.Response:
+    """Chamada real, gravada ou reproduzida conforme o modo ativo"""
+    reprodutor, gravador = _reprodutor, _gravador
+    if reprodutor is not None:
+        return reprodutor.responder(servico, operacao, metodo, url, kwargs)
+    if gravador is None:
+        return (sessao or requests).request(metodo, url, **kwargs)
+    
+    inicio = time.monotonic()
+    try:
+        response = (sessao or requests).request(metodo, url, **kwargs)
+    except Exception as e:
+        gravador.registrar(servico, operacao, metodo, url, kwargs, inicio, time.monotonic() - inicio, erro=e)
+        raise
+    gravador.registrar(servico, operacao, metodo, url, kwargs, inicio, time.monotonic() - inicio, response=response)
+    return response
+
+
+def requisitar(servico: str, operacao: str, metodo: str, url: str, sessao=None, **kwargs) -> requests.Response:
+    """Executa a requisição (com a sessão informada ou requests) e registra as métricas e o span"""
+    inicio = time.perf_counter()
+    status = "erro"
+    with span(f"http.{servico}", operacao=operacao, metodo=metodo) as atual:
+        try:
+            response = _executar(servico, operacao, metodo, url, sessao, kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            REQUISICOES.inc(servico=servico, operacao=operacao, status=status)
+            LATENCIA.observar(time.perf_counter() - inicio, servico=servico, operacao=operacao)
+            if atual:
+                atual.definir(status=status)
+
+
+def get(servico: str, operacao: str, url: str, **kwargs) -> requests.Response:
+    return requisitar(servico, operacao, "GET", url, **kwargs)
+
+
+def post(servico: str, operacao: str, url: str, **kwargs) -> requests.Response:
+    return requisitar(servico, operacao, "POST", url, **kwargs)
+
+
+if config.HTTP_FIXTURES_MODO == "gravar":
+    gravar()
+elif config.HTTP_FIXTURES_MODO == "reproduzir":
+    reproduzir()
+elif config.HTTP_FIXTURES_MODO:
+    raise ValueError(f"HTTP_FIXTURES_MODO inválido: {config.HTTP_FIXTURES_MODO} (use gravar, reproduzir ou vazio)")
+atexit.register(lambda: _gravador and _gravador.descarregar())
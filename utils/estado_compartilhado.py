@@ -0,0 +1,96 @@
+"""
+Estado compartilhado entre processos (workers do servidor WSGI)
+Chave/valor em SQLite local com expiração opcional por item
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+import config
+
+
+class EstadoCompartilhado:
+    """Armazena valores JSON por namespace/chave, visíveis para todos os workers"""
+    
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or config.ESTADO_DB
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        with self._lock, self._conn:
+            # WAL permite leituras de um worker enquanto outro escreve
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS estado (
+                    namespace TEXT NOT NULL,
+                    chave TEXT NOT NULL,
+                    valor TEXT NOT NULL,
+                    atualizado_em REAL NOT NULL,
+                    expira_em REAL,
+                    PRIMARY KEY (namespace, chave)
+                )
+            """)
+            self._conn.execute("DELETE FROM estado WHERE expira_em IS NOT NULL AND expira_em < ?", (time.time(),))
+    
+    def definir(self, namespace: str, chave: str, valor: Any, ttl: Optional[float] = None):
+        """Grava (ou substitui) um valor; com ttl, o valor expira após esse número de segundos"""
+        agora = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO estado (namespace, chave, valor, atualizado_em, expira_em) VALUES (?, ?, ?, ?, ?)",
+                (namespace, chave, json.dumps(valor), agora, agora + ttl if ttl else None)
+            )
+    
+    def reservar(self, namespace: str, chave: str, valor: Any, ttl: float) -> bool:
+        """Grava o valor só se a chave estiver livre (ausente ou expirada); retorna True se reservou"""
+        agora = time.time()
+        with self._lock, self._conn:
+            # O DELETE abre a transação de escrita: outro worker só testa a chave depois deste commit
+            self._conn.execute("DELETE FROM estado WHERE namespace = ? AND chave = ? AND expira_em < ?",
+                               (namespace, chave, agora))
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO estado (namespace, chave, valor, atualizado_em, expira_em) VALUES (?, ?, ?, ?, ?)",
+                (namespace, chave, json.dumps(valor), agora, agora + ttl)
+            )
+            return cursor.rowcount == 1
+    
+    def obter(self, namespace: str, chave: str, max_idade: Optional[float] = None) -> Any:
+        """Retorna o valor (ou None se ausente, expirado ou mais antigo que max_idade segundos)"""
+        agora = time.time()
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT valor, atualizado_em FROM estado WHERE namespace = ? AND chave = ? "
+                "AND (expira_em IS NULL OR expira_em >= ?)",
+                (namespace, chave, agora)
+            ).fetchone()
+        if linha is None or (max_idade is not None and agora - linha[1] > max_idade):
+            return None
+        return json.loads(linha[0])
+    
+    def remover(self, namespace: str, chave: str):
+        """Remove um valor"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM estado WHERE namespace = ? AND chave = ?", (namespace, chave))
+    
+    def listar(self, namespace: str) -> Dict[str, Any]:
+        """Retorna todos os valores válidos de um namespace"""
+        with self._lock:
+            linhas = self._conn.execute(
+                "SELECT chave, valor FROM estado WHERE namespace = ? AND (expira_em IS NULL OR expira_em >= ?)",
+                (namespace, time.time())
+            ).fetchall()
+        return {chave: json.loads(valor) for chave, valor in linhas}
+
+
+_estado: Optional[EstadoCompartilhado] = None
+_estado_lock = threading.Lock()
+
+
+def obter_estado() -> EstadoCompartilhado:
+    """Retorna o estado compartilhado do processo (criado na primeira chamada)"""
+    global _estado
+    with _estado_lock:
+        if _estado is None:
+            _estado = EstadoCompartilhado()
+        return _estado
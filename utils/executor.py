@@ -0,0 +1,29 @@
+"""
+Pool de threads compartilhado para tarefas em segundo plano
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+import config
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_pools: Dict[str, ThreadPoolExecutor] = {}
+
+
+def obter_executor() -> ThreadPoolExecutor:
+    """Retorna o pool compartilhado (criado na primeira chamada)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=config.EXECUTOR_WORKERS, thread_name_prefix="worker")
+        return _executor
+
+
+def obter_pool(nome: str, workers: int) -> ThreadPoolExecutor:
+    """Retorna um pool dedicado (criado na primeira chamada com este nome)"""
+    with _executor_lock:
+        if nome not in _pools:
+            _pools[nome] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=nome)
+        return _pools[nome]
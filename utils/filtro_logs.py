@@ -0,0 +1,105 @@
+"""
+Filtro de logs para tempestades de retry
+Mensagens idênticas dentro da janela viram uma única entrada contada; cada categoria
+(mensagem com os números trocados por #) tem seu token bucket. Nada é perdido em silêncio:
+os suprimidos geram entradas de resumo e ficam contados em obter_suprimidos().
+Usado apenas pela thread de gravação do logger.
+"""
+
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from utils.limitador import LimitadorTaxa
+import config
+
+
+_NUMEROS = re.compile(r"\d+")
+# Limite de categorias acompanhadas (as inativas são descartadas primeiro)
+MAX_CATEGORIAS = 500
+
+
+def categoria(mensagem: str) -> str:
+    """Modelo da mensagem: "✗ Tentativa 2/3 falhou: 409" → "✗ Tentativa #/# falhou: #" """
+    return _NUMEROS.sub("#", mensagem)[:160]
+
+
+class FiltroLogs:
+    """Decide quais registros são gravados e produz os resumos dos suprimidos"""
+    
+    def __init__(self, janela: float = None, taxa: float = None, rajada: int = None, niveis=None):
+        self.janela = janela if janela is not None else config.LOG_DEDUPE_JANELA
+        self.taxa = taxa if taxa is not None else config.LOG_CATEGORIA_TAXA
+        self.rajada = rajada if rajada is not None else config.LOG_CATEGORIA_RAJADA
+        self.niveis = set(niveis if niveis is not None else config.LOG_LIMITE_NIVEIS)
+        # (tipo, mensagem) → [início da janela, repetições suprimidas]
+        self._repetidas: Dict[Tuple[str, str], list] = {}
+        # (tipo, categoria) → [token bucket, último uso] e suprimidos por taxa desde o último resumo
+        self._buckets: Dict[Tuple[str, str], list] = {}
+        self._por_taxa: Dict[Tuple[str, str], int] = {}
+        self._ultimo_resumo_taxa = time.time()
+        # Totais desde o início do processo (lidos pela API em outra thread)
+        self._totais: Dict[Tuple[str, str], Dict] = {}
+        self._totais_lock = threading.Lock()
+    
+    def suprimir(self, instante: float, tipo: str, mensagem: str) -> Optional[str]:
+        """Motivo da supressão ("duplicado" ou "taxa", já contada) ou None se o registro deve ser gravado"""
+        # Separadores ("=====") não são agrupados
+        if tipo not in self.niveis or not any(c.isalnum() for c in mensagem):
+            return None
+        
+        chave = (tipo, mensagem)
+        repetida = self._repetidas.get(chave)
+        if repetida is not None and instante - repetida[0] < self.janela:
+            repetida[1] += 1
+            self._contar(tipo, mensagem, "duplicado")
+            return "duplicado"
+        self._repetidas[chave] = [instante, 0]
+        
+        chave_categoria = (tipo, categoria(mensagem))
+        bucket = self._buckets.get(chave_categoria)
+        if bucket is None:
+            bucket = self._buckets[chave_categoria] = [LimitadorTaxa(self.taxa, self.rajada), instante]
+        bucket[1] = instante
+        if not bucket[0].tentar():
+            self._por_taxa[chave_categoria] = self._por_taxa.get(chave_categoria, 0) + 1
+            self._contar(tipo, mensagem, "taxa")
+            return "taxa"
+        return None
+    
+    def resumos(self, instante: float) -> List[Tuple[str, str]]:
+        """Entradas (tipo, mensagem) com os suprimidos das janelas encerradas"""
+        resumos = []
+        for chave in [c for c, (inicio, _) in self._repetidas.items() if instante - inicio >= self.janela]:
+            inicio, repeticoes = self._repetidas.pop(chave)
+            if repeticoes:
+                tipo, mensagem = chave
+                resumos.append((tipo, f"[LOGGER] Repetida {repeticoes}x nos últimos {self.janela:.0f}s: {mensagem}"))
+        
+        if instante - self._ultimo_resumo_taxa >= self.janela:
+            self._ultimo_resumo_taxa = instante
+            for (tipo, modelo), quantidade in self._por_taxa.items():
+                resumos.append((tipo, f"[LOGGER] {quantidade} log(s) suprimido(s) por limite de taxa: {modelo}"))
+            self._por_taxa.clear()
+            # Bucket parado tempo suficiente para encher de novo equivale a um bucket novo
+            if len(self._buckets) > MAX_CATEGORIAS:
+                cheio = self.rajada / self.taxa
+                self._buckets = {c: b for c, b in self._buckets.items() if instante - b[1] < cheio}
+        return resumos
+    
+    def _contar(self, tipo: str, mensagem: str, motivo: str):
+        """Acumula o total de suprimidos por categoria"""
+        chave = (tipo, categoria(mensagem))
+        with self._totais_lock:
+            total = self._totais.get(chave)
+            if total is None:
+                if len(self._totais) >= MAX_CATEGORIAS:
+                    self._totais.pop(next(iter(self._totais)))
+                total = self._totais[chave] = {"tipo": tipo, "categoria": chave[1], "duplicado": 0, "taxa": 0}
+            total[motivo] += 1
+    
+    def obter_suprimidos(self) -> List[Dict]:
+        """Totais de suprimidos por categoria (maiores primeiro)"""
+        with self._totais_lock:
+            totais = [dict(t) for t in self._totais.values()]
+        return sorted(totais, key=lambda t: t["duplicado"] + t["taxa"], reverse=True)
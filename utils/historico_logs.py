@@ -0,0 +1,250 @@
+"""
+Histórico persistente de logs (SQLite + FTS5)
+Recebe os lotes da thread de gravação do logger; indexado por horário, nível e origem
+(prefixo "[...]" da mensagem: nome da TV ou módulo), com busca de texto completo.
+O tamanho do banco é limitado: ao passar de LOG_DB_MAX_MB, os registros mais antigos são apagados.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import config
+
+
+# "[TI01] Ligando TV..." → "TI01"; "[WEBHOOK-OUTBOX] ..." → "WEBHOOK-OUTBOX"
+_ORIGEM = re.compile(r"^\s*\[([^\]]{1,60})\]")
+# Fração dos registros apagada de uma vez quando o limite de tamanho é atingido
+FRACAO_LIMPEZA = 0.1
+
+
+def para_instante(texto: str) -> float:
+    """Converte "YYYY-MM-DD HH:MM:SS" (ou só a data, ou sem segundos) em epoch; lança ValueError se inválido"""
+    for formato in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(texto.strip(), formato).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"Data inválida: {texto}. Use YYYY-MM-DD HH:MM:SS")
+
+
+def extrair_origem(mensagem: str) -> Optional[str]:
+    """Prefixo entre colchetes da mensagem (nome da TV ou módulo)"""
+    encontrado = _ORIGEM.match(mensagem)
+    return encontrado.group(1).strip() if encontrado else None
+
+
+class HistoricoLogs:
+    """Armazena e busca logs em SQLite (escritas em lote, uma transação por lote)"""
+    
+    def __init__(self, db_path: Optional[str] = None, max_mb: Optional[float] = None):
+        self.db_path = db_path or config.LOG_DB
+        self.max_bytes = (max_mb or config.LOG_DB_MAX_MB) * 1024 * 1024
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    instante REAL NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    tipo TEXT NOT NULL,
+                    origem TEXT,
+                    mensagem TEXT NOT NULL,
+                    trace_id TEXT,
+                    pid INTEGER
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_instante ON logs (instante)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_tipo ON logs (tipo, instante)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_origem ON logs (origem, instante)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_trace ON logs (trace_id)")
+            self.fts = self._criar_fts()
+    
+    def _criar_fts(self) -> bool:
+        """Índice de texto completo sincronizado por triggers (sem FTS5, a busca usa LIKE)"""
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(mensagem, content='logs', content_rowid='id')"
+            )
+        except sqlite3.OperationalError:
+            return False
+        self._conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS logs_ai AFTER INSERT ON logs BEGIN
+                INSERT INTO logs_fts (rowid, mensagem) VALUES (new.id, new.mensagem);
+            END
+        """)
+        self._conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS logs_ad AFTER DELETE ON logs BEGIN
+                INSERT INTO logs_fts (logs_fts, rowid, mensagem) VALUES ('delete', old.id, old.mensagem);
+            END
+        """)
+        return True
+    
+    def gravar(self, entradas: List[Tuple[float, Dict]]):
+        """Grava um lote de (instante, entrada do logger) e aplica o limite de tamanho"""
+        pid = os.getpid()
+        linhas = [(
+            instante, e["timestamp"], e["tipo"], extrair_origem(e["mensagem"]), e["mensagem"], e.get("trace_id"), pid
+        ) for instante, e in entradas]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO logs (instante, timestamp, tipo, origem, mensagem, trace_id, pid) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                linhas
+            )
+            self._aplicar_retencao()
+    
+    def _aplicar_retencao(self):
+        """Apaga os registros mais antigos se as páginas em uso passarem do limite (chamar com o lock)"""
+        paginas = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        livres = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        tamanho_pagina = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        if (paginas - livres) * tamanho_pagina <= self.max_bytes:
+            return
+        # As páginas liberadas são reaproveitadas pelos próximos inserts: o arquivo para de crescer
+        total, menor_id = self._conn.execute("SELECT COUNT(*), MIN(id) FROM logs").fetchone()
+        self._conn.execute("DELETE FROM logs WHERE id < ?", (menor_id + max(1, int(total * FRACAO_LIMPEZA)),))
+    
+    def _consulta_texto(self, texto: str) -> str:
+        """Converte o texto digitado em termos FTS5 entre aspas (todos obrigatórios; '*' no fim = prefixo)"""
+        termos = []
+        for termo in texto.split():
+            prefixo = termo.endswith("*") and len(termo) > 1
+            termo = termo.rstrip("*").replace('"', '""')
+            if termo:
+                termos.append(f'"{termo}"' + ("*" if prefixo else ""))
+        return " ".join(termos)
+    
+    def buscar(self, texto: Optional[str] = None, tipos=None, origem: Optional[str] = None,
+               inicio: Optional[str] = None, fim: Optional[str] = None, trace: Optional[str] = None,
+               antes_de: Optional[int] = None, limite: int = 50) -> Dict:
+        """
+        Busca paginada (mais recentes primeiro)
+        
+        Args:
+            texto: Palavras que devem aparecer na mensagem
+            tipos: Níveis aceitos (ex: {"ERROR", "WARNING"})
+            origem: Nome da TV ou módulo (prefixo [..] da mensagem, sem diferenciar maiúsculas)
+            inicio/fim: Faixa de horário "YYYY-MM-DD HH:MM:SS" (lança ValueError se inválida)
+            antes_de: Cursor da página (id do último log da página anterior)
+        """
+        condicoes, parametros = [], []
+        if texto and texto.strip():
+            if self.fts:
+                condicoes.append("logs.id IN (SELECT rowid FROM logs_fts WHERE logs_fts MATCH ?)")
+                parametros.append(self._consulta_texto(texto))
+            else:
+                for termo in texto.split():
+                    condicoes.append("logs.mensagem LIKE ?")
+                    parametros.append(f"%{termo.rstrip('*')}%")
+        if tipos:
+            condicoes.append(f"logs.tipo IN ({','.join('?' * len(tipos))})")
+            parametros.extend(tipos)
+        if origem:
+            condicoes.append("logs.origem = ? COLLATE NOCASE")
+            parametros.append(origem)
+        if inicio:
+            condicoes.append("logs.instante >= ?")
+            parametros.append(para_instante(inicio))
+        if fim:
+            condicoes.append("logs.instante <= ?")
+            parametros.append(para_instante(fim))
+        if trace:
+            condicoes.append("logs.trace_id = ?")
+            parametros.append(trace)
+        if antes_de:
+            condicoes.append("logs.id < ?")
+            parametros.append(antes_de)
+        
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        with self._lock:
+            linhas = self._conn.execute(
+                f"SELECT id, timestamp, tipo, origem, mensagem, trace_id, pid FROM logs {where} "
+                f"ORDER BY logs.id DESC LIMIT ?",
+                (*parametros, limite + 1)
+            ).fetchall()
+        
+        logs = [{
+            "id": id_, "timestamp": timestamp, "tipo": tipo, "origem": origem_, "mensagem": mensagem,
+            "trace_id": trace_id, "pid": pid
+        } for id_, timestamp, tipo, origem_, mensagem, trace_id, pid in linhas[:limite]]
+        return {
+            "logs": logs,
+            # Há mais resultados: a próxima página começa antes do último id retornado
+            "proximo_cursor": logs[-1]["id"] if len(linhas) > limite else None
+        }
+    
+    def ultimo_id(self) -> int:
+        """Id do log mais recente (cursor comum a todos os workers)"""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM logs").fetchone()[0]
+    
+    def recentes(self, desde: int = 0, tipos=None, tv: Optional[str] = None, inicio: Optional[str] = None,
+                 fim: Optional[str] = None, trace: Optional[str] = None, limite: int = 500) -> List[Dict]:
+        """
+        Logs com id > desde, em ordem de emissão (os `limite` mais recentes), de todos os workers
+        
+        Args:
+            tv: Trecho do nome da TV na mensagem (sem diferenciar maiúsculas)
+            inicio/fim: Faixa de horário "YYYY-MM-DD HH:MM:SS" (comparada como texto)
+        """
+        condicoes, parametros = ["id > ?"], [desde]
+        if tipos:
+            condicoes.append(f"tipo IN ({','.join('?' * len(tipos))})")
+            parametros.extend(tipos)
+        if tv:
+            condicoes.append("mensagem LIKE ?")
+            parametros.append(f"%{tv}%")
+        if inicio:
+            condicoes.append("timestamp >= ?")
+            parametros.append(inicio)
+        if fim:
+            condicoes.append("timestamp <= ?")
+            parametros.append(fim)
+        if trace:
+            condicoes.append("trace_id = ?")
+            parametros.append(trace)
+        
+        with self._lock:
+            linhas = self._conn.execute(
+                f"SELECT id, timestamp, tipo, mensagem, trace_id, pid FROM logs WHERE {' AND '.join(condicoes)} "
+                f"ORDER BY id DESC LIMIT ?",
+                (*parametros, limite)
+            ).fetchall()
+        
+        logs = []
+        for id_, timestamp, tipo, mensagem, trace_id, pid in reversed(linhas):
+            entrada = {"seq": id_, "timestamp": timestamp, "tipo": tipo, "mensagem": mensagem, "pid": pid}
+            if trace_id:
+                entrada["trace_id"] = trace_id
+            logs.append(entrada)
+        return logs
+
+
+_historico: Optional[HistoricoLogs] = None
+_historico_lock = threading.Lock()
+
+
+def obter_historico() -> Optional[HistoricoLogs]:
+    """Retorna o histórico do processo (None se LOG_DB estiver vazio)"""
+    global _historico
+    if not config.LOG_DB:
+        return None
+    with _historico_lock:
+        if _historico is None:
+            _historico = HistoricoLogs()
+        return _historico
+
+
+def _reiniciar_apos_fork():
+    """A conexão SQLite não pode ser herdada pelo processo filho"""
+    global _historico, _historico_lock
+    _historico = None
+    _historico_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_apos_fork)
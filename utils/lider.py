@@ -0,0 +1,77 @@
+"""
+Eleição de líder entre workers por trava de arquivo do sistema operacional
+Apenas o processo que detém a trava executa os agendamentos; se ele morrer,
+o SO libera a trava e outro worker assume na próxima tentativa.
+"""
+
+import os
+import threading
+from typing import Callable, Optional
+from utils import log
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class EleicaoLider:
+    """Tenta periodicamente obter a trava exclusiva; ao conseguir, chama ao_assumir uma vez"""
+    
+    def __init__(self, arquivo: str, ao_assumir: Callable, intervalo: float = 5):
+        self.arquivo = arquivo
+        self.ao_assumir = ao_assumir
+        self.intervalo = intervalo
+        self._fd: Optional[int] = None
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def e_lider(self) -> bool:
+        """True se este processo detém a trava"""
+        return self._fd is not None
+    
+    def _tentar_travar(self) -> bool:
+        """Tenta obter a trava sem bloquear; o descritor fica aberto enquanto o processo for líder"""
+        fd = os.open(self.arquivo, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            return False
+        
+        # Registra o PID do líder (apenas informativo)
+        os.ftruncate(fd, 0)
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+    
+    def _loop(self):
+        """Tenta assumir a liderança até conseguir"""
+        while not self._parar.is_set():
+            try:
+                if self._tentar_travar():
+                    log(f"[LIDER] Worker {os.getpid()} assumiu os agendamentos", "SUCCESS")
+                    self.ao_assumir()
+                    return
+            except Exception as e:
+                log(f"[LIDER] Erro na eleição de líder: {e}", "ERROR")
+            self._parar.wait(self.intervalo)
+    
+    def iniciar(self):
+        """Inicia a eleição em segundo plano (a primeira tentativa é imediata)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+    
+    def parar(self):
+        """Encerra a eleição e libera a trava, se detida"""
+        self._parar.set()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,156 @@
+"""
+Limitador de taxa (token bucket) compartilhado entre threads
+LimitadorCompartilhado guarda o balde no SQLite e vale para todos os workers juntos
+(cada worker retira vagas em lotes pequenos e as gasta localmente)
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Optional
+import config
+
+
+class LimitadorTaxa:
+    """Libera no máximo `taxa` requisições por segundo, com rajadas de até `rajada`"""
+    
+    def __init__(self, taxa: float, rajada: int):
+        self.taxa = taxa
+        self.rajada = rajada
+        self._tokens = float(rajada)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+        self.total_esperas = 0
+        self.tempo_espera_total = 0.0
+    
+    def aguardar(self) -> float:
+        """Reserva uma vaga e dorme até ela estar disponível; retorna o tempo esperado"""
+        with self._lock:
+            agora = time.monotonic()
+            self._tokens = min(self.rajada, self._tokens + (agora - self._ultimo) * self.taxa)
+            self._ultimo = agora
+            self._tokens -= 1
+            espera = -self._tokens / self.taxa if self._tokens < 0 else 0.0
+            if espera > 0:
+                self.total_esperas += 1
+                self.tempo_espera_total += espera
+        
+        if espera > 0:
+            time.sleep(espera)
+        return espera
+    
+    def tentar(self) -> bool:
+        """Consome uma vaga se houver uma disponível agora (sem esperar)"""
+        with self._lock:
+            agora = time.monotonic()
+            self._tokens = min(self.rajada, self._tokens + (agora - self._ultimo) * self.taxa)
+            self._ultimo = agora
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class LimitadorCompartilhado:
+    """
+    Token bucket no SQLite do estado compartilhado: a cota vale para todos os workers juntos
+    (um LimitadorTaxa por processo multiplicaria a cota por WEB_WORKERS)
+    Cada transação retira até `lote` vagas, gastas localmente sem tocar no SQLite; as que sobram
+    valem só pelo tempo que o balde leva para repor o lote (não acumulam rajadas além da cota)
+    """
+    
+    def __init__(self, nome: str, taxa: float, rajada: int, db_path: Optional[str] = None,
+                 lote: Optional[int] = None):
+        self.nome = nome
+        self.taxa = taxa
+        self.rajada = rajada
+        self.db_path = db_path
+        # Padrão: a rajada dividida entre os workers (um worker sozinho ainda usa a rajada inteira em lotes)
+        self.lote = lote or max(1, rajada // config.WEB_WORKERS)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._locais = 0
+        self._locais_validade = 0.0
+        self.total_esperas = 0
+        self.tempo_espera_total = 0.0
+    
+    def _conexao(self) -> sqlite3.Connection:
+        """Abre a conexão na primeira chamada (chamar com o lock adquirido)"""
+        if self._conn is None:
+            # Autocommit: as transações são abertas explicitamente com BEGIN IMMEDIATE
+            self._conn = sqlite3.connect(self.db_path or config.ESTADO_DB, timeout=10,
+                                         check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS limitador (nome TEXT PRIMARY KEY, tokens REAL NOT NULL, ultimo REAL NOT NULL)"
+            )
+        return self._conn
+    
+    def _consumir(self, esperar: bool) -> Optional[float]:
+        """
+        Consome uma vaga do lote local ou, se acabou, retira um novo lote em uma única transação
+        de escrita (serializada entre os workers)
+        Retorna a espera necessária, ou None se não havia vaga e esperar=False
+        """
+        with self._lock:
+            if self._locais and time.monotonic() < self._locais_validade:
+                self._locais -= 1
+                return 0.0
+            self._locais = 0
+            
+            conn = self._conexao()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                agora = time.time()
+                linha = conn.execute("SELECT tokens, ultimo FROM limitador WHERE nome = ?", (self.nome,)).fetchone()
+                if linha is None:
+                    tokens = float(self.rajada)
+                else:
+                    tokens = min(self.rajada, linha[0] + max(0.0, agora - linha[1]) * self.taxa)
+                if tokens >= 1:
+                    retiradas = min(self.lote, int(tokens))
+                    tokens -= retiradas
+                elif not esperar:
+                    conn.execute("ROLLBACK")
+                    return None
+                else:
+                    retiradas = 0
+                    tokens -= 1
+                conn.execute("INSERT OR REPLACE INTO limitador (nome, tokens, ultimo) VALUES (?, ?, ?)",
+                             (self.nome, tokens, agora))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            
+            if retiradas > 1:
+                # Uma vaga é usada agora; as demais ficam no lote local
+                self._locais = retiradas - 1
+                self._locais_validade = time.monotonic() + retiradas / self.taxa
+            espera = -tokens / self.taxa if tokens < 0 else 0.0
+            if espera > 0:
+                self.total_esperas += 1
+                self.tempo_espera_total += espera
+            return espera
+    
+    def aguardar(self) -> float:
+        """Reserva uma vaga e dorme até ela estar disponível; retorna o tempo esperado"""
+        try:
+            espera = self._consumir(esperar=True)
+        except sqlite3.Error as e:
+            from utils.logger import log  # utils.logger importa este módulo (filtro de logs)
+            # Banco indisponível: não trava os comandos (a API ainda responde 429 se a cota estourar)
+            log(f"[LIMITADOR] {self.nome}: erro no estado compartilhado ({e}) - seguindo sem esperar", "WARNING")
+            return 0.0
+        if espera > 0:
+            time.sleep(espera)
+        return espera
+    
+    def tentar(self) -> bool:
+        """Consome uma vaga se houver uma disponível agora (sem esperar)"""
+        try:
+            return self._consumir(esperar=False) is not None
+        except sqlite3.Error as e:
+            from utils.logger import log
+            log(f"[LIMITADOR] {self.nome}: erro no estado compartilhado ({e})", "WARNING")
+            return True
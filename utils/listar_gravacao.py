@@ -0,0 +1,46 @@
+"""
+Script para resumir uma gravação de chamadas externas (HTTP_FIXTURES_MODO=gravar)
+
+    python utils/listar_gravacao.py                 # arquivo de config.HTTP_FIXTURES_ARQUIVO
+    python utils/listar_gravacao.py <arquivo> -v    # também a linha do tempo de cada chamada
+"""
+import sys
+import os
+from collections import defaultdict
+
+# Adiciona o diretório pai ao path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.cliente_http import carregar_gravacao
+import config
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+if __name__ == "__main__":
+    argumentos = [a for a in sys.argv[1:] if a != "-v"]
+    arquivo = argumentos[0] if argumentos else config.HTTP_FIXTURES_ARQUIVO
+    if not os.path.exists(arquivo):
+        print(f"❌ Gravação não encontrada: {arquivo}")
+        sys.exit(1)
+    
+    entradas = carregar_gravacao(arquivo)
+    grupos = defaultdict(list)
+    for entrada in entradas:
+        grupos[(entrada["servico"], entrada["operacao"], str(entrada.get("status", entrada.get("erro"))))].append(entrada["duracao"])
+    
+    duracao = entradas[-1]["t"] + entradas[-1]["duracao"] if entradas else 0
+    print(f"{len(entradas)} chamadas em {duracao:.1f}s ({os.path.getsize(arquivo) / 1024:.1f} KB)\n")
+    print(f"{'serviço':<12} {'operação':<32} {'status':<16} {'qtd':>5} {'p50':>8} {'p95':>8} {'máx':>8}")
+    for (servico, operacao, status), duracoes in sorted(grupos.items()):
+        print(f"{servico:<12} {operacao:<32} {status:<16} {len(duracoes):>5} {_percentil(duracoes, 0.5):>7.3f}s "
+              f"{_percentil(duracoes, 0.95):>7.3f}s {max(duracoes):>7.3f}s")
+    
+    if "-v" in sys.argv:
+        print()
+        for entrada in entradas:
+            chamada = f"{entrada['servico']}.{entrada['operacao']}"
+            print(f"{entrada['t']:>9.3f}s  +{entrada['duracao']:.3f}s  {chamada:<40} "
+                  f"{entrada.get('status', entrada.get('erro'))}  {entrada['metodo']} {entrada['caminho']}")
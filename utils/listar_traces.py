@@ -0,0 +1,24 @@
+"""
+Script para listar os traces gravados ou exportar um trace para a UI do Zipkin
+
+    python utils/listar_traces.py              # traces recentes
+    python utils/listar_traces.py <trace_id>   # JSON do trace (Zipkin → Upload JSON)
+"""
+import json
+import sys
+import os
+
+# Adiciona o diretório pai ao path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.rastreamento import carregar_trace, listar_traces
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        print(json.dumps(carregar_trace(sys.argv[1]), ensure_ascii=False, indent=2))
+    else:
+        traces = listar_traces()
+        if not traces:
+            print("❌ Nenhum trace gravado.")
+        for trace in traces:
+            print(f"{trace['trace_id']}  {trace['inicio']}  {trace['duracao_segundos']:>8}s  {trace['nome']}")
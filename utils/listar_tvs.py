@@ -8,11 +8,11 @@ import os
 
 # Adiciona o diretório pai ao path para importar config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import ACCESS_TOKEN
+from config import ACCESS_TOKEN, SMARTTHINGS_API_URL
 
 def listar_dispositivos():
     """Lista todos os dispositivos da conta SmartThings"""
-    url = "https://api.smartthings.com/v1/devices"
+    url = f"{SMARTTHINGS_API_URL}/devices"
     headers = {
         "Authorization": f"Bearer {ACCESS_TOKEN}",
         "Content-Type": "application/json"
@@ -1,25 +1,260 @@
 """
 Sistema de logging para o controle de TVs
+log() apenas enfileira um registro compacto; uma thread de gravação formata os registros em lote,
+adiciona ao buffer em memória, escreve no stdout, no arquivo JSON lines do worker (com rotação)
+e no histórico SQLite (/api/logs/search). Com o histórico ativo, /api/logs e o painel leem dele
+(logs de todos os workers, com o id como cursor); sem ele, do buffer deste processo.
 """
 
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
 import threading
-from datetime import datetime
+import time
+from contextlib import contextmanager
 from collections import deque
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+from utils.rastreamento import ids_atuais
+from utils.arquivo_processo import abrir_arquivo_do_processo
+from utils.metricas import Contador, Medidor
+from utils.historico_logs import obter_historico
+from utils.filtro_logs import FiltroLogs
+from utils.estado_compartilhado import obter_estado
+import config
 
 # Sistema de logs
 LOGS = deque(maxlen=500)  # Mantém os últimos 500 logs
 LOGS_LOCK = threading.Lock()
+_local = threading.local()
+_seq = itertools.count(1)  # Número sequencial de cada log (cursor para buscar apenas os novos)
+_ultimo_seq = 0
+
+# Fila de registros (instante, tipo, mensagem, ids do trace, silent) aguardando a thread de gravação
+_fila: queue.Queue = queue.Queue(maxsize=config.LOG_FILA_MAX)
+_escritor: Optional[threading.Thread] = None
+_escritor_lock = threading.Lock()
+_arquivo: Optional[RotatingFileHandler] = None
+# Agrupa repetições e limita a taxa por categoria (tempestades de retry)
+_filtro = FiltroLogs()
+
+DESCARTADOS = Contador("apptvs_logs_descartados_total", "Logs descartados com a fila de gravação cheia")
+SUPRIMIDOS = Contador("apptvs_logs_suprimidos_total", "Logs agrupados (duplicado) ou limitados (taxa) pelo filtro",
+                      ("motivo", "nivel"))
+Medidor("apptvs_logs_fila", "Logs aguardando a thread de gravação", lambda: _fila.qsize())
+
+
+@contextmanager
+def logs_silenciados():
+    """Descarta os logs emitidos pela thread atual (ex: simulação de sequências)"""
+    anterior = getattr(_local, 'silenciado', False)
+    _local.silenciado = True
+    try:
+        yield
+    finally:
+        _local.silenciado = anterior
 
 
 def log(mensagem, tipo="INFO", silent=False):
-    """Adiciona uma mensagem ao log com timestamp"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = {
-        "timestamp": timestamp,
-        "tipo": tipo,
-        "mensagem": mensagem
-    }
+    """Enfileira uma mensagem de log (não bloqueia em I/O)"""
+    if getattr(_local, 'silenciado', False):
+        return
+    if _escritor is None:
+        _iniciar_escritor()
+    try:
+        # Correlação com o trace em andamento (job de frota → sequência da TV → comando)
+        _fila.put_nowait((time.time(), tipo, mensagem, ids_atuais(), silent))
+    except queue.Full:
+        DESCARTADOS.inc()
+
+
+def descarregar_logs(timeout: float = 5) -> bool:
+    """Aguarda a gravação de tudo que foi enfileirado até agora (ex: antes de encerrar o processo)"""
+    if _escritor is None:
+        return True
+    gravado = threading.Event()
+    try:
+        _fila.put(gravado, timeout=timeout)
+    except queue.Full:
+        return False
+    return gravado.wait(timeout)
+
+
+def obter_logs_suprimidos():
+    """Totais de logs suprimidos por categoria neste processo"""
+    return _filtro.obter_suprimidos()
+
+
+def _iniciar_escritor():
+    """Inicia a thread de gravação (uma por processo)"""
+    global _escritor
+    with _escritor_lock:
+        if _escritor is None:
+            _escritor = threading.Thread(target=_loop_escritor, name="logger", daemon=True)
+            _escritor.start()
+
+
+def _reiniciar_apos_fork():
+    """No processo filho, a thread de gravação do pai não existe: começa do zero"""
+    global _fila, _escritor, _escritor_lock, _arquivo, _filtro
+    _fila = queue.Queue(maxsize=config.LOG_FILA_MAX)
+    _escritor = None
+    _escritor_lock = threading.Lock()
+    _arquivo = None
+    _filtro = FiltroLogs()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_apos_fork)
+atexit.register(descarregar_logs, 2)
+
+
+def _loop_escritor():
+    """Retira da fila tudo o que já chegou (até LOG_LOTE_MAX) e grava de uma vez"""
+    while True:
+        # Acorda ao menos a cada segundo para emitir os resumos de repetições encerradas
+        lote = []
+        try:
+            lote.append(_fila.get(timeout=1))
+            while len(lote) < config.LOG_LOTE_MAX:
+                lote.append(_fila.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            _gravar_lote(lote)
+        except Exception as e:
+            print(f"[LOGGER] Erro ao gravar logs: {e}", flush=True)
+        for item in lote:
+            if isinstance(item, threading.Event):
+                item.set()
+
+
+_cache_segundo = None
+_cache_texto = ""
+
+
+def _formatar_instante(instante: float) -> str:
+    """strftime só uma vez por segundo (chamado apenas pela thread de gravação)"""
+    global _cache_segundo, _cache_texto
+    segundo = int(instante)
+    if segundo != _cache_segundo:
+        _cache_segundo = segundo
+        _cache_texto = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(segundo))
+    return _cache_texto
+
+
+def _gravar_lote(lote):
+    """Buffer em memória, stdout, arquivo e histórico pesquisável para um lote de registros"""
+    global _ultimo_seq, _arquivo
+    entradas = []
+    for item in lote:
+        if isinstance(item, threading.Event):
+            continue
+        instante, tipo, mensagem, ids, silent = item
+        motivo = _filtro.suprimir(instante, tipo, mensagem)
+        if motivo:
+            SUPRIMIDOS.inc(motivo=motivo, nivel=tipo)
+            continue
+        log_entry = {
+            "timestamp": _formatar_instante(instante),
+            "tipo": tipo,
+            "mensagem": mensagem
+        }
+        if ids:
+            log_entry["trace_id"], log_entry["span_id"] = ids
+        entradas.append((log_entry, silent, instante))
+    
+    agora = time.time()
+    for tipo, mensagem in _filtro.resumos(agora):
+        entradas.append(({"timestamp": _formatar_instante(agora), "tipo": tipo, "mensagem": mensagem}, False, agora))
+    if not entradas:
+        return
+    
+    with LOGS_LOCK:
+        for log_entry, _, _ in entradas:
+            log_entry["seq"] = _ultimo_seq = next(_seq)
+            LOGS.append(log_entry)
+    
+    texto = "".join(f"[{e['timestamp']}] [{e['tipo']}] {e['mensagem']}\n" for e, silent, _ in entradas if not silent)
+    if texto:
+        print(texto, end="", flush=True)
+    
+    if config.LOG_ARQUIVO:
+        if _arquivo is None:
+            # Um arquivo por worker (logs.<pid>.jsonl): a rotação não é segura entre processos
+            _arquivo = abrir_arquivo_do_processo(config.LOG_ARQUIVO, config.LOG_MAX_BYTES, config.LOG_BACKUPS)
+        pid = os.getpid()
+        linhas = "\n".join(json.dumps({**e, "pid": pid}, ensure_ascii=False) for e, _, _ in entradas)
+        _arquivo.handle(logging.makeLogRecord({"msg": linhas}))
+    
+    historico = obter_historico()
+    if historico is not None:
+        historico.gravar([(instante, e) for e, _, instante in entradas])
+
+
+def consultar_logs(desde: int = 0, tipos=None, tv: Optional[str] = None,
+                   inicio: Optional[str] = None, fim: Optional[str] = None, limite: Optional[int] = None,
+                   trace: Optional[str] = None):
+    """
+    Retorna os logs com seq > desde e o último seq emitido
+    Com o histórico SQLite, o seq é o id do logs.db (mesmo cursor em todos os workers)
+    
+    Args:
+        tipos: Níveis aceitos (ex: {"ERROR", "WARNING"})
+        tv: Trecho do nome da TV na mensagem (sem diferenciar maiúsculas)
+        inicio/fim: Faixa de horário "YYYY-MM-DD HH:MM:SS" (comparada como texto)
+        limite: Máximo de logs retornados (os mais recentes)
+        trace: Apenas logs emitidos dentro deste trace
+    """
+    historico = obter_historico()
+    if historico is not None:
+        # Logs limpos pelo painel continuam no histórico, mas não voltam a aparecer
+        desde = max(desde, obter_estado().obter("logs", "limpos_ate") or 0)
+        novos = historico.recentes(desde, tipos, tv, inicio, fim, trace, limite or LOGS.maxlen)
+        return novos, historico.ultimo_id()
+    
+    novos = []
+    with LOGS_LOCK:
+        ultimo = _ultimo_seq
+        # Os seqs são crescentes: percorre do fim até alcançar o cursor
+        for entrada in reversed(LOGS):
+            if entrada["seq"] <= desde:
+                break
+            novos.append(entrada)
+    novos.reverse()
+    
+    if tipos:
+        novos = [e for e in novos if e["tipo"] in tipos]
+    if tv:
+        tv = tv.lower()
+        novos = [e for e in novos if tv in e["mensagem"].lower()]
+    if inicio:
+        novos = [e for e in novos if e["timestamp"] >= inicio]
+    if fim:
+        novos = [e for e in novos if e["timestamp"] <= fim]
+    if trace:
+        novos = [e for e in novos if e.get("trace_id") == trace]
+    if limite:
+        novos = novos[-limite:]
+    return novos, ultimo
+
+
+def ultimo_seq_logs() -> int:
+    """Seq do log mais recente (muda a cada novo log, em qualquer worker se o histórico estiver ativo)"""
+    historico = obter_historico()
+    if historico is not None:
+        return historico.ultimo_id()
+    with LOGS_LOCK:
+        return LOGS[-1]["seq"] if LOGS else 0
+
+
+def limpar_logs():
+    """Esconde os logs emitidos até agora do painel (o histórico pesquisável é mantido)"""
     with LOGS_LOCK:
-        LOGS.append(log_entry)
-    if not silent:
-        print(f"[{timestamp}] [{tipo}] {mensagem}", flush=True)
+        LOGS.clear()
+    historico = obter_historico()
+    if historico is not None:
+        obter_estado().definir("logs", "limpos_ate", historico.ultimo_id())
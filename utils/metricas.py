@@ -0,0 +1,225 @@
+"""
+Métricas no formato de exposição do Prometheus (texto)
+Registro em memória, sem dependências: contadores, histogramas e medidores calculados na coleta.
+Cada observação custa um lock e uma atualização de dicionário; os valores são por processo.
+Cada worker publica suas séries no estado compartilhado (rótulo worker="<pid>") e /metrics, em qualquer
+worker, devolve as séries de todos: some com `sum without (worker) (...)` no Prometheus.
+"""
+
+import bisect
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import config
+
+
+# Buckets de latência (segundos): de chamadas locais a sequências longas de comandos
+BUCKETS_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+LE_INF = 'le="+Inf"'
+
+_registro: List["_Metrica"] = []
+_registro_lock = threading.Lock()
+_publicador: Optional[threading.Thread] = None
+
+
+def _escapar(valor) -> str:
+    """Escapa um valor de rótulo (barra invertida, aspas e quebra de linha)"""
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatar_rotulos(nomes: Iterable[str], valores: Iterable, *extras: str) -> str:
+    """Monta {a="1",b="2"} (vazio se não houver rótulos); extras já vêm formatados (worker, le)"""
+    partes = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    partes.extend(extra for extra in extras if extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _formatar_numero(valor: float) -> str:
+    """Formata inteiros sem casa decimal"""
+    if valor == int(valor):
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class _Metrica:
+    """Base: nome, ajuda, rótulos e registro global"""
+    tipo = ""
+    # Séries deste processo (recebem o rótulo worker); medidores do estado compartilhado não
+    por_processo = True
+    
+    def __init__(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._lock = threading.Lock()
+        with _registro_lock:
+            _registro.append(self)
+    
+    def _chave(self, rotulos: Dict) -> tuple:
+        """Valores dos rótulos na ordem declarada"""
+        return tuple(str(rotulos.get(nome, "")) for nome in self.rotulos)
+    
+    def _cabecalho(self) -> List[str]:
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+    
+    def amostras(self, worker: str = "") -> List[str]:
+        """Linhas de valores (sem # HELP/# TYPE), com o rótulo worker já formatado"""
+        raise NotImplementedError
+    
+    def renderizar(self, worker: str = "") -> List[str]:
+        return self._cabecalho() + self.amostras(worker)
+
+
+class Contador(_Metrica):
+    """Valor que só cresce (total de requisições, erros, retentativas...)"""
+    tipo = "counter"
+    
+    def __init__(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = ()):
+        super().__init__(nome, ajuda, rotulos)
+        self._valores: Dict[tuple, float] = {}
+    
+    def inc(self, valor: float = 1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+    
+    def amostras(self, worker: str = "") -> List[str]:
+        with self._lock:
+            valores = list(self._valores.items())
+        return [f"{self.nome}{_formatar_rotulos(self.rotulos, chave, worker)} {_formatar_numero(valor)}"
+                for chave, valor in valores]
+
+
+class Histograma(_Metrica):
+    """Distribuição de durações em buckets cumulativos, com soma e contagem"""
+    tipo = "histogram"
+    
+    def __init__(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = (), buckets: Tuple[float, ...] = BUCKETS_PADRAO):
+        super().__init__(nome, ajuda, rotulos)
+        self.buckets = tuple(sorted(buckets))
+        # chave -> [contagens por bucket (não cumulativas, +Inf no fim), soma]
+        self._valores: Dict[tuple, list] = {}
+    
+    def observar(self, valor: float, **rotulos):
+        chave = self._chave(rotulos)
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._valores.get(chave)
+            if serie is None:
+                serie = self._valores[chave] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+    
+    def amostras(self, worker: str = "") -> List[str]:
+        with self._lock:
+            valores = [(chave, list(contagens), soma) for chave, (contagens, soma) in self._valores.items()]
+        linhas = []
+        for chave, contagens, soma in valores:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets, contagens):
+                acumulado += contagem
+                rotulos = _formatar_rotulos(self.rotulos, chave, worker, f'le="{_formatar_numero(limite)}"')
+                linhas.append(f"{self.nome}_bucket{rotulos} {acumulado}")
+            acumulado += contagens[-1]
+            linhas.append(f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, chave, worker, LE_INF)} {acumulado}")
+            linhas.append(f"{self.nome}_sum{_formatar_rotulos(self.rotulos, chave, worker)} {_formatar_numero(soma)}")
+            linhas.append(f"{self.nome}_count{_formatar_rotulos(self.rotulos, chave, worker)} {acumulado}")
+        return linhas
+
+
+class Medidor(_Metrica):
+    """
+    Valor instantâneo calculado na coleta (threads ativas, jobs em execução...)
+    A função retorna um número ou, com rótulos, um dicionário {tupla de valores: número}
+    Com compartilhado=True o valor já vale para todos os workers (lido do estado compartilhado)
+    e sai uma vez só, sem o rótulo worker
+    """
+    tipo = "gauge"
+    
+    def __init__(self, nome: str, ajuda: str, funcao: Callable, rotulos: Tuple[str, ...] = (),
+                 compartilhado: bool = False):
+        super().__init__(nome, ajuda, rotulos)
+        self.funcao = funcao
+        self.por_processo = not compartilhado
+    
+    def amostras(self, worker: str = "") -> List[str]:
+        try:
+            valor = self.funcao()
+        except Exception:
+            # Uma fonte indisponível não derruba a coleta inteira
+            return []
+        linhas = []
+        if isinstance(valor, dict):
+            for chave, numero in valor.items():
+                chave = chave if isinstance(chave, tuple) else (chave,)
+                linhas.append(f"{self.nome}{_formatar_rotulos(self.rotulos, chave, worker)} {_formatar_numero(numero)}")
+        elif valor is not None:
+            linhas.append(f"{self.nome}{_formatar_rotulos((), (), worker)} {_formatar_numero(valor)}")
+        return linhas
+
+
+def medidor(nome: str, ajuda: str, funcao: Callable, rotulos: Tuple[str, ...] = (),
+            compartilhado: bool = False) -> Medidor:
+    """Registra um medidor, substituindo outro de mesmo nome (a app pode ser criada mais de uma vez)"""
+    with _registro_lock:
+        _registro[:] = [m for m in _registro if m.nome != nome]
+    return Medidor(nome, ajuda, funcao, rotulos, compartilhado)
+
+
+def publicar_metricas():
+    """Grava as séries deste processo no estado compartilhado (expiram se o worker morrer)"""
+    from utils.estado_compartilhado import obter_estado
+    
+    pid = os.getpid()
+    worker = f'worker="{pid}"'
+    with _registro_lock:
+        metricas = [m for m in _registro if m.por_processo]
+    series = {m.nome: {"tipo": m.tipo, "ajuda": m.ajuda, "linhas": m.amostras(worker)} for m in metricas}
+    obter_estado().definir("metricas", str(pid), series, ttl=config.METRICAS_PUBLICAR_INTERVALO * 3)
+
+
+def iniciar_publicacao_metricas():
+    """Publica as séries deste processo a cada METRICAS_PUBLICAR_INTERVALO (uma thread por worker)"""
+    global _publicador
+    
+    def publicar():
+        while True:
+            try:
+                publicar_metricas()
+            except Exception:
+                # estado.db ocupado: a próxima publicação tenta de novo
+                pass
+            threading.Event().wait(config.METRICAS_PUBLICAR_INTERVALO)
+    
+    with _registro_lock:
+        if _publicador is None or not _publicador.is_alive():
+            _publicador = threading.Thread(target=publicar, daemon=True, name="metricas")
+            _publicador.start()
+
+
+def renderizar_metricas() -> str:
+    """
+    Texto de todas as métricas no formato de exposição do Prometheus (0.0.4)
+    Séries por processo de todos os workers vivos (rótulo worker) + medidores compartilhados
+    """
+    from utils.estado_compartilhado import obter_estado
+    
+    publicar_metricas()
+    with _registro_lock:
+        compartilhadas = [m for m in _registro if not m.por_processo]
+    
+    # As linhas de uma métrica precisam sair juntas, logo após o # HELP/# TYPE dela
+    familias: Dict[str, Dict] = {}
+    for _, series in sorted(obter_estado().listar("metricas").items()):
+        for nome, serie in series.items():
+            familia = familias.setdefault(nome, {"tipo": serie["tipo"], "ajuda": serie["ajuda"], "linhas": []})
+            familia["linhas"].extend(serie["linhas"])
+    
+    linhas = []
+    for nome, familia in familias.items():
+        linhas.append(f"# HELP {nome} {familia['ajuda']}")
+        linhas.append(f"# TYPE {nome} {familia['tipo']}")
+        linhas.extend(familia["linhas"])
+    for metrica in compartilhadas:
+        linhas.extend(metrica.renderizar())
+    return "\n".join(linhas) + "\n"
@@ -0,0 +1,178 @@
+"""
+Rastreamento (traces) dos jobs de frota
+O job de frota é o span raiz, cada sequência de TV é um filho e cada comando, chamada HTTP
+e espera é uma folha. Os spans terminados são gravados em JSON lines no formato Zipkin v2
+(um span por linha, um arquivo por worker com rotação por tamanho: traces.<pid>.jsonl).
+
+Para abrir na UI do Zipkin (Upload JSON): python utils/listar_traces.py <trace_id> > trace.json
+"""
+
+import contextvars
+import json
+import logging
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Callable, Dict, List, Optional, Tuple
+import config
+from utils.arquivo_processo import abrir_arquivo_do_processo, caminhos_de_todos
+
+
+SERVICO = "apptvs"
+
+_span_atual: contextvars.ContextVar = contextvars.ContextVar("span_atual", default=None)
+_exportador: Optional[RotatingFileHandler] = None
+_exportador_lock = threading.Lock()
+
+
+class Span:
+    """Trecho cronometrado de um trace"""
+    
+    def __init__(self, nome: str, pai: Optional["Span"] = None, **atributos):
+        self.trace_id = pai.trace_id if pai else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.pai_id = pai.span_id if pai else None
+        self.nome = nome
+        self.atributos = {chave: valor for chave, valor in atributos.items() if valor is not None}
+        self.erro: Optional[str] = None
+        self.inicio = time.time()
+        self._inicio_relogio = time.perf_counter()
+        self._finalizado = False
+    
+    def definir(self, **atributos):
+        """Adiciona atributos (tags) ao span"""
+        self.atributos.update(atributos)
+    
+    def finalizar(self, erro: Optional[str] = None):
+        """Encerra o span e o exporta (chamadas repetidas são ignoradas)"""
+        if self._finalizado:
+            return
+        self._finalizado = True
+        if erro:
+            self.erro = erro
+        _exportar(self._para_zipkin(time.perf_counter() - self._inicio_relogio))
+    
+    def _para_zipkin(self, duracao: float) -> Dict:
+        tags = {chave: str(valor) for chave, valor in self.atributos.items()}
+        if self.erro:
+            tags["error"] = self.erro
+        registro = {
+            "traceId": self.trace_id,
+            "id": self.span_id,
+            "name": self.nome,
+            "timestamp": int(self.inicio * 1_000_000),
+            "duration": max(1, int(duracao * 1_000_000)),
+            "localEndpoint": {"serviceName": SERVICO},
+            "tags": tags
+        }
+        if self.pai_id:
+            registro["parentId"] = self.pai_id
+        return registro
+
+
+def _exportar(registro: Dict):
+    """Grava o span no arquivo deste worker (RotatingFileHandler serializa as escritas das threads e faz a rotação)"""
+    global _exportador
+    with _exportador_lock:
+        if _exportador is None:
+            _exportador = abrir_arquivo_do_processo(config.RASTREAMENTO_ARQUIVO, config.RASTREAMENTO_MAX_BYTES,
+                                                    config.RASTREAMENTO_BACKUPS)
+    _exportador.handle(logging.makeLogRecord({"msg": json.dumps(registro, ensure_ascii=False)}))
+
+
+def span_atual() -> Optional[Span]:
+    """Span ativo no contexto atual (None fora de um trace)"""
+    return _span_atual.get()
+
+
+def ids_atuais() -> Optional[Tuple[str, str]]:
+    """(trace_id, span_id) do span ativo, usados para correlacionar os logs"""
+    atual = _span_atual.get()
+    return (atual.trace_id, atual.span_id) if atual else None
+
+
+def iniciar_span(nome: str, **atributos) -> Optional[Span]:
+    """
+    Cria um span (filho do atual, ou raiz de um novo trace) sem ativá-lo
+    Para spans que terminam em outra thread (ex: job de comandos); encerrar com finalizar()
+    """
+    if not config.RASTREAMENTO_ATIVO:
+        return None
+    return Span(nome, _span_atual.get(), **atributos)
+
+
+@contextmanager
+def span(nome: str, raiz: bool = False, **atributos):
+    """
+    Executa o bloco dentro de um span filho do atual
+    Fora de um trace só cria o span se raiz=True; caso contrário não faz nada (custo quase zero)
+    """
+    pai = _span_atual.get()
+    if not config.RASTREAMENTO_ATIVO or (pai is None and not raiz):
+        yield None
+        return
+    
+    atual = Span(nome, pai, **atributos)
+    token = _span_atual.set(atual)
+    try:
+        yield atual
+    except BaseException as e:
+        atual.erro = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _span_atual.reset(token)
+        atual.finalizar()
+
+
+def propagar(funcao: Callable, pai: Optional[Span] = None) -> Callable:
+    """
+    Envolve a função para rodar em outra thread com o contexto de rastreamento atual
+    (ou com o span informado como pai)
+    """
+    contexto = contextvars.copy_context()
+    
+    def executar(*args, **kwargs):
+        def rodar():
+            if pai is not None:
+                _span_atual.set(pai)
+            return funcao(*args, **kwargs)
+        # Cópia por chamada: o mesmo contexto não pode ser usado por duas threads ao mesmo tempo
+        return contexto.copy().run(rodar)
+    
+    return executar
+
+
+def _ler_spans():
+    """Percorre os spans dos arquivos de todos os workers, atuais e rotacionados (mais antigos primeiro)"""
+    for caminho in caminhos_de_todos(config.RASTREAMENTO_ARQUIVO):
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                for linha in f:
+                    try:
+                        yield json.loads(linha)
+                    except ValueError:
+                        continue
+        except OSError:
+            # Rotacionado pelo worker dono durante a leitura
+            continue
+
+
+def carregar_trace(trace_id: str) -> List[Dict]:
+    """Spans de um trace, ordenados pelo início (JSON aceito pela UI do Zipkin)"""
+    return sorted((s for s in _ler_spans() if s.get("traceId") == trace_id), key=lambda s: s["timestamp"])
+
+
+def listar_traces(limite: int = 20) -> List[Dict]:
+    """Spans raiz mais recentes (um por trace)"""
+    raizes = [s for s in _ler_spans() if "parentId" not in s]
+    raizes.sort(key=lambda s: s["timestamp"], reverse=True)
+    return [{
+        "trace_id": s["traceId"],
+        "nome": s["name"],
+        "inicio": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(s["timestamp"] / 1_000_000)),
+        "duracao_segundos": round(s["duration"] / 1_000_000, 1),
+        "tags": s.get("tags", {})
+    } for s in raizes[:limite]]
+
@@ -0,0 +1,33 @@
+"""
+Relógio das sequências
+Centraliza as esperas entre comandos para que possam ser simuladas (ex: contagem de comandos sem esperar)
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from utils.rastreamento import span
+import config
+
+_local = threading.local()
+
+
+def dormir(segundos):
+    """Aguarda o tempo indicado, dividido por RELOGIO_ESCALA (ou delega ao relógio simulado da thread atual)"""
+    funcao = getattr(_local, 'dormir', None)
+    if funcao is not None:
+        funcao(segundos)
+        return
+    with span("espera", segundos=segundos):
+        time.sleep(segundos / config.RELOGIO_ESCALA)
+
+
+@contextmanager
+def relogio_simulado(funcao_dormir=None):
+    """Substitui as esperas da thread atual (por padrão, não espera nada)"""
+    anterior = getattr(_local, 'dormir', None)
+    _local.dormir = funcao_dormir or (lambda segundos: None)
+    try:
+        yield
+    finally:
+        _local.dormir = anterior
@@ -0,0 +1,36 @@
+"""
+Token de acesso da SmartThings visto por todos os workers
+A renovação reescreve o ACCESS_TOKEN do config.py (em qualquer worker); cada processo relê só o token
+quando o arquivo muda, sem recarregar o módulo config inteiro
+"""
+
+import os
+import re
+import threading
+import config
+
+_PADRAO = re.compile(r'^ACCESS_TOKEN = "([^"]*)"', re.MULTILINE)
+_lock = threading.Lock()
+_mtime = None
+
+
+def obter_token() -> str:
+    """Retorna o token atual, relendo o config.py se ele foi alterado desde a última leitura"""
+    global _mtime
+    try:
+        mtime = os.stat(config.__file__).st_mtime_ns
+    except OSError:
+        return config.ACCESS_TOKEN
+    
+    with _lock:
+        if mtime != _mtime:
+            try:
+                with open(config.__file__, 'r', encoding='utf-8') as f:
+                    encontrado = _PADRAO.search(f.read())
+            except OSError:
+                encontrado = None
+            # Leitura no meio da gravação (arquivo truncado): mantém o token anterior e tenta de novo na próxima
+            if encontrado:
+                config.ACCESS_TOKEN = encontrado.group(1)
+                _mtime = mtime
+        return config.ACCESS_TOKEN
@@ -0,0 +1,13 @@
+"""
+Ponto de entrada WSGI para execução com vários workers
+Uso: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import sys
+from app import create_app, inicializar_sistema
+
+sys.stdout.reconfigure(line_buffering=True, encoding='utf-8')
+
+# Cada worker carrega as TVs e atende requisições; apenas o líder executa os agendamentos
+app = create_app()
+inicializar_sistema(app)